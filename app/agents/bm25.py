@@ -0,0 +1,53 @@
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+from app.agents.embeddings import tokenizar
+
+# Palabras vacías frecuentes en español: no aportan al ranking léxico.
+STOPWORDS = frozenset("""
+a al algo como con de del el en es esta este esto la las lo los me mi mis
+muy no o para pero por que se si sin su sus te tu tus un una uno unos y ya yo
+""".split())
+
+
+class BM25Index:
+    """
+    Índice invertido con ranking BM25 (Okapi) sobre textos cortos.
+
+    Se construye en memoria a partir de los fragmentos de la KB. Ayuda con
+    coincidencias exactas que los embeddings ordenan mal: números de
+    teléfono ("113"), siglas ("MINSA", "CSMC") o nombres de lugares.
+    """
+
+    def __init__(self, textos: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.n = len(textos)
+        self.longitudes: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for i, texto in enumerate(textos):
+            terminos = [t for t in tokenizar(texto) if t not in STOPWORDS]
+            self.longitudes.append(len(terminos))
+            for termino, frecuencia in Counter(terminos).items():
+                self.postings[termino].append((i, frecuencia))
+
+        self.longitud_media = (sum(self.longitudes) / self.n) if self.n else 0.0
+        self.idf = {
+            termino: math.log(1 + (self.n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for termino, docs in self.postings.items()
+        }
+
+    def buscar(self, consulta: str, k: int) -> List[Tuple[int, float]]:
+        """Devuelve hasta 'k' pares (índice del texto, puntuación) con puntuación > 0."""
+        puntuaciones: Dict[int, float] = defaultdict(float)
+        for termino in set(tokenizar(consulta)) - STOPWORDS:
+            idf = self.idf.get(termino)
+            if idf is None:
+                continue
+            for i, frecuencia in self.postings[termino]:
+                norma = self.k1 * (1 - self.b + self.b * self.longitudes[i] / (self.longitud_media or 1))
+                puntuaciones[i] += idf * frecuencia * (self.k1 + 1) / (frecuencia + norma)
+
+        return sorted(puntuaciones.items(), key=lambda x: x[1], reverse=True)[:k]
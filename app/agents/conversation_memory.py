@@ -0,0 +1,160 @@
+# ruta: app/agents/conversation_memory.py
+
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_openai import ChatOpenAI
+
+import app.services.memoria_service as memoria_service
+from app.core.tokens import contar_tokens_mensajes
+from app.core.config import (
+    MEMORIA_PRESUPUESTO_TOKENS,
+    MEMORIA_MAX_TOKENS_RESUMEN,
+    MEMORIA_LOTE_PLEGADO,
+)
+
+
+def _instante(valor: str) -> datetime:
+    """Convierte una fecha ISO de Supabase en un datetime naive (UTC) comparable."""
+    fecha = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+    return fecha
+
+
+class ConversationMemory:
+    """
+    Memoria de conversación con presupuesto de tokens.
+
+    El prompt final se compone de:
+        [mensajes fijos (system, contexto, mensaje nuevo)]
+        + [resumen acumulado de turnos antiguos]
+        + [turnos recientes literales]
+    y nunca supera 'presupuesto_tokens'. Los turnos que ya no caben se
+    pliegan en el resumen de forma incremental: solo se envían al modelo el
+    resumen previo y los mensajes nuevos que salen de la ventana, nunca todo
+    el historial. El resumen se guarda en 'resumenes_conversacion' junto con
+    la fecha del último mensaje incorporado.
+
+    El plegado es una llamada extra al modelo, así que no se hace dentro de
+    la petición: se lanza en segundo plano (uno por usuario a la vez) y el
+    turno actual usa el resumen que ya existía. Los mensajes pendientes de
+    plegar quedan fuera del prompt solo hasta que el resumen se actualiza.
+    """
+
+    # Margen para el texto que acompaña al resumen dentro del SystemMessage.
+    TOKENS_ENCABEZADO_RESUMEN = 24
+
+    PROMPT_RESUMEN = """
+Mantienes la memoria de una conversación entre un usuario y Auri, su acompañante emocional.
+Actualiza el resumen existente incorporando los mensajes nuevos. Conserva lo importante
+para acompañar al usuario: emociones expresadas, situaciones y personas relevantes,
+preocupaciones recurrentes, lo que le ha ayudado y compromisos o planes mencionados.
+Escribe en tercera persona, en español, en un único párrafo breve. Responde solo con el resumen.
+"""
+
+    def __init__(
+        self,
+        presupuesto_tokens: int = MEMORIA_PRESUPUESTO_TOKENS,
+        max_tokens_resumen: int = MEMORIA_MAX_TOKENS_RESUMEN,
+        lote_plegado: int = MEMORIA_LOTE_PLEGADO,
+    ):
+        self.presupuesto_tokens = presupuesto_tokens
+        self.max_tokens_resumen = max_tokens_resumen
+        self.lote_plegado = lote_plegado
+        self.llm_resumen = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.3,
+            max_tokens=max_tokens_resumen,
+        )
+        self._plegando: Dict[str, asyncio.Task] = {}
+
+    # ---------------------------------------------------------
+    # SELECCIÓN DE LA VENTANA LITERAL
+    # ---------------------------------------------------------
+    def _inicio_ventana(self, historial: List[Dict[str, Any]], presupuesto: int) -> int:
+        """
+        Índice del primer mensaje que entra literal: se toman los más
+        recientes mientras quepan en 'presupuesto'.
+        """
+        usados = 0
+        inicio = len(historial)
+        for i in range(len(historial) - 1, -1, -1):
+            usados += contar_tokens_mensajes([historial[i].get("texto") or ""])
+            if usados > presupuesto:
+                break
+            inicio = i
+        return inicio
+
+    def _presupuesto_historial(self, tokens_fijos: int, resumen: Optional[str]) -> int:
+        tokens_resumen = contar_tokens_mensajes([resumen]) + self.TOKENS_ENCABEZADO_RESUMEN if resumen else 0
+        return max(0, self.presupuesto_tokens - tokens_fijos - tokens_resumen)
+
+    # ---------------------------------------------------------
+    # PLEGADO INCREMENTAL DEL RESUMEN
+    # ---------------------------------------------------------
+    async def _plegar(self, resumen_previo: Optional[str], mensajes: List[Dict[str, Any]]) -> str:
+        transcripcion = "\n".join(
+            f"{'Usuario' if m.get('rol') == 'user' else 'Auri'}: {m.get('texto', '')}"
+            for m in mensajes
+        )
+        contenido = (
+            f"Resumen actual:\n{resumen_previo or '(vacío)'}\n\n"
+            f"Mensajes nuevos:\n{transcripcion}"
+        )
+        respuesta = await self.llm_resumen.ainvoke([
+            SystemMessage(content=self.PROMPT_RESUMEN),
+            HumanMessage(content=contenido),
+        ])
+        return respuesta.content.strip()
+
+    async def preparar(
+        self,
+        usuario_id: Optional[str],
+        historial: List[Dict[str, Any]],
+        tokens_fijos: int,
+    ) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """
+        Devuelve (resumen, turnos_literales) para construir el prompt.
+
+        'historial' son los mensajes recientes en orden cronológico (rol,
+        texto, fecha) y 'tokens_fijos' lo que ya ocupan el resto de mensajes.
+        """
+        registro = await memoria_service.obtener_resumen(usuario_id) if usuario_id else None
+        resumen = registro.get("resumen") if registro else None
+        hasta = _instante(registro["hasta_fecha"]) if registro else None
+
+        inicio = self._inicio_ventana(historial, self._presupuesto_historial(tokens_fijos, resumen))
+
+        # Mensajes que quedaron fuera de la ventana y aún no están en el resumen.
+        pendientes = [
+            m for m in historial[:inicio]
+            if m.get("fecha") and (hasta is None or _instante(m["fecha"]) > hasta)
+        ]
+
+        if usuario_id and len(pendientes) >= self.lote_plegado:
+            self._plegar_en_segundo_plano(usuario_id, resumen, pendientes)
+
+        return resumen, historial[inicio:]
+
+    def _plegar_en_segundo_plano(
+        self, usuario_id: str, resumen: Optional[str], pendientes: List[Dict[str, Any]]
+    ) -> None:
+        if usuario_id in self._plegando:
+            return
+        tarea = asyncio.create_task(self._actualizar_resumen(usuario_id, resumen, pendientes))
+        self._plegando[usuario_id] = tarea
+        tarea.add_done_callback(lambda _: self._plegando.pop(usuario_id, None))
+
+    async def _actualizar_resumen(
+        self, usuario_id: str, resumen: Optional[str], pendientes: List[Dict[str, Any]]
+    ) -> None:
+        try:
+            print(f"[ConversationMemory] Plegando {len(pendientes)} mensajes en el resumen...")
+            nuevo = await self._plegar(resumen, pendientes)
+            await memoria_service.guardar_resumen(usuario_id, nuevo, pendientes[-1]["fecha"])
+        except Exception as e:
+            # Los mensajes siguen pendientes: el próximo turno lo vuelve a intentar.
+            print(f"[ConversationMemory] Error al actualizar el resumen: {e}")
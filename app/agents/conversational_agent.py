@@ -3,7 +3,38 @@
 # (NUEVO) Importar AIMessage
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_openai import ChatOpenAI
-from app.agents.rag_service import RAGService
+from langchain_openai.chat_models.base import OpenAIRefusalError
+from openai import LengthFinishReasonError, ContentFilterFinishReasonError
+from pydantic import BaseModel, Field
+from typing import Literal
+from app.agents.rag_service import get_rag_service
+from app.agents.conversation_memory import ConversationMemory
+from app.agents.intent_gate import IntentGate
+from app.core.tokens import contar_tokens_mensajes
+from app.core.config import CHAT_MAX_TOKENS_ESTRUCTURADO
+from app.analysis.sentiment_lexicon import EMOCIONES
+
+
+class RespuestaAuri(BaseModel):
+    """
+    Salida estructurada del modelo: la respuesta para el usuario y, en la
+    misma llamada, la emoción del último mensaje del usuario (se guarda en
+    mensajes_chat y alimenta las métricas del dashboard).
+    """
+    respuesta: str = Field(
+        description="La respuesta de Auri para el usuario, tal como se le mostrará."
+    )
+    emocion_detectada: Literal[tuple(EMOCIONES) + ("Neutral",)] = Field(
+        description="La emoción principal del último mensaje del usuario."
+    )
+    categoria_emocional: Literal["positiva", "neutra", "negativa"] = Field(
+        description="La categoría general de esa emoción."
+    )
+    puntuacion_sentimiento: float = Field(
+        ge=-1.0,
+        le=1.0,
+        description="Un puntaje de sentimiento del último mensaje del usuario, de -1.0 (muy negativo) a 1.0 (muy positivo)."
+    )
 
 
 class ConversationalAgent:
@@ -16,8 +47,21 @@ class ConversationalAgent:
             temperature=0.7,
             max_tokens=400,
         )
+        # Misma llamada, pero con la respuesta y la emoción como JSON validado.
+        # Instancia propia: el JSON y los campos de emoción no deben comerse
+        # el presupuesto de la respuesta (un JSON cortado no se puede leer).
+        self.llm_estructurado = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.7,
+            max_tokens=CHAT_MAX_TOKENS_ESTRUCTURADO,
+        ).with_structured_output(RespuestaAuri, method="json_schema")
+
+        # Servicio RAG compartido del proceso (se indexa en el arranque de la app).
+        self.rag_service = get_rag_service()
+        # Decide si un mensaje merece consultar la KB ("hola" o "gracias" no).
+        self.filtro_intencion = IntentGate()
 
-        self.rag_service = RAGService()
+        self.memoria = ConversationMemory()
 
         # --- INICIO DE LA CORRECCIÓN DEL PROMPT ---
         self.SYSTEM_PROMPT = """
@@ -35,6 +79,7 @@ REGLAS IMPORTANTES:
 4.  **Usa el Contexto**: Si la consulta del usuario SÍ es sobre bienestar (ej. "dame un consejo para el estrés"), usa la "Información para Auri" para dar una respuesta informada.
 5.  **Tono**: Sé breve, cálida y comprensiva. Usa emojis 💜✨🧘‍♀️📓 con moderación.
 6.  **Angustia Severa**: Si detectas angustia severa, usa la información del RAG para sugerir ayuda profesional (ej. Línea 113).
+7.  **Emoción del Usuario**: Cuando se te pida en formato estructurado, además de tu respuesta indica la emoción, su categoría y el puntaje de sentimiento del ÚLTIMO mensaje del usuario.
 """
         # --- FIN DE LA CORRECCIÓN DEL PROMPT ---
 
@@ -71,15 +116,23 @@ REGLAS IMPORTANTES:
         return mensajes
 
     # ---------------------------------------------------------
-    # FUNCIÓN PRINCIPAL: INVOCAR AL AGENTE
+    # CONSTRUCCIÓN DEL PROMPT
     # ---------------------------------------------------------
-    def invoke(self, texto_usuario: str, datos_usuario: dict, historial_chat_db=None):
+    async def buscar_contexto(self, texto_usuario: str) -> str:
         """
-        Recibe un mensaje, agrega contexto, historial y genera respuesta.
+        Contexto de la KB para el mensaje, o "" sin consultar el índice si
+        el filtro de intención decide que no hace falta (charla, saludos).
         """
+        if not self.filtro_intencion.necesita_contexto(texto_usuario):
+            return ""
+        return await self.rag_service.buscar_contexto(texto_usuario)
 
-        print("[ConversationalAgent] Invocando agente...")
-
+    async def _construir_mensajes(self, texto_usuario: str, datos_usuario: dict, historial_chat_db=None, contexto_kb=None):
+        """
+        Agrega contexto RAG, memoria de la conversación y el mensaje del
+        usuario. Lo comparten 'ainvoke' y 'astream'. Si 'contexto_kb' llega
+        ya calculado (p. ej. recuperado en paralelo), no se vuelve a buscar.
+        """
         if not texto_usuario or texto_usuario.strip() == "":
             texto_usuario = "(mensaje corto o poco claro)"
 
@@ -87,7 +140,8 @@ REGLAS IMPORTANTES:
         nombre = datos_usuario.get("nombre", "Usuario")
 
         # 2. Obtener contexto del RAG
-        contexto_kb = self.rag_service.buscar_contexto(texto_usuario)
+        if contexto_kb is None:
+            contexto_kb = await self.buscar_contexto(texto_usuario)
 
         # 3. Construir context prompt
         context_prompt = SystemMessage(content=f"""
@@ -100,17 +154,26 @@ Usa este contexto para hacer la respuesta más empática,
 pero **NO** digas: "según el contexto", "en tu historial" ni nada técnico.
 """)
 
-        # 4. Historial normalizado
-        historial_msgs = self._convert_history(historial_chat_db or [])
-
-        # 5. Construir mensaje del usuario
+        # 4. Construir mensaje del usuario
         user_msg = HumanMessage(content=texto_usuario)
+        system_msg = SystemMessage(content=self.SYSTEM_PROMPT)
+
+        # 5. Memoria: resumen acumulado + turnos recientes dentro del presupuesto
+        tokens_fijos = contar_tokens_mensajes(
+            [system_msg.content, context_prompt.content, user_msg.content]
+        )
+        resumen, historial_reciente = await self.memoria.preparar(
+            datos_usuario.get("id"), historial_chat_db or [], tokens_fijos
+        )
+        historial_msgs = self._convert_history(historial_reciente)
 
         # 6. Construir la cadena final de mensajes
-        mensajes = [
-            SystemMessage(content=self.SYSTEM_PROMPT),
-            context_prompt,
-        ] + historial_msgs + [user_msg]
+        mensajes = [system_msg, context_prompt]
+        if resumen:
+            mensajes.append(SystemMessage(
+                content=f"Resumen de la conversación anterior con {nombre} (NO lo cites literalmente):\n{resumen}"
+            ))
+        mensajes += historial_msgs + [user_msg]
 
         print("\n==============================")
         print("[AURI] MENSAJES ENVIADOS AL MODELO:")
@@ -118,11 +181,64 @@ pero **NO** digas: "según el contexto", "en tu historial" ni nada técnico.
             print(type(m).__name__, "→", m.content[:160])
         print("==============================\n")
 
+        return mensajes
+
+    # ---------------------------------------------------------
+    # FUNCIÓN PRINCIPAL: INVOCAR AL AGENTE
+    # ---------------------------------------------------------
+    async def ainvoke(self, texto_usuario: str, datos_usuario: dict, historial_chat_db=None, contexto_kb=None) -> RespuestaAuri:
+        """
+        Recibe un mensaje, agrega contexto, historial y genera respuesta.
+        En la misma llamada el modelo devuelve la emoción del mensaje del
+        usuario (RespuestaAuri), sin una segunda petición de análisis.
+        """
+
+        print("[ConversationalAgent] Invocando agente...")
+
+        mensajes = await self._construir_mensajes(texto_usuario, datos_usuario, historial_chat_db, contexto_kb)
+
         try:
-            respuesta = self.llm.invoke(mensajes).content
-            print("[AURI] RESPUESTA DE OPENAI:", respuesta)
+            resultado = await self.llm_estructurado.ainvoke(mensajes)
+            print("[AURI] RESPUESTA DE OPENAI:", resultado.respuesta)
+            print(f"[AURI] EMOCIÓN DEL USUARIO: {resultado.emocion_detectada} "
+                  f"({resultado.categoria_emocional}, {resultado.puntuacion_sentimiento})")
+        except (ValueError, LengthFinishReasonError, ContentFilterFinishReasonError, OpenAIRefusalError) as e:
+            # JSON cortado, inválido o rechazado: se responde en texto, sin emoción.
+            print(f"[AURI] Salida estructurada no válida ({type(e).__name__}); se pide la respuesta en texto.")
+            resultado = await self._respuesta_sin_emocion(mensajes)
         except Exception as e:
             print("❌ ERROR AL LLAMAR A OPENAI:", e)
             raise e
 
-        return respuesta
\ No newline at end of file
+        return resultado
+
+    async def _respuesta_sin_emocion(self, mensajes) -> RespuestaAuri:
+        """
+        Respaldo de 'ainvoke' cuando la salida estructurada no se puede
+        validar: la respuesta en texto normal, con los campos de emoción en
+        None (quien la guarda usa entonces el análisis local).
+        """
+        respuesta = await self.llm.ainvoke(mensajes)
+        return RespuestaAuri.model_construct(
+            respuesta=respuesta.content.strip(),
+            emocion_detectada=None,
+            categoria_emocional=None,
+            puntuacion_sentimiento=None,
+        )
+
+    # ---------------------------------------------------------
+    # VARIANTE EN STREAMING
+    # ---------------------------------------------------------
+    async def astream(self, texto_usuario: str, datos_usuario: dict, historial_chat_db=None, contexto_kb=None):
+        """
+        Igual que 'ainvoke', pero entrega la respuesta en fragmentos a medida
+        que el modelo los genera (el primer token llega sin esperar al resto).
+        """
+
+        print("[ConversationalAgent] Invocando agente en streaming...")
+
+        mensajes = await self._construir_mensajes(texto_usuario, datos_usuario, historial_chat_db, contexto_kb)
+
+        async for fragmento in self.llm.astream(mensajes):
+            if fragmento.content:
+                yield fragmento.content
@@ -0,0 +1,132 @@
+import re
+import hashlib
+import unicodedata
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.cache import TTLCache
+from app.core.config import (
+    OPENAI_API_KEY,
+    RAG_EMBEDDINGS_BACKEND,
+    RAG_EMBEDDINGS_MODELO,
+    RAG_EMBEDDINGS_DIMENSION,
+    RAG_EMBEDDINGS_LOCAL_MODELO,
+)
+
+
+def normalizar_consulta(texto: str) -> str:
+    """
+    Minúsculas, sin tildes, sin signos y con espacios simples: "¿Cómo manejo
+    el estrés?" y "como manejo el estres" comparten clave.
+    """
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", texto)).strip()
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Palabras del texto normalizado (conserva números como "113")."""
+    return normalizar_consulta(texto).split()
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeddings locales sin red ni modelo: "feature hashing" de palabras,
+    bigramas y trigramas de caracteres, con signo y normalización L2.
+    Captura coincidencias léxicas y variaciones morfológicas ("ansioso" /
+    "ansiedad"), no sinónimos; sirve para desarrollo, pruebas y benchmarks
+    offline, o como respaldo sin acceso a OpenAI.
+    """
+
+    def __init__(self, dimension: int = RAG_EMBEDDINGS_DIMENSION):
+        self.dimension = dimension
+
+    def _rasgos(self, texto: str) -> List[str]:
+        palabras = tokenizar(texto)
+        rasgos = list(palabras)
+        rasgos += [f"{a}_{b}" for a, b in zip(palabras, palabras[1:])]
+        for palabra in palabras:
+            marcada = f"<{palabra}>"
+            rasgos += [marcada[i:i + 3] for i in range(len(marcada) - 2)]
+        return rasgos
+
+    def _vector(self, texto: str) -> List[float]:
+        v = np.zeros(self.dimension, dtype=np.float32)
+        for rasgo in self._rasgos(texto):
+            h = int.from_bytes(hashlib.blake2b(rasgo.encode(), digest_size=8).digest(), "little")
+            v[h % self.dimension] += 1.0 if (h >> 63) & 1 else -1.0
+        v = np.sign(v) * np.log1p(np.abs(v))
+        norma = np.linalg.norm(v)
+        return (v / norma if norma else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def crear_embeddings(backend: str = RAG_EMBEDDINGS_BACKEND) -> Embeddings:
+    """
+    Backend de embeddings configurado en RAG_EMBEDDINGS_BACKEND.
+    """
+    if backend == "hashing":
+        return HashingEmbeddings()
+    if backend == "local":
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+        except ImportError as e:
+            raise ValueError("El backend 'local' requiere 'sentence-transformers' instalado.") from e
+        return HuggingFaceEmbeddings(
+            model_name=RAG_EMBEDDINGS_LOCAL_MODELO,
+            encode_kwargs={"normalize_embeddings": True},
+        )
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model=RAG_EMBEDDINGS_MODELO, openai_api_key=OPENAI_API_KEY)
+    raise ValueError(f"RAG_EMBEDDINGS_BACKEND desconocido: {backend}")
+
+
+def descripcion_embeddings(backend: str = RAG_EMBEDDINGS_BACKEND) -> str:
+    """Identifica backend + modelo/dimensión (forma parte de la huella del índice)."""
+    if backend == "hashing":
+        return f"hashing:{RAG_EMBEDDINGS_DIMENSION}"
+    if backend == "local":
+        return f"local:{RAG_EMBEDDINGS_LOCAL_MODELO}"
+    return f"openai:{RAG_EMBEDDINGS_MODELO}"
+
+
+class EmbeddingsConCache(Embeddings):
+    """
+    Envuelve un backend de embeddings y memoriza los vectores de consultas
+    (texto normalizado → vector). Los documentos no se cachean: solo se
+    embeben al indexar.
+    """
+
+    def __init__(self, base: Embeddings, max_items: int = 5000, ttl: int = 86400):
+        self.base = base
+        self.cache = TTLCache("embeddings_consultas", max_items=max_items, ttl=ttl)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.base.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        clave = normalizar_consulta(text)
+        vector = self.cache.get(clave)
+        if vector is None:
+            vector = self.base.embed_query(text)
+            self.cache.set(clave, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        clave = normalizar_consulta(text)
+        vector = self.cache.get(clave)
+        if vector is None:
+            vector = await self.base.aembed_query(text)
+            self.cache.set(clave, vector)
+        return vector
@@ -0,0 +1,89 @@
+import threading
+from typing import Any, Dict, Tuple
+
+from app.agents.bm25 import STOPWORDS
+from app.agents.embeddings import tokenizar
+from app.core import estadisticas
+from app.core.config import RAG_FILTRO_INTENCION, RAG_FILTRO_MIN_PALABRAS
+
+# Palabras de cortesía / charla: un mensaje hecho solo de ellas no necesita la KB.
+CHARLA = frozenset("""
+hola holi buenas buenos dias tardes noches saludos hey ey que tal como estas estas
+gracias muchas mil graciass ok okay okey vale listo perfecto genial bueno bien
+igualmente tambien adios chau chao bye nos vemos hasta luego pronto manana
+jaja jajaja jeje jiji xd lol si sip claro dale de nada
+""".split())
+
+# Prefijos que siempre justifican buscar contexto: malestar, crisis o una
+# petición explícita de ideas o recursos (es justo lo que cubre la KB).
+SENALES = (
+    "ayud", "consej", "recomiend", "recomend", "suger", "idea", "tecnica", "ejercicio",
+    "ansi", "estres", "estresad", "agobi", "abrum", "nervios", "panico", "miedo", "trist",
+    "deprim", "soledad", "siento solo", "siento sola", "llor", "frustr", "enoj", "rabia", "dormir", "insomn",
+    "crisis", "suicid", "morir", "matarme", "hacerme dano", "psicolog", "terapia",
+    "que hacer", "que puedo", "linea", "113", "minsa", "hobby", "pasatiempo", "creativ", "aburr",
+)
+
+
+class IntentGate:
+    """
+    Filtro local y barato (sin red ni modelo) delante de la recuperación RAG.
+
+    Decide con heurísticas sobre el texto normalizado:
+    1. Si contiene una señal (malestar, crisis, petición de consejos) → recuperar.
+    2. Si solo tiene palabras de cortesía ("hola", "gracias") → omitir.
+    3. Si tiene menos de 'min_palabras' palabras con contenido → omitir.
+    4. En otro caso → recuperar.
+
+    Lleva la cuenta de decisiones por motivo en /api/sistema/estadisticas.
+    """
+
+    def __init__(self, activo: bool = RAG_FILTRO_INTENCION, min_palabras: int = RAG_FILTRO_MIN_PALABRAS):
+        self.activo = activo
+        self.min_palabras = min_palabras
+        self._motivos: Dict[str, int] = {}
+        self._omitidas = 0
+        self._evaluadas = 0
+        self._lock = threading.Lock()
+        estadisticas.registrar("filtro_intencion", self.estadisticas)
+
+    def decidir(self, texto: str) -> Tuple[bool, str]:
+        """Devuelve (recuperar, motivo)."""
+        if not self.activo:
+            return True, "desactivado"
+
+        palabras = tokenizar(texto or "")
+        if not palabras:
+            return False, "vacio"
+
+        normalizado = " ".join(palabras)
+        if any(palabra.startswith(SENALES) for palabra in palabras) or any(
+            " " in senal and senal in normalizado for senal in SENALES
+        ):
+            return True, "senal"
+
+        contenido = [p for p in palabras if p not in CHARLA and p not in STOPWORDS]
+        if not contenido:
+            return False, "charla"
+        if len(contenido) < self.min_palabras:
+            return False, "corto"
+        return True, "contenido"
+
+    def necesita_contexto(self, texto: str) -> bool:
+        recuperar, motivo = self.decidir(texto)
+        with self._lock:
+            self._evaluadas += 1
+            self._omitidas += 0 if recuperar else 1
+            self._motivos[motivo] = self._motivos.get(motivo, 0) + 1
+        return recuperar
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "activo": self.activo,
+                "min_palabras": self.min_palabras,
+                "evaluadas": self._evaluadas,
+                "recuperaciones_omitidas": self._omitidas,
+                "ratio_omitidas": round(self._omitidas / self._evaluadas, 3) if self._evaluadas else 0.0,
+                "motivos": dict(self._motivos),
+            }
@@ -1,134 +1,589 @@
 import os
 import glob
+import json
+import shutil
+import hashlib
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain_openai import ChatOpenAI
 from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
-from app.core.config import OPENAI_API_KEY
-from langchain_community.document_loaders import JSONLoader
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
+from app.core.config import (
+    OPENAI_API_KEY,
+    RAG_TOP_K,
+    RAG_UMBRAL_RELEVANCIA,
+    RAG_CONTEXTO_MAX_CARACTERES,
+    RAG_INDEX_DIR,
+    RAG_RECUPERACION,
+    RAG_BM25_MIN_PUNTAJE,
+    RAG_EMBEDDINGS_BACKEND,
+    RAG_CACHE_SIMILITUD,
+    RAG_CACHE_MAX,
+    RAG_CACHE_TTL,
+)
+from app.agents.embeddings import EmbeddingsConCache, crear_embeddings, descripcion_embeddings
+from app.agents.bm25 import BM25Index
+from app.agents.semantic_cache import SemanticCache
 
 KB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "kb")
 
+# Ajustes que determinan el contenido del índice: si cambian, se re-embebe todo.
+FORMATO_ENTRADA = "{titulo}: {contenido}"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+# Constante de Reciprocal Rank Fusion y candidatos por recuperador.
+RRF_K = 60
+CANDIDATOS_MINIMOS = 10
+
+
+def _relevancia_coseno(distancia: float) -> float:
+    """
+    FAISS (IndexFlatL2) devuelve la distancia L2 al cuadrado; con vectores
+    normalizados equivale a 2 - 2·cos, así que la relevancia es el coseno
+    (acotado a 0..1, que es lo que espera LangChain).
+    """
+    return min(1.0, max(0.0, 1.0 - distancia / 2.0))
+
+
+class IndiceKB:
+    """
+    Instantánea del índice de la KB: FAISS y BM25 sobre los mismos fragmentos.
+    No se modifica una vez creada; reindexar construye otra y la sustituye
+    de una sola asignación, así una consulta nunca mezcla dos versiones.
+    """
+
+    def __init__(self, vectorstore, huella: str):
+        self.vectorstore = vectorstore
+        self.huella = huella
+        self.fragmentos: List[str] = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).page_content
+            for i in range(vectorstore.index.ntotal)
+        ]
+        self.posicion: Dict[str, int] = {texto: i for i, texto in enumerate(self.fragmentos)}
+        # Índice léxico sobre los mismos fragmentos que contiene FAISS.
+        self.bm25 = BM25Index(self.fragmentos)
+
+    def relevancias(self, vector_consulta, posiciones: List[int]) -> Dict[int, float]:
+        """Relevancia coseno (0..1) de la consulta con cada fragmento indicado."""
+        q = np.asarray(vector_consulta, dtype=np.float32)
+        return {
+            i: _relevancia_coseno(float(np.sum((self.vectorstore.index.reconstruct(i) - q) ** 2)))
+            for i in posiciones
+        }
+
+
 class RAGService:
-    """Servicio RAG moderno (LCEL). Usa la API de runnables en lugar de RetrievalQA."""
+    """
+    Servicio RAG moderno (LCEL). Usa la API de runnables en lugar de RetrievalQA.
+
+    Construirlo no indexa nada: el índice se carga/crea en 'inicializar'
+    (una sola vez, aunque lo pidan varios hilos), normalmente desde el
+    lifespan de la app con 'calentar'. Mientras tanto 'estado' lo indica y
+    las consultas devuelven vacío en lugar de bloquear.
+
+    Después, 'reindexar' aplica los cambios de app/kb sin reiniciar: solo
+    se embeben las entradas nuevas o modificadas.
+    """
+
+    PENDIENTE = "pendiente"
+    INICIALIZANDO = "inicializando"
+    LISTO = "listo"
+    ERROR = "error"
 
     def __init__(self):
-        print("[RAGService] Inicializando...")
-        self.rag_chain = self._initialize_rag_chain()
-        if self.rag_chain:
-            print("[RAGService] Base de conocimiento indexada exitosamente.")
-        else:
-            print("[RAGService] ADVERTENCIA: No se pudo inicializar la cadena RAG.")
+        self._indice: Optional[IndiceKB] = None
+        self.rag_chain = None
+        self.embeddings = None
+        # Respuestas de 'query_rag' (/consejos) por similitud de la consulta.
+        self.cache_respuestas = SemanticCache(
+            "consejos", umbral=RAG_CACHE_SIMILITUD, max_items=RAG_CACHE_MAX, ttl=RAG_CACHE_TTL
+        )
+        self.estado = self.PENDIENTE
+        self.ultimo_reindexado: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._lock_reindexado = threading.Lock()
+        self._tarea_calentar = None
+
+    @property
+    def listo(self) -> bool:
+        return self.estado == self.LISTO
+
+    @property
+    def vectorstore(self):
+        return self._indice.vectorstore if self._indice else None
+
+    @property
+    def fragmentos(self) -> List[str]:
+        return self._indice.fragmentos if self._indice else []
+
+    def inicializar(self) -> None:
+        """Indexa la KB (bloqueante). Llamadas repetidas no hacen nada."""
+        with self._lock:
+            if self.estado in (self.LISTO, self.ERROR):
+                return
+            self.estado = self.INICIALIZANDO
+            print("[RAGService] Inicializando...")
+            try:
+                self.embeddings = EmbeddingsConCache(crear_embeddings(RAG_EMBEDDINGS_BACKEND))
+                self.reindexar(estricto=False)
+                self.rag_chain = self._crear_cadena()
+            except Exception as e:
+                print(f"[RAGService] Error al inicializar RAG: {e}")
+
+            if self.rag_chain and self._indice:
+                self.estado = self.LISTO
+                print("[RAGService] Base de conocimiento indexada exitosamente.")
+            else:
+                self.estado = self.ERROR
+                print("[RAGService] ADVERTENCIA: No se pudo inicializar la cadena RAG.")
+
+    async def calentar(self) -> None:
+        """Versión asíncrona de 'inicializar': indexa en un hilo aparte."""
+        await asyncio.to_thread(self.inicializar)
+
+    def calentar_en_segundo_plano(self) -> None:
+        """Lanza 'calentar' sin esperar (una sola vez por proceso)."""
+        if self._tarea_calentar is None:
+            self._tarea_calentar = asyncio.create_task(self.calentar())
+
+    def estado_salud(self) -> dict:
+        return {
+            "estado": self.estado,
+            "fragmentos_indexados": self.vectorstore.index.ntotal if self.vectorstore else 0,
+            "huella": self._indice.huella if self._indice else None,
+            "ultimo_reindexado": self.ultimo_reindexado,
+        }
+
+    def _crear_cadena(self):
+        print("[RAGService] Inicializando modelo de lenguaje...")
+        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=OPENAI_API_KEY)
+
+        # --- INICIO DE LA CORRECCIÓN DEL PROMPT ---
+        template = (
+            "Eres un asistente de 'MiDiarioIA'. Tu objetivo es responder la 'Pregunta' del usuario usando *únicamente* la información del 'Contexto Provisto'.\n"
+            "Tu respuesta DEBE estar 100% basada en el contexto.\n\n"
+            "- **Si el contexto contiene información relevante** para responder la pregunta (aunque sea parcialmente), sintetiza una respuesta amable y directa. Combina la información si es necesario.\n"
+            "- **Si el contexto NO contiene información relevante** (o está vacío o no se relaciona con la pregunta), DEBES responder *exactamente* con la siguiente frase:\n"
+            "Lo siento, pero solo puedo ofrecer consejos sobre bienestar emocional y creatividad. No tengo información sobre ese tema.\n\n"
+            "--- Contexto Provisto ---\n"
+            "{context}\n"
+            "--- Fin del Contexto ---\n\n"
+            "Pregunta: {question}\n"
+            "Respuesta:"
+        )
+        # --- FIN DE LA CORRECCIÓN DEL PROMPT ---
+
+        prompt = ChatPromptTemplate.from_template(template)
+
+        return (
+            {"context": RunnableLambda(self._acontexto_consejos),
+             "question": RunnablePassthrough()}
+            | prompt
+            | llm
+            | StrOutputParser()
+        )
+
+    # ---------------------------------------------------------
+    # INDEXADO INCREMENTAL
+    # ---------------------------------------------------------
+    def reindexar(self, estricto: bool = True) -> dict:
+        """
+        Sincroniza el índice con app/kb. Cada entrada lleva la huella de su
+        contenido: las que ya estaban en el índice actual (o en el último
+        guardado en disco) reutilizan sus vectores y solo se embeben las
+        nuevas o modificadas. El índice nuevo se publica de golpe al final;
+        hasta entonces las consultas siguen usando el anterior.
+
+        Con 'estricto', un archivo que no se puede leer aborta el reindexado
+        (un JSON a medio guardar no debe borrar sus entradas del índice).
+        """
+        with self._lock_reindexado:
+            inicio = time.perf_counter()
+            entradas = self._leer_entradas(estricto)
+            if not entradas:
+                raise ValueError(f"No se encontró ninguna entrada en {KB_DIR}.")
+
+            huella = self._huella_kb(list(entradas))
+            actual = self._indice
+            if actual is not None and actual.huella == huella:
+                return self._registrar_reindexado("sin_cambios", huella, len(entradas), 0, 0, inicio)
+
+            nuevas = eliminadas = 0
+            vectorstore = self._cargar_indice(huella, self.embeddings)
+            if vectorstore is not None:
+                origen = "disco"
+            else:
+                origen = "incremental"
+                anterior = actual.vectorstore if actual else self._cargar_indice_reciente()
+                previos = self._vectores_por_entrada(anterior)
+                textos, vectores, metadatos, pendientes = [], [], [], []
+                for h, doc in entradas.items():
+                    if h in previos:
+                        for texto, vector in previos[h]:
+                            textos.append(texto)
+                            vectores.append(vector)
+                            metadatos.append(dict(doc.metadata))
+                    else:
+                        pendientes.append(doc)
+
+                if pendientes:
+                    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+                    chunks = splitter.split_documents(pendientes)
+                    print(f"[RAGService] Creando embeddings de {len(pendientes)} entradas ({len(chunks)} fragmentos)...")
+                    textos.extend(c.page_content for c in chunks)
+                    vectores.extend(self.embeddings.embed_documents([c.page_content for c in chunks]))
+                    metadatos.extend(c.metadata for c in chunks)
+
+                nuevas = len(pendientes)
+                eliminadas = len(set(previos) - set(entradas))
+                print("[RAGService] Creando índice FAISS...")
+                vectorstore = FAISS.from_embeddings(
+                    list(zip(textos, vectores)),
+                    self.embeddings,
+                    metadatas=metadatos,
+                    relevance_score_fn=_relevancia_coseno,
+                )
+                self._guardar_indice(huella, vectorstore)
+
+            # Publicación atómica: una sola asignación de la instantánea nueva.
+            self._indice = IndiceKB(vectorstore, huella)
+            # Índice nuevo: las respuestas cacheadas pueden estar obsoletas.
+            self.cache_respuestas.invalidar(huella)
+            if self.estado == self.ERROR and self.rag_chain:
+                self.estado = self.LISTO
+            return self._registrar_reindexado(origen, huella, len(entradas), nuevas, eliminadas, inicio)
+
+    async def areindexar(self) -> dict:
+        """Versión asíncrona de 'reindexar' (en un hilo: no bloquea el event loop)."""
+        return await asyncio.to_thread(self.reindexar)
+
+    def _registrar_reindexado(self, origen, huella, entradas, nuevas, eliminadas, inicio) -> dict:
+        self.ultimo_reindexado = {
+            "origen": origen,
+            "huella": huella,
+            "entradas": entradas,
+            "embebidas": nuevas,
+            "reutilizadas": entradas - nuevas if origen == "incremental" else entradas,
+            "eliminadas": eliminadas,
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "fecha": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        print(f"[RAGService] Reindexado ({origen}): {self.ultimo_reindexado}")
+        return self.ultimo_reindexado
+
+    @staticmethod
+    def _archivos_kb() -> List[str]:
+        return sorted(glob.glob(os.path.join(KB_DIR, "*.json")))
+
+    @staticmethod
+    def _ajustes_indice() -> str:
+        return json.dumps({
+            "formato": FORMATO_ENTRADA,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "embeddings": descripcion_embeddings(RAG_EMBEDDINGS_BACKEND),
+        }, sort_keys=True)
+
+    def _leer_entradas(self, estricto: bool) -> Dict[str, Document]:
+        """
+        Una Document por entrada de la KB ('titulo: contenido'), indexadas por
+        la huella de su texto y de los ajustes del índice (las duplicadas
+        exactas se indexan una sola vez).
+        """
+        print(f"[RAGService] Cargando documentos desde: {KB_DIR}")
+        ajustes = self._ajustes_indice()
+        entradas: Dict[str, Document] = {}
+        for file_path in self._archivos_kb():
+            print(f"[RAGService] Cargando archivo: {file_path}")
+            try:
+                with open(file_path, encoding="utf-8") as f:
+                    contenido = json.load(f)
+            except Exception as e:
+                if estricto:
+                    raise ValueError(f"No se pudo leer {file_path}: {e}") from e
+                print(f"[RAGService] Error cargando el archivo {file_path}: {e}")
+                continue
 
-    def _initialize_rag_chain(self):
+            for seq, entrada in enumerate(contenido.get("entradas", []), start=1):
+                texto = FORMATO_ENTRADA.format(
+                    titulo=entrada.get("titulo", ""), contenido=entrada.get("contenido", "")
+                )
+                h = hashlib.sha256(f"{ajustes}\n{texto}".encode()).hexdigest()[:32]
+                entradas.setdefault(h, Document(
+                    page_content=texto,
+                    metadata={"source": file_path, "seq": seq, "huella": h},
+                ))
+        return entradas
+
+    @staticmethod
+    def _vectores_por_entrada(vectorstore) -> Dict[str, list]:
+        """Fragmentos y vectores ya calculados de un índice, agrupados por huella de entrada."""
+        previos: Dict[str, list] = {}
+        if vectorstore is None:
+            return previos
+        for i in range(vectorstore.index.ntotal):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            h = doc.metadata.get("huella")
+            if h:
+                previos.setdefault(h, []).append((doc.page_content, vectorstore.index.reconstruct(i).tolist()))
+        return previos
+
+    # ---------------------------------------------------------
+    # VIGILANCIA DE app/kb
+    # ---------------------------------------------------------
+    def _firma_archivos(self) -> tuple:
+        firma = []
+        for file_path in self._archivos_kb():
+            try:
+                st = os.stat(file_path)
+                firma.append((file_path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                pass
+        return tuple(firma)
+
+    async def vigilar_kb(self, intervalo: float) -> None:
+        """
+        Sondea app/kb cada 'intervalo' segundos y reindexa cuando cambia algún
+        .json (fecha o tamaño). Sin dependencias extra; pensado para lanzarse
+        como tarea desde el lifespan.
+        """
+        firma = self._firma_archivos()
+        while True:
+            await asyncio.sleep(intervalo)
+            nueva = self._firma_archivos()
+            if nueva == firma or self.estado in (self.PENDIENTE, self.INICIALIZANDO):
+                continue
+            firma = nueva
+            try:
+                await self.areindexar()
+            except Exception as e:
+                print(f"[RAGService] Error reindexando tras un cambio en la KB (se mantiene el índice anterior): {e}")
+
+    # ---------------------------------------------------------
+    # PERSISTENCIA DEL ÍNDICE
+    # ---------------------------------------------------------
+    @staticmethod
+    def _huella_kb(huellas_entradas: List[str]) -> str:
+        """
+        Huella del índice completo: el conjunto de huellas de sus entradas
+        (que ya incluyen los ajustes del splitter y de los embeddings).
+        """
+        h = hashlib.sha256()
+        for huella in sorted(huellas_entradas):
+            h.update(huella.encode())
+        return h.hexdigest()[:32]
+
+    @staticmethod
+    def _cargar_indice(huella: str, embeddings):
+        ruta = os.path.join(RAG_INDEX_DIR, huella)
+        if not os.path.exists(os.path.join(ruta, "index.faiss")):
+            return None
         try:
-            if not os.path.exists(KB_DIR) or not os.listdir(KB_DIR):
-                print(f"[RAGService] ADVERTENCIA: El directorio '{KB_DIR}' está vacío o no existe.")
-                return None
-
-            print(f"[RAGService] Cargando documentos desde: {KB_DIR}")
-            
-            documents = []
-            json_files = glob.glob(os.path.join(KB_DIR, "*.json"))
-
-            if not json_files:
-                print(f"[RAGService] ADVERTENCIA: No se encontraron archivos .json en {KB_DIR}")
-                return None
-
-            for file_path in json_files:
-                print(f"[RAGService] Cargando archivo: {file_path}")
-                try:
-                    loader = JSONLoader(
-                        file_path=file_path,
-                        jq_schema=".entradas[] | .titulo + \": \" + .contenido",
-                        text_content=False
-                    )
-                    documents.extend(loader.load())
-                except Exception as e:
-                    print(f"[RAGService] Error cargando el archivo {file_path}: {e}")
-            
-            if not documents:
-                print("[RAGService] ADVERTENCIA: No se cargó ningún documento.")
-                return None
-
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-            docs = splitter.split_documents(documents)
-
-            print("[RAGService] Creando embeddings e índice FAISS...")
-            embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-            vectorstore = FAISS.from_documents(docs, embeddings)
-            retriever = vectorstore.as_retriever()
-
-            print("[RAGService] Inicializando modelo de lenguaje...")
-            llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=OPENAI_API_KEY)
-
-            # --- INICIO DE LA CORRECCIÓN DEL PROMPT ---
-            template = (
-                "Eres un asistente de 'MiDiarioIA'. Tu objetivo es responder la 'Pregunta' del usuario usando *únicamente* la información del 'Contexto Provisto'.\n"
-                "Tu respuesta DEBE estar 100% basada en el contexto.\n\n"
-                "- **Si el contexto contiene información relevante** para responder la pregunta (aunque sea parcialmente), sintetiza una respuesta amable y directa. Combina la información si es necesario.\n"
-                "- **Si el contexto NO contiene información relevante** (o está vacío o no se relaciona con la pregunta), DEBES responder *exactamente* con la siguiente frase:\n"
-                "Lo siento, pero solo puedo ofrecer consejos sobre bienestar emocional y creatividad. No tengo información sobre ese tema.\n\n"
-                "--- Contexto Provisto ---\n"
-                "{context}\n"
-                "--- Fin del Contexto ---\n\n"
-                "Pregunta: {question}\n"
-                "Respuesta:"
-            )
-            # --- FIN DE LA CORRECCIÓN DEL PROMPT ---
-            
-            prompt = ChatPromptTemplate.from_template(template)
-
-            def format_docs(docs):
-                return "\n\n".join([d.page_content for d in docs])
-
-            rag_chain = (
-                {"context": retriever | format_docs,
-                 "question": RunnablePassthrough()}
-                | prompt
-                | llm
-                | StrOutputParser()
+            print(f"[RAGService] Cargando índice FAISS desde disco ({huella})...")
+            # El índice lo escribe este mismo servicio, por eso se permite pickle.
+            return FAISS.load_local(
+                ruta, embeddings,
+                allow_dangerous_deserialization=True,
+                relevance_score_fn=_relevancia_coseno,
             )
+        except Exception as e:
+            print(f"[RAGService] No se pudo cargar el índice guardado, se reconstruye: {e}")
+            return None
+
+    def _cargar_indice_reciente(self):
+        """Último índice guardado (de otra versión de la KB), para reutilizar sus vectores."""
+        if not os.path.isdir(RAG_INDEX_DIR):
+            return None
+        guardados = [
+            os.path.join(RAG_INDEX_DIR, nombre)
+            for nombre in os.listdir(RAG_INDEX_DIR)
+            if ".tmp-" not in nombre and os.path.exists(os.path.join(RAG_INDEX_DIR, nombre, "index.faiss"))
+        ]
+        if not guardados:
+            return None
+        reciente = max(guardados, key=os.path.getmtime)
+        return self._cargar_indice(os.path.basename(reciente), self.embeddings)
 
-            return rag_chain
+    @staticmethod
+    def _guardar_indice(huella: str, vectorstore) -> None:
+        """
+        Guarda el índice en RAG_INDEX_DIR/<huella> (escritura atómica vía
+        directorio temporal + rename) y borra los índices de huellas antiguas.
+        """
+        try:
+            os.makedirs(RAG_INDEX_DIR, exist_ok=True)
+            ruta = os.path.join(RAG_INDEX_DIR, huella)
+            temporal = f"{ruta}.tmp-{os.getpid()}"
+            vectorstore.save_local(temporal)
+            if os.path.exists(ruta):
+                shutil.rmtree(temporal, ignore_errors=True)
+            else:
+                os.rename(temporal, ruta)
 
+            for nombre in os.listdir(RAG_INDEX_DIR):
+                if nombre != huella and ".tmp-" not in nombre:
+                    shutil.rmtree(os.path.join(RAG_INDEX_DIR, nombre), ignore_errors=True)
+            print(f"[RAGService] Índice FAISS guardado en {ruta}")
         except Exception as e:
-            print(f"[RAGService] Error al inicializar RAG: {e}")
-            return None
+            print(f"[RAGService] No se pudo guardar el índice en disco: {e}")
 
-    def query_rag(self, question: str) -> str:
-        if not self.rag_chain:
+    async def query_rag(self, question: str) -> str:
+        if not self.listo:
             return "No hay información contextual disponible."
 
         try:
+            if RAG_RECUPERACION == "bm25":
+                # Sin embeddings de consulta: la caché semántica los necesitaría.
+                print(f"[RAGService] Consultando RAG (bm25, sin caché) para: '{question}'")
+                return await self.rag_chain.ainvoke(question)
+
+            inicio = time.perf_counter()
+            # Versión del índice con la que se calcula la respuesta: si se
+            # reindexa mientras tanto, la caché no la guarda.
+            version = self._indice.huella
+            # El vector queda en la caché de embeddings: el retriever lo reutiliza.
+            vector = await self.embeddings.aembed_query(question)
+            cacheada = self.cache_respuestas.buscar(vector)
+            if cacheada is not None:
+                print(f"[RAGService] Respuesta desde caché semántica para: '{question}'")
+                return cacheada
+
             print(f"[RAGService] Consultando RAG para: '{question}'")
-            answer = self.rag_chain.invoke(question)
+            answer = await self.rag_chain.ainvoke(question)
+            self.cache_respuestas.guardar(
+                vector, answer, coste_ms=(time.perf_counter() - inicio) * 1000, version=version
+            )
             return answer
         except Exception as e:
             print(f"[RAGService] Error durante la consulta RAG: {e}")
             return "Error al consultar la base de conocimiento."
-        
-    def buscar_contexto(self, query: str) -> str:
+
+    # ---------------------------------------------------------
+    # RECUPERACIÓN HÍBRIDA (BM25 + VECTORES)
+    # ---------------------------------------------------------
+    @staticmethod
+    async def _candidatos_vector(indice: IndiceKB, query: str, n: int, umbral: Optional[float]) -> List[int]:
+        resultados = await indice.vectorstore.asimilarity_search_with_relevance_scores(query, k=n)
+        return [
+            indice.posicion[doc.page_content]
+            for doc, relevancia in resultados
+            if (umbral is None or relevancia >= umbral) and doc.page_content in indice.posicion
+        ]
+
+    @staticmethod
+    def _candidatos_bm25(indice: IndiceKB, query: str, n: int) -> List[int]:
+        return [i for i, _ in indice.bm25.buscar(query, n)]
+
+    async def _filtrar_relevantes(
+        self, indice: IndiceKB, query: str, posiciones: List[int], umbral: float
+    ) -> List[int]:
+        """
+        Suelo de relevancia tras la fusión: cada fragmento debe tener similitud
+        coseno >= 'umbral' con la consulta o una puntuación BM25 >=
+        RAG_BM25_MIN_PUNTAJE. Así un texto que solo comparte palabras sueltas
+        con la consulta no llega al prompt por el lado léxico.
+        """
+        if not posiciones:
+            return []
+        # El vector ya está en la caché de embeddings (lo calculó la búsqueda vectorial).
+        vector = await self.embeddings.aembed_query(query)
+        coseno = indice.relevancias(vector, posiciones)
+        bm25 = dict(indice.bm25.buscar(query, len(indice.fragmentos)))
+        return [
+            i for i in posiciones
+            if coseno[i] >= umbral or bm25.get(i, 0.0) >= RAG_BM25_MIN_PUNTAJE
+        ]
+
+    async def recuperar_fragmentos(
+        self,
+        query: str,
+        k: int = RAG_TOP_K,
+        umbral: Optional[float] = RAG_UMBRAL_RELEVANCIA,
+        modo: str = RAG_RECUPERACION,
+    ) -> List[str]:
+        """
+        Solo recuperación: devuelve el texto de los 'k' fragmentos más
+        relevantes, sin pasar por el LLM.
+
+        - "vector": similitud de embeddings (con 'umbral' de relevancia 0..1).
+        - "bm25": ranking léxico local, sin embeddings de la consulta.
+        - "hibrido": ambos rankings fusionados con Reciprocal Rank Fusion;
+          después se aplica el suelo de '_filtrar_relevantes' a todos los
+          fragmentos fusionados (también a los que solo encontró BM25).
+        Con 'umbral' None no se filtra nada.
+        """
+        # Toda la consulta usa la misma instantánea aunque se reindexe a la vez.
+        indice = self._indice
+        if indice is None:
+            if self.estado == self.PENDIENTE:
+                # Nadie lo calentó (p. ej. fuera de la app): arrancamos en segundo plano.
+                self.calentar_en_segundo_plano()
+            return []
+
+        n = max(k * 3, CANDIDATOS_MINIMOS)
+        if modo == "bm25":
+            rankings = [self._candidatos_bm25(indice, query, k)]
+        elif modo == "vector":
+            rankings = [await self._candidatos_vector(indice, query, k, umbral)]
+        else:
+            rankings = [
+                self._candidatos_bm25(indice, query, n),
+                await self._candidatos_vector(indice, query, n, None),
+            ]
+
+        fusion: dict = {}
+        for ranking in rankings:
+            for posicion, i in enumerate(ranking):
+                fusion[i] = fusion.get(i, 0.0) + 1.0 / (RRF_K + posicion + 1)
+
+        mejores = sorted(fusion, key=fusion.get, reverse=True)
+        if modo not in ("bm25", "vector") and umbral is not None:
+            mejores = await self._filtrar_relevantes(indice, query, mejores, umbral)
+        return [indice.fragmentos[i] for i in mejores[:k]]
+
+    async def _acontexto_consejos(self, question: str) -> str:
+        """Contexto para la cadena de /consejos (mismo recuperador, k=4, sin umbral)."""
+        return "\n\n".join(await self.recuperar_fragmentos(question, k=4, umbral=None))
+
+    async def buscar_contexto(self, query: str) -> str:
         """
-        Método simple usado por el ConversationalAgent para obtener contexto.
+        Método usado por el ConversationalAgent para obtener contexto.
+        Devuelve los fragmentos recuperados tal cual: el agente ya hace su
+        propia llamada al LLM, así que no sintetizamos una respuesta aquí
+        (eso queda para /consejos, vía 'query_rag').
         """
         try:
-            resultado = self.query_rag(query)
-            
-            # (MODIFICADO) Actualizamos el texto de fallback que buscamos
-            if not resultado or resultado.startswith("Lo siento, pero solo puedo") or resultado.startswith("No hay información"):
+            fragmentos = await self.recuperar_fragmentos(query)
+            if not fragmentos:
                 return ""
 
-            return resultado[:500]
+            return "\n\n".join(fragmentos)[:RAG_CONTEXTO_MAX_CARACTERES]
         except Exception as e:
             print(f"[RAGService] Error en buscar_contexto: {e}")
             return ""
 
 
-try:
-    rag_service_instance = RAGService()
-except Exception as e:
-    print(f"No se pudo inicializar RAGService: {e}")
-    rag_service_instance = None
\ No newline at end of file
+# Una única instancia por proceso, compartida por el agente y /consejos.
+_rag_service: Optional[RAGService] = None
+_rag_lock = threading.Lock()
+
+
+def get_rag_service() -> RAGService:
+    """
+    Devuelve el RAGService del proceso (sin indexar todavía si nadie lo ha
+    calentado). Crearlo es barato; la indexación ocurre en 'inicializar'.
+    """
+    global _rag_service
+    if _rag_service is None:
+        with _rag_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
+    return _rag_service
@@ -0,0 +1,119 @@
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core import estadisticas
+
+
+class SemanticCache:
+    """
+    Caché de respuestas indexada por el embedding de la consulta.
+
+    Una consulta es un acierto si su similitud coseno con alguna consulta
+    guardada (no expirada) es >= 'umbral'. Tamaño acotado: al llenarse se
+    reemplaza la entrada usada hace más tiempo (LRU). Cada entrada recuerda
+    cuánto costó calcularla, así que las estadísticas reportan también el
+    tiempo ahorrado por los aciertos.
+
+    'version' identifica los datos de los que salen las respuestas (p. ej. la
+    huella del índice de la KB): 'invalidar(version)' vacía la caché y la
+    cambia, y 'guardar' descarta las respuestas calculadas con otra versión
+    (una consulta que empezó antes de reindexar y termina después).
+    """
+
+    def __init__(self, nombre: str, umbral: float, max_items: int, ttl: float):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vectores: Optional[np.ndarray] = None
+        self._respuestas: List[Any] = []
+        self._creado: List[float] = []
+        self._usado: List[float] = []
+        self._coste_ms: List[float] = []
+        self.version: Optional[str] = None
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+        self.descartadas = 0
+        self.ms_ahorrados = 0.0
+        estadisticas.registrar(f"cache_semantica:{nombre}", self.estadisticas)
+
+    @staticmethod
+    def _normalizar(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norma = np.linalg.norm(v)
+        return v / norma if norma else v
+
+    def buscar(self, vector) -> Optional[Any]:
+        v = self._normalizar(vector)
+        ahora = time.monotonic()
+        with self._lock:
+            n = len(self._respuestas)
+            if n:
+                similitudes = self._vectores[:n] @ v
+                vigentes = np.asarray(self._creado) + self.ttl > ahora
+                similitudes = np.where(vigentes, similitudes, -1.0)
+                i = int(np.argmax(similitudes))
+                if similitudes[i] >= self.umbral:
+                    self._usado[i] = ahora
+                    self.aciertos += 1
+                    self.ms_ahorrados += self._coste_ms[i]
+                    return self._respuestas[i]
+            self.fallos += 1
+            return None
+
+    def guardar(self, vector, respuesta: Any, coste_ms: float = 0.0, version: Optional[str] = None) -> None:
+        v = self._normalizar(vector)
+        ahora = time.monotonic()
+        with self._lock:
+            if version != self.version:
+                self.descartadas += 1
+                return
+            n = len(self._respuestas)
+            if self._vectores is None:
+                self._vectores = np.zeros((self.max_items, v.shape[0]), dtype=np.float32)
+
+            if n < self.max_items:
+                i = n
+                self._respuestas.append(None)
+                self._creado.append(0.0)
+                self._usado.append(0.0)
+                self._coste_ms.append(0.0)
+            else:
+                # Primero las expiradas; si no hay, la menos usada recientemente.
+                expiradas = np.flatnonzero(np.asarray(self._creado) + self.ttl <= ahora)
+                i = int(expiradas[0]) if len(expiradas) else int(np.argmin(self._usado))
+
+            self._vectores[i] = v
+            self._respuestas[i] = respuesta
+            self._creado[i] = ahora
+            self._usado[i] = ahora
+            self._coste_ms[i] = coste_ms
+
+    def invalidar(self, version: Optional[str] = None) -> None:
+        """Vacía la caché y pasa a 'version' (p. ej. tras reconstruir el índice de la KB)."""
+        with self._lock:
+            self.version = version
+            self._vectores = None
+            self._respuestas, self._creado, self._usado, self._coste_ms = [], [], [], []
+            self.invalidaciones += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total = self.aciertos + self.fallos
+        return {
+            "tamano": len(self._respuestas),
+            "max_items": self.max_items,
+            "umbral_similitud": self.umbral,
+            "ttl_segundos": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "ms_ahorrados": round(self.ms_ahorrados, 1),
+            "invalidaciones": self.invalidaciones,
+            "descartadas_por_version": self.descartadas,
+            "version": self.version,
+        }
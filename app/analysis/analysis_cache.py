@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from app.core import estadisticas
+from app.core.config import ANALISIS_CACHE_RUTA, ANALISIS_CACHE_MAX, ANALISIS_CACHE_TTL_DIAS
+
+
+def normalizar_texto(texto: str) -> str:
+    """Unicode NFC y espacios simples: reenvíos con otro espaciado comparten clave."""
+    return " ".join(unicodedata.normalize("NFC", texto or "").split())
+
+
+def clave_analisis(texto: str, modelo: str, version_prompt: str) -> str:
+    """Hash del texto normalizado + modelo + versión del prompt."""
+    contenido = f"{modelo}\n{version_prompt}\n{normalizar_texto(texto)}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Caché persistente de resultados de análisis en SQLite (un archivo local,
+    compartido por los workers de la máquina gracias al modo WAL).
+
+    - Desalojo LRU: al superar 'max_items' se borran las menos usadas
+      (en bloque, un 10 % extra, para no borrar en cada inserción).
+    - Las entradas sin usar en 'ttl_dias' se consideran caducadas.
+    - Cualquier error de la caché se registra y se trata como un fallo:
+      nunca impide analizar.
+    Las operaciones se ejecutan en un hilo para no bloquear el event loop.
+    """
+
+    def __init__(self, ruta: str = ANALISIS_CACHE_RUTA, max_items: int = ANALISIS_CACHE_MAX,
+                 ttl_dias: float = ANALISIS_CACHE_TTL_DIAS):
+        self.ruta = ruta
+        self.max_items = max_items
+        self.ttl = ttl_dias * 86400 if ttl_dias > 0 else None
+        self._conexion: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.errores = 0
+        self.desalojados = 0
+        estadisticas.registrar("cache:analisis_diario", self.estadisticas)
+
+    @property
+    def activa(self) -> bool:
+        return bool(self.ruta)
+
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conexion is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            conexion = sqlite3.connect(self.ruta, timeout=5, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS analisis ("
+                " clave TEXT PRIMARY KEY, resultado TEXT NOT NULL,"
+                " creado REAL NOT NULL, usado REAL NOT NULL)"
+            )
+            conexion.execute("CREATE INDEX IF NOT EXISTS analisis_usado_idx ON analisis (usado)")
+            self._conexion = conexion
+        return self._conexion
+
+    def _obtener(self, clave: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            conexion = self._conectar()
+            fila = conexion.execute("SELECT resultado, usado FROM analisis WHERE clave = ?", (clave,)).fetchone()
+            ahora = time.time()
+            if fila is None or (self.ttl and fila[1] < ahora - self.ttl):
+                return None
+            conexion.execute("UPDATE analisis SET usado = ? WHERE clave = ?", (ahora, clave))
+            conexion.commit()
+            return json.loads(fila[0])
+
+    def _guardar(self, clave: str, resultado: Dict[str, Any]) -> None:
+        with self._lock:
+            conexion = self._conectar()
+            ahora = time.time()
+            conexion.execute(
+                "INSERT OR REPLACE INTO analisis (clave, resultado, creado, usado) VALUES (?, ?, ?, ?)",
+                (clave, json.dumps(resultado, ensure_ascii=False), ahora, ahora),
+            )
+            total = conexion.execute("SELECT COUNT(*) FROM analisis").fetchone()[0]
+            if total > self.max_items:
+                sobrantes = total - self.max_items + max(1, self.max_items // 10)
+                conexion.execute(
+                    "DELETE FROM analisis WHERE clave IN (SELECT clave FROM analisis ORDER BY usado LIMIT ?)",
+                    (sobrantes,),
+                )
+                self.desalojados += sobrantes
+            if self.ttl:
+                conexion.execute("DELETE FROM analisis WHERE usado < ?", (ahora - self.ttl,))
+            conexion.commit()
+
+    async def obtener(self, clave: str) -> Optional[Dict[str, Any]]:
+        if not self.activa:
+            return None
+        try:
+            resultado = await asyncio.to_thread(self._obtener, clave)
+        except Exception as e:
+            self.errores += 1
+            print(f"[AnalysisCache] Error al leer la caché: {e}")
+            return None
+        if resultado is None:
+            self.fallos += 1
+        else:
+            self.aciertos += 1
+        return resultado
+
+    async def guardar(self, clave: str, resultado: Dict[str, Any]) -> None:
+        if not self.activa:
+            return
+        try:
+            await asyncio.to_thread(self._guardar, clave, resultado)
+        except Exception as e:
+            self.errores += 1
+            print(f"[AnalysisCache] Error al escribir en la caché: {e}")
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = self.aciertos + self.fallos
+        return {
+            "activa": self.activa,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "ratio_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0,
+            "errores": self.errores,
+            "desalojados": self.desalojados,
+            "max_items": self.max_items,
+        }
@@ -1,18 +1,23 @@
 import os
-from openai import OpenAI
+import asyncio
+import hashlib
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
 import json
+from app.core import estadisticas
+from app.core.cache import TTLCache
 
 try:
-    from app.core.config import OPENAI_API_KEY
+    from app.core.config import OPENAI_API_KEY, DASHBOARD_RESUMEN_MAX, DASHBOARD_RESUMEN_TTL
 except ImportError:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    DASHBOARD_RESUMEN_MAX, DASHBOARD_RESUMEN_TTL = 5000, 7 * 86400
 
 if not OPENAI_API_KEY:
     raise ValueError("La variable de entorno OPENAI_API_KEY no está configurada.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
 # 1. Modelo de datos de Pydantic (sin cambios)
 class DashboardAnalysisResult(BaseModel):
@@ -48,7 +53,7 @@ genera una respuesta *únicamente* en formato JSON con las siguientes claves:
 
 
 # 3. Función principal del analizador (sin cambios)
-def analyze_dashboard_metrics(metrics: dict) -> Optional[dict]:
+async def analyze_dashboard_metrics(metrics: dict) -> Optional[dict]:
     """
     Analiza un diccionario de métricas (calculadas por metricas_service) 
     y genera un resumen de IA.
@@ -59,7 +64,7 @@ def analyze_dashboard_metrics(metrics: dict) -> Optional[dict]:
     metrics_json = json.dumps(metrics)
     
     try:
-        response = client.chat.completions.create(
+        response = await client.chat.completions.create(
             model="gpt-4o-mini",
             response_format={"type": "json_object"},
             messages=[
@@ -84,4 +89,96 @@ def analyze_dashboard_metrics(metrics: dict) -> Optional[dict]:
             "resumen_ia": "Aquí verás tu resumen emocional cuando escribas en tu diario.",
             "recomendacion_ia": "Intenta escribir cómo te sientes hoy para empezar.",
             "fuente_modelo": "fallback"
-        }
\ No newline at end of file
+        }
+
+
+# 4. Caché de resúmenes por huella de las métricas
+def huella_metricas(metricas: Dict[str, Any]) -> str:
+    """
+    Huella de lo que cambia el sentido del resumen: emoción principal, las
+    tres más frecuentes, interpretación, sentimiento en pasos de 0.1 y
+    número de entradas en escala logarítmica (1, 2-3, 4-7, 8-15...).
+    Una entrada más con la misma tendencia no cambia la huella.
+    """
+    conteo = metricas.get("conteo_emociones") or {}
+    significativo = {
+        "emocion": metricas.get("emocion_mas_frecuente"),
+        "principales": sorted(conteo, key=lambda e: (-conteo[e], e))[:3],
+        "interpretacion": metricas.get("interpretacion_sentimiento"),
+        "sentimiento": round(float(metricas.get("promedio_sentimiento_general") or 0.0), 1),
+        "entradas": int(metricas.get("total_entradas_diario") or 0).bit_length(),
+    }
+    return hashlib.sha1(json.dumps(significativo, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResumenesDashboard:
+    """
+    Resumen de IA del dashboard por usuario, con stale-while-revalidate:
+
+    - misma huella de métricas → se devuelve el resumen guardado (sin LLM);
+    - huella distinta → se devuelve el resumen anterior y se regenera en
+      segundo plano (una sola regeneración por usuario a la vez);
+    - sin resumen → se busca el precalculado por el job nocturno (si se
+      pasa 'cargar_precalculado') y, si tampoco hay, se genera en la petición.
+    Los resúmenes de respaldo (fallo de la IA) no se guardan.
+    """
+
+    def __init__(self, max_items: int = DASHBOARD_RESUMEN_MAX, ttl: float = DASHBOARD_RESUMEN_TTL):
+        self._cache = TTLCache("resumenes_dashboard", max_items=max_items, ttl=ttl)
+        self._regenerando: Dict[str, asyncio.Task] = {}
+        self._contadores = {"vigentes": 0, "obsoletos": 0, "precalculados": 0, "generados": 0, "regenerados": 0}
+        estadisticas.registrar("resumenes_dashboard", self.estadisticas)
+
+    async def obtener(
+        self,
+        usuario_id: str,
+        metricas: Dict[str, Any],
+        cargar_precalculado: Optional[Callable[[], Awaitable[Optional[Dict[str, Any]]]]] = None,
+    ) -> Dict[str, Any]:
+        huella = huella_metricas(metricas)
+        guardado = self._cache.get(usuario_id)
+        if guardado is None and cargar_precalculado is not None:
+            guardado = await cargar_precalculado()
+            if guardado:
+                self._contadores["precalculados"] += 1
+                self._cache.set(usuario_id, guardado)
+
+        if guardado and guardado["huella"] == huella:
+            self._contadores["vigentes"] += 1
+            return guardado["resumen"]
+
+        if guardado:
+            self._contadores["obsoletos"] += 1
+            self._regenerar_en_segundo_plano(usuario_id, metricas, huella)
+            return guardado["resumen"]
+
+        self._contadores["generados"] += 1
+        return await self._generar(usuario_id, metricas, huella)
+
+    async def _generar(self, usuario_id: str, metricas: Dict[str, Any], huella: str) -> Dict[str, Any]:
+        resumen = await analyze_dashboard_metrics(metricas)
+        if resumen.get("fuente_modelo") != "fallback":
+            self._cache.set(usuario_id, {"huella": huella, "resumen": resumen})
+        return resumen
+
+    def _regenerar_en_segundo_plano(self, usuario_id: str, metricas: Dict[str, Any], huella: str) -> None:
+        if usuario_id in self._regenerando:
+            return
+        self._contadores["regenerados"] += 1
+        tarea = asyncio.create_task(self._generar(usuario_id, metricas, huella))
+        self._regenerando[usuario_id] = tarea
+        tarea.add_done_callback(lambda _: self._regenerando.pop(usuario_id, None))
+
+    def invalidar(self, usuario_id: str) -> None:
+        self._cache.invalidar(usuario_id)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            **self._contadores,
+            "regenerando": len(self._regenerando),
+            "guardados": len(self._cache),
+        }
+
+
+# Un almacén por proceso (lo usa /dashboard).
+resumenes_dashboard = ResumenesDashboard()
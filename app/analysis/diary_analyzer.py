@@ -1,22 +1,32 @@
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 from pydantic import BaseModel, Field
 from typing import Optional
 import json
+from app.analysis.analysis_cache import AnalysisCache, clave_analisis
+from app.analysis.sentiment_lexicon import VERSION_LEXICO, puntuar_texto
 
 # Importamos la configuración para obtener la API key
 # Asumiremos que tienes un archivo config.py en app/core/
 # Si no lo tienes, asegúrate de cargar la variable de entorno OPENAI_API_KEY
 try:
-    from app.core.config import OPENAI_API_KEY
+    from app.core.config import OPENAI_API_KEY, ANALISIS_SENTIMIENTO
 except ImportError:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    ANALISIS_SENTIMIENTO = "local"
 
 # Inicializamos el cliente de OpenAI
 if not OPENAI_API_KEY:
     raise ValueError("La variable de entorno OPENAI_API_KEY no está configurada.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+MODELO = "gpt-4o-mini"
+# Súbela al cambiar SYSTEM_PROMPT o DiaryAnalysisResult: invalida la caché de análisis.
+PROMPT_VERSION = "1"
+
+# Resultados ya calculados (re-envíos, reintentos, backfill) → sin llamar a OpenAI.
+cache_analisis = AnalysisCache()
 # 1. MODELO DE DATOS DE SALIDA (SCHEMA)# Definimos una estructura Pydantic. OpenAI usará esto para
 # garantizarnos que la salida de la IA siempre sea un JSON válido
 # que coincide con lo que nuestra base de datos espera.
@@ -57,25 +67,58 @@ definida por el siguiente esquema:
 
 {DiaryAnalysisResult.schema_json(indent=2)}
 """
+
+# Con ANALISIS_SENTIMIENTO = "local" la emoción y el puntaje los calcula el
+# léxico (sentiment_lexicon) y al modelo solo se le pide el resumen.
+class DiarySummaryResult(BaseModel):
+    resumen_ia: str = Field(
+        description="Un resumen conciso de 2 o 3 frases de la entrada del diario."
+    )
+
+SYSTEM_PROMPT_RESUMEN = f"""
+Eres 'Auri', un asistente de IA especializado en bienestar emocional.
+Resume en 2 o 3 frases, con un tono cálido, lo que el usuario escribió en su diario.
+
+Responde *únicamente* con un objeto JSON válido que siga este esquema:
+
+{DiarySummaryResult.schema_json(indent=2)}
+"""
 # 3. FUNCIÓN PRINCIPAL DEL ANALIZADOR
-def analyze_diary_content(texto: str) -> Optional[dict]:
+async def analyze_diary_content(texto: str, respaldo_local: bool = True) -> Optional[dict]:
     """
     Analiza el contenido de una entrada de diario usando OpenAI en modo JSON.
 
+    Con ANALISIS_SENTIMIENTO = "local" (por defecto) la emoción, la categoría
+    y el puntaje salen del léxico local (microsegundos) y OpenAI solo
+    genera 'resumen_ia'. Con "llm", el modelo lo calcula todo.
+
     Args:
         texto: El contenido completo de la entrada del diario del usuario.
+        respaldo_local: si OpenAI falla, devolver igualmente el análisis
+            local (con resumen_ia = None y fuente_modelo = VERSION_LEXICO)
+            en lugar de None.
 
     Returns:
         Un diccionario con los campos de DiaryAnalysisResult, o None si falla.
+        Si el mismo texto ya se analizó (mismo modelo y PROMPT_VERSION), se
+        devuelve el resultado guardado en 'cache_analisis'.
     """
+    local = ANALISIS_SENTIMIENTO == "local"
+    version = f"{PROMPT_VERSION}:{VERSION_LEXICO}" if local else PROMPT_VERSION
+    clave = clave_analisis(texto, MODELO, version)
+    cacheado = await cache_analisis.obtener(clave)
+    if cacheado is not None:
+        print(f"[AnalysisService] Análisis desde caché para texto: {texto[:50]}...")
+        return cacheado
+
     print(f"[AnalysisService] Iniciando análisis para texto: {texto[:50]}...")
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        response = await client.chat.completions.create(
+            model=MODELO,
             response_format={"type": "json_object"},
             messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "system", "content": SYSTEM_PROMPT_RESUMEN if local else SYSTEM_PROMPT},
                 {"role": "user", "content": texto}
             ],
             temperature=0.5
@@ -84,15 +127,30 @@ def analyze_diary_content(texto: str) -> Optional[dict]:
         # Extraemos el contenido JSON de la respuesta
         analysis_json = response.choices[0].message.content
         
-        # Validamos y parseamos el JSON usando nuestro modelo Pydantic
-        analysis_data = DiaryAnalysisResult.parse_raw(analysis_json)
-        
-        print(f"[AnalysisService] Análisis completado: {analysis_data.emocion_predominante}")
-        
-        # Convertimos el modelo Pydantic de nuevo a un diccionario
-        # para que el servicio de base de datos pueda usarlo.
-        return analysis_data.dict()
+        if local:
+            resumen = DiarySummaryResult.parse_raw(analysis_json)
+            resultado = {
+                "resumen_ia": resumen.resumen_ia,
+                **puntuar_texto(texto),
+                "fuente_modelo": f"{MODELO}+{VERSION_LEXICO}",
+            }
+        else:
+            # Validamos y parseamos el JSON usando nuestro modelo Pydantic
+            analysis_data = DiaryAnalysisResult.parse_raw(analysis_json)
+            # Convertimos el modelo Pydantic de nuevo a un diccionario
+            # para que el servicio de base de datos pueda usarlo.
+            resultado = analysis_data.dict()
+
+        print(f"[AnalysisService] Análisis completado: {resultado['emocion_predominante']}")
+        await cache_analisis.guardar(clave, resultado)
+        return resultado
 
     except Exception as e:
         print(f"Error al analizar la entrada del diario: {e}")
-        return None
\ No newline at end of file
+        if respaldo_local:
+            # Sin OpenAI: al menos emoción y puntaje. No se cachea y queda
+            # marcado con fuente_modelo = VERSION_LEXICO para que el backfill
+            # (--tabla resumenes) pida después el resumen.
+            print("[AnalysisService] Usando el análisis local como respaldo (sin resumen).")
+            return {"resumen_ia": None, **puntuar_texto(texto), "fuente_modelo": VERSION_LEXICO}
+        return None
@@ -0,0 +1,219 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Súbela al cambiar el léxico o las reglas: forma parte de la clave de la caché de análisis.
+VERSION_LEXICO = "lexicon-es-v1"
+
+EMOCIONES = [
+    "Alegría", "Gratitud", "Calma", "Amor", "Esperanza",
+    "Tristeza", "Ansiedad", "Miedo", "Enojo", "Frustración", "Cansancio", "Soledad",
+]
+_EMOCION = {nombre: i for i, nombre in enumerate(EMOCIONES)}
+
+# Raíz (texto normalizado: minúsculas, sin tildes, ñ → n) → (polaridad -1..1, emoción).
+# Se busca el prefijo más largo de cada palabra, así "trist" cubre triste,
+# tristeza, entristecí...
+RAICES: Dict[str, Tuple[float, str]] = {
+    # Alegría
+    "felic": (0.8, "Alegría"), "alegr": (0.8, "Alegría"), "content": (0.6, "Alegría"),
+    "encant": (0.7, "Alegría"), "divert": (0.6, "Alegría"), "disfrut": (0.7, "Alegría"),
+    "emocionad": (0.6, "Alegría"), "entusiasm": (0.7, "Alegría"), "ilusion": (0.6, "Alegría"),
+    "maravill": (0.8, "Alegría"), "excelent": (0.8, "Alegría"), "fantast": (0.8, "Alegría"),
+    "orgullos": (0.7, "Alegría"), "satisfech": (0.6, "Alegría"), "satisfac": (0.6, "Alegría"),
+    "logr": (0.5, "Alegría"), "exit": (0.5, "Alegría"), "celebr": (0.6, "Alegría"),
+    "sonri": (0.5, "Alegría"), "sonre": (0.5, "Alegría"), "buen": (0.3, "Alegría"),
+    "mejor": (0.4, "Alegría"), "perfect": (0.6, "Alegría"), "lind": (0.5, "Alegría"),
+    "bonit": (0.5, "Alegría"), "hermos": (0.6, "Alegría"), "gust": (0.4, "Alegría"),
+    "chever": (0.6, "Alegría"), "bacan": (0.6, "Alegría"), "genial": (0.7, "Alegría"),
+    # Gratitud
+    "graci": (0.6, "Gratitud"), "agradec": (0.7, "Gratitud"), "bendec": (0.6, "Gratitud"),
+    "bendic": (0.6, "Gratitud"), "afortunad": (0.6, "Gratitud"),
+    # Calma
+    "tranquil": (0.5, "Calma"), "calm": (0.5, "Calma"), "relaj": (0.5, "Calma"),
+    "seren": (0.5, "Calma"), "descans": (0.4, "Calma"), "alivi": (0.5, "Calma"),
+    "equilibr": (0.4, "Calma"),
+    # Amor
+    "amor": (0.7, "Amor"), "ador": (0.6, "Amor"), "carin": (0.6, "Amor"), "abraz": (0.5, "Amor"),
+    "enamor": (0.7, "Amor"), "apoy": (0.4, "Amor"),
+    # Esperanza
+    "esperanz": (0.6, "Esperanza"), "optimis": (0.6, "Esperanza"), "motivad": (0.6, "Esperanza"),
+    "motivac": (0.5, "Esperanza"), "animad": (0.4, "Esperanza"), "confian": (0.5, "Esperanza"),
+    # Tristeza
+    "trist": (-0.7, "Tristeza"), "llor": (-0.6, "Tristeza"), "deprim": (-0.8, "Tristeza"),
+    "depres": (-0.8, "Tristeza"), "desanim": (-0.6, "Tristeza"), "decepcion": (-0.6, "Tristeza"),
+    "melancol": (-0.6, "Tristeza"), "nostalg": (-0.3, "Tristeza"), "vaci": (-0.4, "Tristeza"),
+    "dolor": (-0.6, "Tristeza"), "doli": (-0.5, "Tristeza"), "duel": (-0.5, "Tristeza"),
+    "perdi": (-0.3, "Tristeza"), "extran": (-0.4, "Tristeza"), "infeli": (-0.8, "Tristeza"),
+    "desesper": (-0.8, "Tristeza"), "destroz": (-0.7, "Tristeza"), "horribl": (-0.8, "Tristeza"),
+    "terribl": (-0.8, "Tristeza"), "pesim": (-0.6, "Tristeza"), "fracas": (-0.7, "Tristeza"),
+    "culpa": (-0.6, "Tristeza"), "arrepent": (-0.5, "Tristeza"), "verguenz": (-0.6, "Tristeza"),
+    "sufr": (-0.7, "Tristeza"), "lastim": (-0.5, "Tristeza"), "herid": (-0.5, "Tristeza"),
+    "falleci": (-0.7, "Tristeza"), "suicid": (-1.0, "Tristeza"), "morir": (-0.8, "Tristeza"),
+    "muert": (-0.6, "Tristeza"),
+    # Ansiedad
+    "ansi": (-0.7, "Ansiedad"), "estres": (-0.6, "Ansiedad"), "nervios": (-0.5, "Ansiedad"),
+    "agobi": (-0.7, "Ansiedad"), "abrum": (-0.7, "Ansiedad"), "presion": (-0.5, "Ansiedad"),
+    "preocup": (-0.6, "Ansiedad"), "inquiet": (-0.5, "Ansiedad"), "angusti": (-0.7, "Ansiedad"),
+    "panic": (-0.8, "Ansiedad"), "insomn": (-0.5, "Ansiedad"), "tension": (-0.5, "Ansiedad"),
+    "insegur": (-0.5, "Ansiedad"), "desbord": (-0.6, "Ansiedad"), "colaps": (-0.6, "Ansiedad"),
+    # Miedo
+    "mied": (-0.7, "Miedo"), "asust": (-0.6, "Miedo"), "temor": (-0.6, "Miedo"),
+    "aterr": (-0.8, "Miedo"), "pavor": (-0.8, "Miedo"),
+    # Enojo
+    "enoj": (-0.7, "Enojo"), "enfad": (-0.7, "Enojo"), "molest": (-0.5, "Enojo"),
+    "rabi": (-0.7, "Enojo"), "furi": (-0.8, "Enojo"), "irrit": (-0.6, "Enojo"),
+    "indign": (-0.6, "Enojo"), "hart": (-0.6, "Enojo"), "fastidi": (-0.5, "Enojo"),
+    # Frustración
+    "frustr": (-0.7, "Frustración"), "impoten": (-0.6, "Frustración"), "bloquead": (-0.4, "Frustración"),
+    "atascad": (-0.4, "Frustración"), "estancad": (-0.5, "Frustración"), "inutil": (-0.6, "Frustración"),
+    # Cansancio
+    "cansad": (-0.5, "Cansancio"), "cansanc": (-0.5, "Cansancio"), "agotad": (-0.6, "Cansancio"),
+    "agotamient": (-0.6, "Cansancio"), "exhaust": (-0.6, "Cansancio"), "aburr": (-0.4, "Cansancio"),
+    "desmotiv": (-0.6, "Cansancio"),
+    # Soledad
+    "soled": (-0.6, "Soledad"), "aislad": (-0.5, "Soledad"), "abandon": (-0.6, "Soledad"),
+    "rechaz": (-0.5, "Soledad"), "ignorad": (-0.4, "Soledad"),
+}
+
+# Palabras cortas o ambiguas como prefijo: solo coinciden completas.
+EXACTAS: Dict[str, Tuple[float, str]] = {
+    "feliz": (0.8, "Alegría"), "bien": (0.4, "Alegría"), "risa": (0.5, "Alegría"),
+    "paz": (0.6, "Calma"), "animo": (0.4, "Esperanza"), "capaz": (0.4, "Esperanza"),
+    "mal": (-0.6, "Tristeza"), "malo": (-0.6, "Tristeza"), "mala": (-0.6, "Tristeza"),
+    "peor": (-0.6, "Tristeza"), "fatal": (-0.7, "Tristeza"), "pena": (-0.5, "Tristeza"),
+    "roto": (-0.5, "Tristeza"), "rota": (-0.5, "Tristeza"), "odio": (-0.8, "Enojo"),
+    "odia": (-0.8, "Enojo"), "ira": (-0.7, "Enojo"), "temo": (-0.6, "Miedo"),
+}
+
+NEGADORES = frozenset({"no", "nunca", "jamas", "ni", "tampoco", "sin", "nada"})
+MODIFICADORES = {
+    "muy": 1.5, "super": 1.5, "demasiado": 1.5, "tan": 1.3, "bastante": 1.3, "realmente": 1.3,
+    "totalmente": 1.4, "sumamente": 1.6, "extremadamente": 1.7, "increiblemente": 1.5,
+    "poco": 0.5, "algo": 0.6, "ligeramente": 0.5, "medio": 0.6,
+}
+CONTRASTE = frozenset({"pero", "aunque"})
+
+VENTANA_NEGACION = 3       # palabras afectadas por "no", "nunca"...
+VENTANA_MODIFICADOR = 2    # palabras hasta las que llega "muy", "poco"...
+FACTOR_NEGACION = -0.6     # "no estoy feliz" es negativo, pero menos que "estoy triste"
+ALFA = 1.0                 # normalización x / sqrt(x² + ALFA) → -1..1
+UMBRAL_NEUTRO = 0.2        # |puntaje| por debajo → 'neutra'
+_LONGITUD_RAIZ = (min(map(len, RAICES)), max(map(len, RAICES)))
+
+
+def _tokenizar(texto: str) -> List[str]:
+    texto = unicodedata.normalize("NFKD", (texto or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", texto)
+
+
+@lru_cache(maxsize=50000)
+def _buscar(palabra: str) -> Optional[Tuple[float, int]]:
+    """Entrada del léxico para una palabra: exacta o por el prefijo más largo."""
+    entrada = EXACTAS.get(palabra)
+    if entrada is None:
+        minimo, maximo = _LONGITUD_RAIZ
+        for n in range(min(len(palabra), maximo), minimo - 1, -1):
+            entrada = RAICES.get(palabra[:n])
+            if entrada is not None:
+                break
+    if entrada is None:
+        return None
+    return entrada[0], _EMOCION[entrada[1]]
+
+
+def _aportes(texto: str) -> List[Tuple[float, int, float]]:
+    """
+    (polaridad ponderada, índice de emoción o -1, peso) de cada palabra del
+    léxico, aplicando negación, intensificadores y contraste ("pero": lo que
+    va después pesa más que lo anterior).
+    """
+    aportes: List[Tuple[float, int, float]] = []
+    negacion = 0
+    intensidad, alcance = 1.0, 0
+    contraste = 1.0
+    for palabra in _tokenizar(texto):
+        if palabra in NEGADORES:
+            negacion = VENTANA_NEGACION
+            continue
+        if palabra in MODIFICADORES:
+            intensidad, alcance = intensidad * MODIFICADORES[palabra], VENTANA_MODIFICADOR
+            continue
+        if palabra in CONTRASTE:
+            aportes = [(p * 0.5, e, w * 0.5) for p, e, w in aportes]
+            contraste = 1.5
+            continue
+
+        entrada = _buscar(palabra)
+        if entrada is not None:
+            polaridad, emocion = entrada
+            peso = contraste * (intensidad if alcance else 1.0)
+            if negacion:
+                # La palabra negada cuenta para la polaridad, no como emoción.
+                polaridad, emocion = polaridad * FACTOR_NEGACION, -1
+            aportes.append((polaridad * peso, emocion, abs(polaridad) * peso))
+            intensidad, alcance = 1.0, 0
+        elif alcance:
+            alcance -= 1
+            if not alcance:
+                intensidad = 1.0
+        if negacion:
+            negacion -= 1
+    return aportes
+
+
+def puntuar_lote(textos: Sequence[str]) -> List[dict]:
+    """
+    Sentimiento y emoción de varios textos. El recorrido de palabras es por
+    texto; la agregación (suma de polaridades, normalización, emoción
+    dominante y categoría) se hace vectorizada con numpy para todo el lote.
+
+    Devuelve, por texto, los campos de DiaryAnalysisResult salvo 'resumen_ia'.
+    """
+    n = len(textos)
+    if n == 0:
+        return []
+
+    documentos, polaridades, emociones, pesos = [], [], [], []
+    for i, texto in enumerate(textos):
+        for polaridad, emocion, peso in _aportes(texto):
+            documentos.append(i)
+            polaridades.append(polaridad)
+            emociones.append(emocion)
+            pesos.append(peso)
+
+    documentos = np.asarray(documentos, dtype=np.int64)
+    emociones = np.asarray(emociones, dtype=np.int64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+
+    suma = np.bincount(documentos, weights=np.asarray(polaridades, dtype=np.float64), minlength=n)
+    puntajes = suma / np.sqrt(suma * suma + ALFA)
+
+    matriz = np.zeros((n, len(EMOCIONES)))
+    con_emocion = emociones >= 0
+    np.add.at(matriz, (documentos[con_emocion], emociones[con_emocion]), pesos[con_emocion])
+    dominante = matriz.argmax(axis=1)
+    hay_emocion = matriz.max(axis=1) > 0
+
+    categorias = np.where(puntajes > UMBRAL_NEUTRO, "positiva",
+                          np.where(puntajes < -UMBRAL_NEUTRO, "negativa", "neutra"))
+    por_defecto = {"positiva": "Alegría", "negativa": "Tristeza", "neutra": "Neutral"}
+
+    return [
+        {
+            "emocion_predominante": EMOCIONES[dominante[i]] if hay_emocion[i] else por_defecto[categorias[i]],
+            "categoria_emocional": str(categorias[i]),
+            "promedio_sentimiento": round(float(puntajes[i]), 3),
+            "fuente_modelo": VERSION_LEXICO,
+        }
+        for i in range(n)
+    ]
+
+
+def puntuar_texto(texto: str) -> dict:
+    """Versión de 'puntuar_lote' para un solo texto."""
+    return puntuar_lote([texto])[0]
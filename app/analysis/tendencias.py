@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+GRANULARIDADES = ("dia", "semana", "mes")
+CATEGORIAS = ("positiva", "neutra", "negativa")
+
+
+@dataclass
+class Columnas:
+    """
+    Filas (entradas de diario y mensajes de chat) en formato columnar: un
+    array por campo, todos de la misma longitud.
+    """
+    fechas: np.ndarray      # datetime64[D]
+    puntajes: np.ndarray    # float64, NaN si la fila no tiene puntaje
+    emociones: np.ndarray   # int64, índice en 'nombres_emociones' o -1
+    categorias: np.ndarray  # int64, índice en CATEGORIAS o -1
+    nombres_emociones: List[str]
+
+    @classmethod
+    def desde_filas(cls, fechas: Sequence[str], puntajes: Sequence[Optional[float]],
+                    emociones: Sequence[Optional[str]], categorias: Sequence[Optional[str]]) -> "Columnas":
+        """Convierte las listas leídas de la BD (fechas ISO, textos, None) en arrays."""
+        dias = np.array([f[:10] for f in fechas], dtype="datetime64[D]")
+        valores = np.array([np.nan if p is None else p for p in puntajes], dtype=np.float64)
+
+        textos = np.array([(e or "").lower() for e in emociones])
+        nombres, codigos = np.unique(textos, return_inverse=True) if len(textos) else (np.array([]), np.array([], dtype=np.int64))
+        nombres = [str(x) for x in nombres]
+        if "" in nombres:
+            vacio = nombres.index("")
+            codigos = np.where(codigos == vacio, -1, codigos - (codigos > vacio))
+            nombres.pop(vacio)
+
+        indice_categoria = {c: i for i, c in enumerate(CATEGORIAS)}
+        cats = np.array([indice_categoria.get((c or "").lower(), -1) for c in categorias], dtype=np.int64)
+        return cls(dias, valores, codigos.astype(np.int64), cats, nombres)
+
+    def __len__(self) -> int:
+        return len(self.fechas)
+
+
+def _lunes(dias: np.ndarray) -> np.ndarray:
+    """Lunes de la semana de cada día (el 1970-01-01 fue jueves)."""
+    n = dias.astype(np.int64)
+    return (n - (n + 3) % 7).astype("datetime64[D]")
+
+
+def _etiqueta_semana_iso(lunes: np.datetime64) -> str:
+    iso = date.fromisoformat(str(lunes)).isocalendar()
+    return f"{iso[0]}-W{iso[1]:02d}"
+
+
+def _periodos(desde: np.datetime64, hasta: np.datetime64, granularidad: str) -> np.ndarray:
+    """Inicio de cada periodo entre 'desde' y 'hasta', sin huecos."""
+    if granularidad == "dia":
+        return np.arange(desde, hasta + 1, dtype="datetime64[D]")
+    if granularidad == "semana":
+        return np.arange(_lunes(np.array([desde]))[0], hasta + 1, 7, dtype="datetime64[D]")
+    meses = np.arange(desde.astype("datetime64[M]"), hasta.astype("datetime64[M]") + 1, dtype="datetime64[M]")
+    return meses.astype("datetime64[D]")
+
+
+def _indice_periodo(dias: np.ndarray, inicio: np.datetime64, granularidad: str) -> np.ndarray:
+    """Posición del periodo de cada día (aritmética sobre el array, sin bucles)."""
+    if granularidad == "dia":
+        return (dias - inicio).astype(np.int64)
+    if granularidad == "semana":
+        return ((_lunes(dias) - inicio).astype(np.int64)) // 7
+    return (dias.astype("datetime64[M]") - inicio.astype("datetime64[M]")).astype(np.int64)
+
+
+def numero_periodos(desde: date, hasta: date, granularidad: str) -> int:
+    return len(_periodos(np.datetime64(desde, "D"), np.datetime64(hasta, "D"), granularidad))
+
+
+def calcular_tendencias(columnas: Columnas, desde: date, hasta: date,
+                        granularidad: str = "semana", ventana: int = 4) -> List[Dict[str, Any]]:
+    """
+    Agrupa las filas por día, semana ISO o mes entre 'desde' y 'hasta'
+    (ambos incluidos) y devuelve un periodo por elemento, también los vacíos:
+
+    - n: filas del periodo; promedio_sentimiento (None sin puntajes);
+    - media_movil: promedio de los puntajes de los últimos 'ventana' periodos
+      (ponderado por nº de puntajes, así los periodos vacíos no lo arrastran);
+    - emociones y categorias: conteos del periodo.
+
+    Todo se calcula con operaciones de NumPy sobre los arrays (bincount,
+    cumsum), sin recorrer las filas en Python.
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f"Granularidad no válida: {granularidad}")
+    d, h = np.datetime64(desde, "D"), np.datetime64(hasta, "D")
+    inicios = _periodos(d, h, granularidad)
+    p = len(inicios)
+
+    dentro = (columnas.fechas >= d) & (columnas.fechas <= h)
+    idx = _indice_periodo(columnas.fechas[dentro], inicios[0], granularidad)
+    puntajes = columnas.puntajes[dentro]
+    emociones = columnas.emociones[dentro]
+    categorias = columnas.categorias[dentro]
+
+    n = np.bincount(idx, minlength=p)
+    con_puntaje = ~np.isnan(puntajes)
+    sumas = np.bincount(idx[con_puntaje], weights=puntajes[con_puntaje], minlength=p)
+    cuentas = np.bincount(idx[con_puntaje], minlength=p).astype(np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        promedio = sumas / cuentas
+        # Suma móvil con cumsum: periodos [i - ventana + 1, i].
+        ventana = max(1, ventana)
+        acum_s = np.concatenate(([0.0], np.cumsum(sumas)))
+        acum_c = np.concatenate(([0.0], np.cumsum(cuentas)))
+        desde_i = np.maximum(np.arange(p) + 1 - ventana, 0)
+        movil = (acum_s[1:] - acum_s[desde_i]) / (acum_c[1:] - acum_c[desde_i])
+
+    k = len(columnas.nombres_emociones)
+    con_emocion = emociones >= 0
+    matriz_emociones = np.bincount(idx[con_emocion] * k + emociones[con_emocion], minlength=p * k).reshape(p, k) \
+        if k else np.zeros((p, 0), dtype=np.int64)
+    con_categoria = categorias >= 0
+    matriz_categorias = np.bincount(idx[con_categoria] * len(CATEGORIAS) + categorias[con_categoria],
+                                    minlength=p * len(CATEGORIAS)).reshape(p, len(CATEGORIAS))
+
+    if granularidad == "dia":
+        etiquetas = [str(x) for x in inicios]
+    elif granularidad == "semana":
+        etiquetas = [_etiqueta_semana_iso(x) for x in inicios]
+    else:
+        etiquetas = [str(x.astype("datetime64[M]")) for x in inicios]
+
+    nombres = columnas.nombres_emociones
+    resultado = []
+    for i in range(p):
+        fila_emociones = matriz_emociones[i]
+        resultado.append({
+            "periodo": etiquetas[i],
+            "inicio": str(inicios[i]),
+            "n": int(n[i]),
+            "promedio_sentimiento": None if np.isnan(promedio[i]) else round(float(promedio[i]), 3),
+            "media_movil": None if np.isnan(movil[i]) else round(float(movil[i]), 3),
+            "emociones": {nombres[j]: int(fila_emociones[j]) for j in np.flatnonzero(fila_emociones)},
+            "categorias": {CATEGORIAS[j]: int(c) for j, c in enumerate(matriz_categorias[i]) if c},
+        })
+    return resultado
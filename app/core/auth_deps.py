@@ -1,33 +1,85 @@
-from fastapi import Depends, HTTPException, status
+import time
+import hashlib
+import hmac
+import jwt
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.core.database import supabase
+from starlette.concurrency import run_in_threadpool
+from app.core.database import get_supabase
+from app.core.config import AUTH_VERIFICACION, CACHE_TOKENS_MAX, CACHE_TOKENS_TTL, ADMIN_TOKEN
+from app.core.jwt_verifier import jwt_verifier, VerificacionLocalNoDisponible
+from app.core.cache import TTLCache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+# token (hash) → usuario_id. Nunca se guarda un token más allá de su 'exp'.
+tokens_cache = TTLCache("tokens", max_items=CACHE_TOKENS_MAX, ttl=CACHE_TOKENS_TTL)
+
+
+def _no_autorizado(detalle: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detalle,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _verificar_remoto(token: str) -> str:
     """
-    Dependencia de FastAPI para obtener el usuario autenticado
-    a partir del token JWT de Supabase.
+    Valida el token contra GoTrue (una petición HTTP a Supabase Auth).
     """
     try:
-        user_response = supabase.auth.get_user(token)
-        
-        if not user_response or not user_response.user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Token inválido o expirado",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        return user_response.user.id
-    
+        supabase = await get_supabase()
+        user_response = await supabase.auth.get_user(token)
     except Exception as e:
         print(f"Error de GoTrue al validar token: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Error de autenticación: {e.message}",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _no_autorizado(f"Error de autenticación: {getattr(e, 'message', e)}")
+
+    if not user_response or not user_response.user:
+        raise _no_autorizado("Token inválido o expirado")
+
+    return user_response.user.id
+
+
+def _segundos_hasta_expirar(token: str) -> float:
+    """
+    Lee 'exp' sin verificar la firma; solo se usa para acotar el TTL en caché
+    de un token que ya fue validado.
+    """
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+        return float(exp) - time.time() if exp else 0.0
+    except jwt.InvalidTokenError:
+        return 0.0
+
+
+async def _validar_token(token: str) -> str:
+    """
+    Valida el token y devuelve el id del usuario.
+
+    En modo "local" (por defecto) la firma y la expiración se comprueban en
+    el proceso, sin llamar a GoTrue. Si la verificación local no es posible
+    (sin secreto/JWKS, clave desconocida) se recurre a la validación remota.
+    """
+    if AUTH_VERIFICACION == "local":
+        try:
+            # En un hilo: si toca refrescar el JWKS, la descarga es bloqueante.
+            claims = await run_in_threadpool(jwt_verifier.verificar, token)
+            return claims["sub"]
+        except jwt.ExpiredSignatureError:
+            raise _no_autorizado("Token expirado")
+        except jwt.InvalidTokenError as e:
+            print(f"Token rechazado en verificación local: {e}")
+            raise _no_autorizado("Token inválido o expirado")
+        except VerificacionLocalNoDisponible as e:
+            print(f"[Auth] Verificación local no disponible, usando GoTrue: {e}")
+        except Exception as e:
+            print(f"Error inesperado en verificación local: {e}")
+
+    try:
+        return await _verificar_remoto(token)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error inesperado en get_current_user: {e}")
         raise HTTPException(
@@ -35,4 +87,34 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
             detail="Error interno al validar la sesión."
         )
 
-AuthUser = Depends(get_current_user)
\ No newline at end of file
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+    """
+    Dependencia de FastAPI para obtener el usuario autenticado
+    a partir del token JWT de Supabase. Los tokens ya validados se
+    reutilizan desde 'tokens_cache' hasta su expiración.
+    """
+    clave = hashlib.sha256(token.encode()).hexdigest()
+    usuario_id = tokens_cache.get(clave)
+    if usuario_id:
+        return usuario_id
+
+    usuario_id = await _validar_token(token)
+    tokens_cache.set(clave, usuario_id, ttl=_segundos_hasta_expirar(token))
+    return usuario_id
+
+AuthUser = Depends(get_current_user)
+
+
+async def verificar_admin(x_admin_token: str = Header(None)) -> None:
+    """
+    Dependencia para endpoints de operación: exige la cabecera
+    'X-Admin-Token' igual a ADMIN_TOKEN. Sin ADMIN_TOKEN configurado,
+    esos endpoints quedan deshabilitados.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operación deshabilitada: ADMIN_TOKEN no configurado.")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de administración inválido.")
+
+AdminToken = Depends(verificar_admin)
@@ -0,0 +1,82 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.core import estadisticas
+
+_SIN_VALOR = object()
+
+
+class TTLCache:
+    """
+    Caché en memoria acotada (LRU) con expiración por entrada.
+
+    - 'max_items': al superarse se descarta la entrada usada hace más tiempo.
+    - 'ttl': segundos de vida por defecto; cada 'set' puede indicar uno menor.
+    Es segura entre hilos y lleva contadores de aciertos/fallos para poder
+    dimensionarla; se registra en /api/sistema/estadisticas con su nombre.
+    """
+
+    def __init__(self, nombre: str, max_items: int, ttl: float):
+        self.nombre = nombre
+        self.max_items = max_items
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojados = 0
+        estadisticas.registrar(f"cache:{nombre}", self.estadisticas)
+
+    def get(self, clave: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._datos.get(clave, _SIN_VALOR)
+            if item is _SIN_VALOR:
+                self.fallos += 1
+                return default
+            valor, expira_en = item
+            if expira_en <= time.monotonic():
+                del self._datos[clave]
+                self.expirados += 1
+                self.fallos += 1
+                return default
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_items:
+                self._datos.popitem(last=False)
+                self.desalojados += 1
+
+    def invalidar(self, clave: Hashable) -> None:
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total = self.aciertos + self.fallos
+        return {
+            "tamano": len(self._datos),
+            "max_items": self.max_items,
+            "ttl_segundos": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            "expirados": self.expirados,
+            "desalojados": self.desalojados,
+        }
@@ -6,3 +6,121 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DATABASE_URL = os.getenv("DATABASE_URL")
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+
+# Autenticación: "local" verifica el JWT en el proceso (firma + expiración),
+# "remote" consulta a GoTrue en cada petición (comportamiento original).
+AUTH_VERIFICACION = os.getenv("AUTH_VERIFICACION", "local").lower()
+# Secreto HS256 del proyecto (Settings → API → JWT Secret). Si no se define,
+# se usan las claves públicas del endpoint JWKS de Supabase Auth.
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+# Segundos que se reutiliza el JWKS descargado antes de volver a pedirlo.
+SUPABASE_JWKS_TTL = int(os.getenv("SUPABASE_JWKS_TTL", "600"))
+
+# Cachés en memoria (por proceso): token → usuario y usuario → perfil.
+CACHE_TOKENS_MAX = int(os.getenv("CACHE_TOKENS_MAX", "10000"))
+CACHE_TOKENS_TTL = int(os.getenv("CACHE_TOKENS_TTL", "300"))
+CACHE_USUARIOS_MAX = int(os.getenv("CACHE_USUARIOS_MAX", "5000"))
+CACHE_USUARIOS_TTL = int(os.getenv("CACHE_USUARIOS_TTL", "600"))
+
+# Resumen de IA del dashboard: uno por usuario, válido mientras la huella de
+# sus métricas no cambie; si cambia se sirve el anterior y se regenera en
+# segundo plano. Pasado DASHBOARD_RESUMEN_TTL se genera de nuevo en la petición.
+DASHBOARD_RESUMEN_MAX = int(os.getenv("DASHBOARD_RESUMEN_MAX", "5000"))
+DASHBOARD_RESUMEN_TTL = int(os.getenv("DASHBOARD_RESUMEN_TTL", str(7 * 86400)))
+
+# Historial de chat: tamaño de página para /chat/history y ventana que se
+# envía al agente (últimos N mensajes, recortados a K tokens aproximados).
+CHAT_HISTORIAL_PAGINA = int(os.getenv("CHAT_HISTORIAL_PAGINA", "50"))
+CHAT_HISTORIAL_PAGINA_MAX = int(os.getenv("CHAT_HISTORIAL_PAGINA_MAX", "200"))
+CHAT_CONTEXTO_MAX_MENSAJES = int(os.getenv("CHAT_CONTEXTO_MAX_MENSAJES", "40"))
+CHAT_CONTEXTO_MAX_TOKENS = int(os.getenv("CHAT_CONTEXTO_MAX_TOKENS", "6000"))
+# Tope de la llamada estructurada de /chat/invoke: además de la respuesta
+# lleva el envoltorio JSON y los campos de emoción (la de texto usa 400).
+CHAT_MAX_TOKENS_ESTRUCTURADO = int(os.getenv("CHAT_MAX_TOKENS_ESTRUCTURADO", "700"))
+
+# Análisis de IA de las entradas de diario: se hace fuera de la petición, en
+# una cola del proceso con DIARIO_ANALISIS_WORKERS llamadas simultáneas como
+# máximo y hasta DIARIO_ANALISIS_INTENTOS intentos por entrada.
+DIARIO_ANALISIS_WORKERS = int(os.getenv("DIARIO_ANALISIS_WORKERS", "4"))
+DIARIO_ANALISIS_INTENTOS = int(os.getenv("DIARIO_ANALISIS_INTENTOS", "3"))
+DIARIO_ANALISIS_COLA_MAX = int(os.getenv("DIARIO_ANALISIS_COLA_MAX", "1000"))
+# Una entrada 'procesando' cuyo worker murió se recupera al arrancar pasado
+# este tiempo desde que se reclamó (debe superar lo que tardan los reintentos).
+DIARIO_ANALISIS_LEASE_SEGUNDOS = int(os.getenv("DIARIO_ANALISIS_LEASE_SEGUNDOS", "600"))
+# Cada cuánto se vuelven a buscar en la BD entradas 'pendiente' (las que no
+# cupieron en la cola llena) y reclamaciones vencidas de otros procesos.
+DIARIO_ANALISIS_BARRIDO_SEGUNDOS = float(os.getenv("DIARIO_ANALISIS_BARRIDO_SEGUNDOS", "60"))
+
+# Sentimiento/emoción del análisis de diario: "local" (léxico en español, sin
+# red; OpenAI solo escribe el resumen) o "llm" (gpt-4o-mini lo calcula todo).
+ANALISIS_SENTIMIENTO = os.getenv("ANALISIS_SENTIMIENTO", "local").lower()
+
+# Caché persistente (SQLite) de análisis de diario: mismo texto normalizado,
+# modelo y versión del prompt → mismo resultado, sin llamar a OpenAI.
+# Ruta vacía = desactivada. Se descartan las entradas menos usadas al pasar
+# de ANALISIS_CACHE_MAX y las que no se usan en ANALISIS_CACHE_TTL_DIAS.
+ANALISIS_CACHE_RUTA = os.getenv(
+    "ANALISIS_CACHE_RUTA",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".analisis_cache.sqlite3"),
+)
+ANALISIS_CACHE_MAX = int(os.getenv("ANALISIS_CACHE_MAX", "50000"))
+ANALISIS_CACHE_TTL_DIAS = float(os.getenv("ANALISIS_CACHE_TTL_DIAS", "90"))
+
+# Memoria de conversación: presupuesto total del prompt (system + contexto +
+# resumen + turnos recientes + mensaje nuevo). Los turnos que no caben se
+# pliegan en un resumen acumulado, en lotes de MEMORIA_LOTE_PLEGADO mensajes.
+MEMORIA_PRESUPUESTO_TOKENS = int(os.getenv("MEMORIA_PRESUPUESTO_TOKENS", "3000"))
+MEMORIA_MAX_TOKENS_RESUMEN = int(os.getenv("MEMORIA_MAX_TOKENS_RESUMEN", "300"))
+MEMORIA_LOTE_PLEGADO = int(os.getenv("MEMORIA_LOTE_PLEGADO", "6"))
+
+# RAG: el agente recibe directamente los fragmentos recuperados (sin una
+# segunda completion). Umbral opcional de similitud coseno (0..1, vacío = sin umbral).
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+RAG_UMBRAL_RELEVANCIA = float(os.getenv("RAG_UMBRAL_RELEVANCIA")) if os.getenv("RAG_UMBRAL_RELEVANCIA") else None
+RAG_CONTEXTO_MAX_CARACTERES = int(os.getenv("RAG_CONTEXTO_MAX_CARACTERES", "1500"))
+# Filtro de intención delante de la recuperación del chat: los mensajes de
+# pura cortesía ("hola", "gracias") o con menos de RAG_FILTRO_MIN_PALABRAS
+# palabras con contenido no consultan la KB.
+RAG_FILTRO_INTENCION = os.getenv("RAG_FILTRO_INTENCION", "true").lower() in ("1", "true", "yes")
+RAG_FILTRO_MIN_PALABRAS = int(os.getenv("RAG_FILTRO_MIN_PALABRAS", "2"))
+
+# Índice FAISS persistido en disco. Se reutiliza mientras coincida la huella
+# de la KB (contenido de app/kb + ajustes del splitter y de los embeddings).
+RAG_INDEX_DIR = os.getenv(
+    "RAG_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".rag_index"),
+)
+RAG_EMBEDDINGS_MODELO = os.getenv("RAG_EMBEDDINGS_MODELO", "text-embedding-ada-002")
+# Reindexado de la KB sin reiniciar: cada cuántos segundos se sondea app/kb
+# (0 = desactivado) y token que exige POST /api/sistema/kb/reindex
+# (sin definir, el endpoint queda deshabilitado).
+RAG_KB_VIGILAR_SEGUNDOS = float(os.getenv("RAG_KB_VIGILAR_SEGUNDOS", "0"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Indexar la KB en segundo plano al arrancar (el worker acepta peticiones
+# desde el primer momento; /api/sistema/ready responde 503 hasta que acabe).
+RAG_PRECALENTAR = os.getenv("RAG_PRECALENTAR", "true").lower() in ("1", "true", "yes")
+
+# Caché semántica de respuestas de /consejos: se reutiliza una respuesta si
+# la consulta nueva tiene similitud coseno >= RAG_CACHE_SIMILITUD con una ya
+# respondida. Se vacía cada vez que se reconstruye el índice de la KB.
+RAG_CACHE_SIMILITUD = float(os.getenv("RAG_CACHE_SIMILITUD", "0.95"))
+RAG_CACHE_MAX = int(os.getenv("RAG_CACHE_MAX", "1000"))
+RAG_CACHE_TTL = int(os.getenv("RAG_CACHE_TTL", "86400"))
+
+# Recuperación: "hibrido" (BM25 + vectores, fusionados por RRF), "vector" o
+# "bm25" (sin embeddings de consulta: no necesita red).
+RAG_RECUPERACION = os.getenv("RAG_RECUPERACION", "hibrido").lower()
+# En modo híbrido, con RAG_UMBRAL_RELEVANCIA, un fragmento fusionado solo
+# entra si su similitud coseno llega al umbral o si su puntuación BM25 llega
+# a RAG_BM25_MIN_PUNTAJE (coincidencias exactas como "Línea 113").
+RAG_BM25_MIN_PUNTAJE = float(os.getenv("RAG_BM25_MIN_PUNTAJE", "5.0"))
+# Backend de embeddings: "openai", "hashing" (local, sin red ni modelo) o
+# "local" (sentence-transformers en CPU, requiere instalarlo aparte).
+RAG_EMBEDDINGS_BACKEND = os.getenv("RAG_EMBEDDINGS_BACKEND", "openai").lower()
+RAG_EMBEDDINGS_DIMENSION = int(os.getenv("RAG_EMBEDDINGS_DIMENSION", "1024"))
+RAG_EMBEDDINGS_LOCAL_MODELO = os.getenv(
+    "RAG_EMBEDDINGS_LOCAL_MODELO", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
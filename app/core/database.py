@@ -1,10 +1,43 @@
-from supabase import create_client
-import os
-from dotenv import load_dotenv
+import asyncio
+from typing import Optional
+from supabase import acreate_client, AsyncClient
+from supabase_auth import AsyncGoTrueClient
+from app.core.config import SUPABASE_URL, SUPABASE_KEY
 
-load_dotenv()
+# Cliente asíncrono de Supabase, compartido por todo el proceso.
+# Se crea la primera vez que se necesita (acreate_client es una corrutina).
+_cliente: Optional[AsyncClient] = None
+_lock: Optional[asyncio.Lock] = None
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+async def get_supabase() -> AsyncClient:
+    """
+    Devuelve el cliente asíncrono de Supabase, creándolo si hace falta.
+    """
+    global _cliente, _lock
+    if _cliente is not None:
+        return _cliente
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        if _cliente is None:
+            _cliente = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return _cliente
+
+
+def crear_cliente_auth() -> AsyncGoTrueClient:
+    """
+    Cliente de Supabase Auth nuevo e independiente, para sign_up / sign_in.
+
+    No se debe usar el cliente compartido para iniciar sesión: al recibir
+    SIGNED_IN cambia su cabecera Authorization por el JWT de ese usuario y
+    todas las consultas siguientes del proceso dejarían de ir como
+    service_role (la RLS les ocultaría las filas de los demás usuarios).
+    Usar con 'async with' para cerrar su conexión.
+    """
+    return AsyncGoTrueClient(
+        url=f"{SUPABASE_URL}/auth/v1",
+        headers={"apiKey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+        auto_refresh_token=False,
+        persist_session=False,
+    )
@@ -0,0 +1,20 @@
+from typing import Callable, Dict, Any
+
+# Registro de proveedores de estadísticas internas (cachés, contadores...).
+# Cada componente registra una función que devuelve un dict con sus números,
+# y /api/sistema/estadisticas los expone todos juntos.
+_proveedores: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def registrar(nombre: str, proveedor: Callable[[], Dict[str, Any]]) -> None:
+    _proveedores[nombre] = proveedor
+
+
+def obtener_estadisticas() -> Dict[str, Any]:
+    resultado = {}
+    for nombre, proveedor in _proveedores.items():
+        try:
+            resultado[nombre] = proveedor()
+        except Exception as e:
+            resultado[nombre] = {"error": str(e)}
+    return resultado
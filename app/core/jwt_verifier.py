@@ -0,0 +1,120 @@
+import time
+import threading
+from typing import Optional
+
+import jwt
+from jwt import PyJWKClient
+
+from app.core.config import (
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    SUPABASE_JWT_SECRET,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWKS_TTL,
+)
+
+
+class VerificacionLocalNoDisponible(Exception):
+    """
+    La verificación local no puede decidir sobre el token (sin secreto,
+    JWKS inaccesible, algoritmo o 'kid' desconocido). Quien llama debe
+    recurrir a la verificación remota con GoTrue.
+    """
+
+
+class SupabaseJWTVerifier:
+    """
+    Verifica los access tokens de Supabase Auth sin salir del proceso.
+
+    - Proyectos con secreto compartido (HS256): se usa SUPABASE_JWT_SECRET.
+    - Proyectos con claves asimétricas (RS256/ES256): se descarga el JWKS de
+      '/auth/v1/.well-known/jwks.json' y se mantiene en caché SUPABASE_JWKS_TTL
+      segundos. Si llega un 'kid' desconocido (rotación de claves) se fuerza
+      una recarga, como máximo una vez cada 30 segundos.
+    """
+
+    ALGORITMOS_ASIMETRICOS = ["RS256", "ES256"]
+    INTERVALO_MINIMO_RECARGA = 30
+
+    def __init__(
+        self,
+        secreto: Optional[str] = SUPABASE_JWT_SECRET,
+        supabase_url: Optional[str] = SUPABASE_URL,
+        audiencia: str = SUPABASE_JWT_AUDIENCE,
+        jwks_ttl: int = SUPABASE_JWKS_TTL,
+    ):
+        self.secreto = secreto
+        self.audiencia = audiencia
+        self.jwks_ttl = jwks_ttl
+        self.jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json" if supabase_url else None
+        self._jwks_client: Optional[PyJWKClient] = None
+        self._jwks_cargado_en = 0.0
+        self._ultima_recarga_forzada = 0.0
+        self._lock = threading.Lock()
+
+    def _obtener_jwks_client(self) -> PyJWKClient:
+        if not self.jwks_url:
+            raise VerificacionLocalNoDisponible("SUPABASE_URL no está configurada.")
+
+        with self._lock:
+            caducado = time.monotonic() - self._jwks_cargado_en > self.jwks_ttl
+            if self._jwks_client is None or caducado:
+                self._jwks_client = PyJWKClient(
+                    self.jwks_url,
+                    cache_jwk_set=True,
+                    lifespan=self.jwks_ttl,
+                    headers={"apikey": SUPABASE_KEY or ""},
+                )
+                self._jwks_cargado_en = time.monotonic()
+            return self._jwks_client
+
+    def _clave_asimetrica(self, token: str):
+        client = self._obtener_jwks_client()
+        try:
+            return client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientError as e:
+            # 'kid' desconocido: puede ser una rotación reciente de claves.
+            ahora = time.monotonic()
+            with self._lock:
+                puede_recargar = ahora - self._ultima_recarga_forzada > self.INTERVALO_MINIMO_RECARGA
+                if puede_recargar:
+                    self._ultima_recarga_forzada = ahora
+                    self._jwks_client = None
+            if not puede_recargar:
+                raise VerificacionLocalNoDisponible(f"JWKS sin la clave del token: {e}")
+            try:
+                return self._obtener_jwks_client().get_signing_key_from_jwt(token).key
+            except jwt.PyJWKClientError as e2:
+                raise VerificacionLocalNoDisponible(f"No se pudo obtener la clave de firma: {e2}")
+
+    def verificar(self, token: str) -> dict:
+        """
+        Valida firma, expiración y audiencia del token y devuelve sus claims.
+
+        Lanza jwt.InvalidTokenError si el token es inválido o está expirado,
+        y VerificacionLocalNoDisponible si no se puede verificar localmente.
+        """
+        algoritmo = jwt.get_unverified_header(token).get("alg")
+
+        if algoritmo == "HS256":
+            if not self.secreto:
+                raise VerificacionLocalNoDisponible("SUPABASE_JWT_SECRET no está configurado.")
+            clave = self.secreto
+            algoritmos = ["HS256"]
+        elif algoritmo in self.ALGORITMOS_ASIMETRICOS:
+            clave = self._clave_asimetrica(token)
+            algoritmos = [algoritmo]
+        else:
+            raise VerificacionLocalNoDisponible(f"Algoritmo de firma no soportado: {algoritmo}")
+
+        claims = jwt.decode(
+            token,
+            clave,
+            algorithms=algoritmos,
+            audience=self.audiencia,
+            options={"require": ["exp", "sub"]},
+        )
+        return claims
+
+
+jwt_verifier = SupabaseJWTVerifier()
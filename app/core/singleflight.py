@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.core import estadisticas
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas concurrentes idénticas: mientras un cálculo con la misma
+    clave está en curso, las llamadas nuevas esperan su resultado en vez de
+    repetirlo (p. ej. varias pestañas pidiendo /dashboard a la vez).
+
+    - El cálculo corre en su propia tarea: si el cliente que lo lanzó se
+      desconecta, el resto sigue esperando el mismo resultado.
+    - Las excepciones también se comparten; la clave se libera al terminar,
+      así que la siguiente llamada calcula de nuevo (no es una caché).
+    - El resultado es el mismo objeto para todos: no hay que modificarlo.
+    Es por proceso y se registra en /api/sistema/estadisticas con su nombre.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._en_vuelo: Dict[Hashable, asyncio.Task] = {}
+        self.llamadas = 0
+        self.ejecutadas = 0
+        self.agrupadas = 0
+        estadisticas.registrar(f"singleflight:{nombre}", self.estadisticas)
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[T]]) -> T:
+        self.llamadas += 1
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self.agrupadas += 1
+        else:
+            self.ejecutadas += 1
+            tarea = asyncio.ensure_future(funcion())
+            self._en_vuelo[clave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(clave, t))
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave: Hashable, tarea: asyncio.Task) -> None:
+        if self._en_vuelo.get(clave) is tarea:
+            del self._en_vuelo[clave]
+        # Marca la excepción como recogida aunque todos los clientes se hayan ido.
+        if not tarea.cancelled():
+            tarea.exception()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "llamadas": self.llamadas,
+            "ejecutadas": self.ejecutadas,
+            "agrupadas": self.agrupadas,
+            "tasa_agrupadas": round(self.agrupadas / self.llamadas, 4) if self.llamadas else 0.0,
+            "en_vuelo": len(self._en_vuelo),
+        }
@@ -0,0 +1,78 @@
+import time
+import threading
+from typing import Awaitable, Dict, Any, TypeVar
+
+from app.core import estadisticas
+
+T = TypeVar("T")
+
+
+class TiemposPipeline:
+    """
+    Acumula los tiempos por etapa de un pipeline (llamadas, media, máximo)
+    y los publica en /api/sistema/estadisticas con el nombre dado.
+    """
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._etapas: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        estadisticas.registrar(f"tiempos:{nombre}", self.estadisticas)
+
+    def registrar(self, etapa: str, ms: float) -> None:
+        with self._lock:
+            acumulado = self._etapas.setdefault(etapa, {"llamadas": 0, "total_ms": 0.0, "max_ms": 0.0})
+            acumulado["llamadas"] += 1
+            acumulado["total_ms"] += ms
+            acumulado["max_ms"] = max(acumulado["max_ms"], ms)
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                etapa: {
+                    "llamadas": int(a["llamadas"]),
+                    "media_ms": round(a["total_ms"] / a["llamadas"], 1),
+                    "max_ms": round(a["max_ms"], 1),
+                }
+                for etapa, a in self._etapas.items()
+            }
+
+
+class Cronometro:
+    """
+    Mide las etapas de una petición. Las etapas pueden solaparse (se miden
+    por separado aunque corran en paralelo), así que 'total' es el camino
+    crítico real y la suma de etapas puede superarlo.
+    """
+
+    def __init__(self, pipeline: TiemposPipeline):
+        self.pipeline = pipeline
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+
+    async def medir(self, etapa: str, aw: Awaitable[T]) -> T:
+        inicio = time.perf_counter()
+        try:
+            return await aw
+        finally:
+            self._anotar(etapa, (time.perf_counter() - inicio) * 1000)
+
+    def medir_hasta_ahora(self, etapa: str) -> None:
+        """Anota el tiempo transcurrido desde el inicio (p. ej. primer token)."""
+        self._anotar(etapa, (time.perf_counter() - self.inicio) * 1000)
+
+    def _anotar(self, etapa: str, ms: float) -> None:
+        self.etapas[etapa] = ms
+        self.pipeline.registrar(etapa, ms)
+
+    def cerrar(self) -> float:
+        total = (time.perf_counter() - self.inicio) * 1000
+        self._anotar("total", total)
+        return total
+
+    def server_timing(self) -> str:
+        """Valor para la cabecera 'Server-Timing' (visible en las devtools)."""
+        return ", ".join(f"{etapa};dur={ms:.1f}" for etapa, ms in self.etapas.items())
+
+    def resumen(self) -> str:
+        return " | ".join(f"{etapa}={ms:.0f}ms" for etapa, ms in self.etapas.items())
@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import Iterable
+
+# Tokens extra que añade el formato de chat por cada mensaje (rol, separadores).
+TOKENS_POR_MENSAJE = 4
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken llega con langchain-openai
+    tiktoken = None
+
+
+@lru_cache(maxsize=None)
+def _codificador(modelo: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(modelo)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        # tiktoken descarga el vocabulario la primera vez; sin red no hay codificador.
+        print(f"[Tokens] ADVERTENCIA: tokenizador no disponible ({e}); se usará una aproximación.")
+        return None
+
+
+def contar_tokens(texto: str, modelo: str = "gpt-4o-mini") -> int:
+    """
+    Cuenta los tokens de 'texto' con el tokenizador del modelo.
+    Sin tiktoken (o sin su vocabulario), usa la aproximación de ~4 caracteres por token.
+    """
+    if not texto:
+        return 0
+    codificador = _codificador(modelo)
+    if codificador is None:
+        return len(texto) // 4 + 1
+    return len(codificador.encode(texto, disallowed_special=()))
+
+
+def contar_tokens_mensajes(textos: Iterable[str], modelo: str = "gpt-4o-mini") -> int:
+    """
+    Tokens que ocupan varios mensajes de chat, incluido el sobrecoste por mensaje.
+    """
+    return sum(contar_tokens(t, modelo) + TOKENS_POR_MENSAJE for t in textos)
@@ -0,0 +1,214 @@
+"""
+Backfill del análisis emocional: analiza las entradas de diario y los
+mensajes de chat del usuario que se quedaron sin análisis (columna de
+emoción en NULL) y guarda los resultados por lotes. Los mensajes de chat
+se puntúan con el léxico local (sin OpenAI). Con --tabla resumenes se
+completa 'resumen_ia' en las entradas que la cola guardó con el respaldo
+local (fuente_modelo = VERSION_LEXICO) porque OpenAI no respondió.
+
+    python -m app.jobs.backfill_analisis --tabla todas --concurrencia 8 --por-minuto 300
+
+Recorre cada tabla por id ascendente (keyset) y apunta el último id
+procesado en el archivo de checkpoint, así que se puede interrumpir y
+reanudar. Solo escribe las columnas del análisis, fila a fila y solo si la
+fila sigue existiendo y sin análisis: no resucita filas borradas ni pisa
+cambios hechos mientras tanto. Las filas cuyo análisis falla quedan atrás del checkpoint:
+para reintentarlas, ejecutar de nuevo con --desde-cero.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+from app.core.database import get_supabase
+from app.analysis.diary_analyzer import analyze_diary_content
+from app.analysis.sentiment_lexicon import VERSION_LEXICO, puntuar_lote
+
+TABLAS = {
+    "diario": {
+        "tabla": "entradas_diario",
+        "texto": "contenido",
+        "vacia": "emocion_predominante",
+        # Las pendientes/en curso son de la cola de análisis del backend.
+        "filtros": [("estado_analisis", "not.in", "(pendiente,procesando)")],
+        "campos": {
+            "resumen_ia": "resumen_ia",
+            "emocion_predominante": "emocion_predominante",
+            "categoria_emocional": "categoria_emocional",
+            "promedio_sentimiento": "promedio_sentimiento",
+            "fuente_modelo": "fuente_modelo",
+        },
+        "extra": {"estado_analisis": "completado"},
+    },
+    "resumenes": {
+        "tabla": "entradas_diario",
+        "texto": "contenido",
+        "vacia": "resumen_ia",
+        # Solo las analizadas con el respaldo local: las demás ya tienen su resumen.
+        "filtros": [("estado_analisis", "eq", "completado"), ("fuente_modelo", "eq", VERSION_LEXICO)],
+        "campos": {
+            "resumen_ia": "resumen_ia",
+            "emocion_predominante": "emocion_predominante",
+            "categoria_emocional": "categoria_emocional",
+            "promedio_sentimiento": "promedio_sentimiento",
+            "fuente_modelo": "fuente_modelo",
+        },
+        "extra": {},
+    },
+    "chat": {
+        "tabla": "mensajes_chat",
+        "texto": "texto",
+        "vacia": "emocion_detectada",
+        "filtros": [("rol", "eq", "user")],
+        # Sin resumen que generar: el léxico local puntúa la página entera de una vez.
+        "local": True,
+        "campos": {
+            "emocion_predominante": "emocion_detectada",
+            "categoria_emocional": "categoria_emocional",
+            "promedio_sentimiento": "puntuacion_sentimiento",
+        },
+        "extra": {},
+    },
+}
+
+
+class LimitadorTasa:
+    """Reparte como máximo 'por_minuto' llamadas por minuto, espaciadas de forma uniforme."""
+
+    def __init__(self, por_minuto: float):
+        self.intervalo = 60.0 / por_minuto if por_minuto > 0 else 0.0
+        self._siguiente = 0.0
+        self._lock = asyncio.Lock()
+
+    async def esperar(self) -> None:
+        if not self.intervalo:
+            return
+        async with self._lock:
+            ahora = time.monotonic()
+            espera = self._siguiente - ahora
+            self._siguiente = max(ahora, self._siguiente) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+def cargar_checkpoint(ruta: str) -> Dict[str, int]:
+    try:
+        with open(ruta) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def guardar_checkpoint(ruta: str, checkpoint: Dict[str, int]) -> None:
+    """Escritura atómica (archivo temporal + rename): un corte nunca lo deja a medias."""
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporal, ruta)
+
+
+async def backfill_tabla(
+    nombre: str,
+    checkpoint: Dict[str, int],
+    ruta_checkpoint: str,
+    lote: int,
+    concurrencia: int,
+    limitador: LimitadorTasa,
+    limite: Optional[int] = None,
+) -> Dict[str, int]:
+    """Procesa una tabla de TABLAS desde su checkpoint. Devuelve los contadores."""
+    cfg = TABLAS[nombre]
+    supabase = await get_supabase()
+    semaforo = asyncio.Semaphore(concurrencia)
+    ultimo_id = checkpoint.get(nombre, 0)
+    contadores = {"leidas": 0, "analizadas": 0, "fallidas": 0, "omitidas": 0}
+    print(f"[Backfill] {cfg['tabla']}: empezando tras id {ultimo_id}.")
+
+    async def analizar(fila: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with semaforo:
+            await limitador.esperar()
+            # Sin respaldo local: si OpenAI falla, la fila se reintenta con --desde-cero.
+            return await analyze_diary_content(fila.get(cfg["texto"]) or "", respaldo_local=False)
+
+    async def guardar(fila: Dict[str, Any], cambios: Dict[str, Any]) -> bool:
+        """UPDATE de las columnas del análisis; False si la fila ya no está o ya se analizó."""
+        async with semaforo:
+            consulta = supabase.table(cfg["tabla"]) \
+                .update(cambios) \
+                .eq("id", fila["id"]) \
+                .is_(cfg["vacia"], "null")
+            for columna, operador, valor in cfg["filtros"]:
+                consulta = consulta.filter(columna, operador, valor)
+            res = await consulta.execute()
+            return bool(res.data)
+
+    while limite is None or contadores["leidas"] < limite:
+        consulta = supabase.table(cfg["tabla"]) \
+            .select(f"id, {cfg['texto']}") \
+            .is_(cfg["vacia"], "null") \
+            .gt("id", ultimo_id)
+        for columna, operador, valor in cfg["filtros"]:
+            consulta = consulta.filter(columna, operador, valor)
+        tamano = lote if limite is None else min(lote, limite - contadores["leidas"])
+        res = await consulta.order("id").limit(tamano).execute()
+        filas = res.data or []
+        if not filas:
+            break
+
+        if cfg.get("local"):
+            resultados = puntuar_lote([f.get(cfg["texto"]) or "" for f in filas])
+        else:
+            resultados = await asyncio.gather(*(analizar(f) for f in filas))
+
+        escrituras = []
+        for fila, analisis in zip(filas, resultados):
+            if not analisis:
+                contadores["fallidas"] += 1
+                continue
+            cambios = {destino: analisis.get(origen) for origen, destino in cfg["campos"].items()}
+            escrituras.append(guardar(fila, {**cambios, **cfg["extra"]}))
+        guardadas = await asyncio.gather(*escrituras)
+
+        contadores["leidas"] += len(filas)
+        contadores["analizadas"] += sum(guardadas)
+        contadores["omitidas"] += len(guardadas) - sum(guardadas)
+        ultimo_id = filas[-1]["id"]
+        checkpoint[nombre] = ultimo_id
+        guardar_checkpoint(ruta_checkpoint, checkpoint)
+        print(f"[Backfill] {cfg['tabla']}: hasta id {ultimo_id} → {contadores}")
+
+    print(f"[Backfill] {cfg['tabla']}: terminado → {contadores}")
+    return contadores
+
+
+async def ejecutar(args) -> None:
+    checkpoint = {} if args.desde_cero else cargar_checkpoint(args.checkpoint)
+    limitador = LimitadorTasa(args.por_minuto)
+    nombres = list(TABLAS) if args.tabla == "todas" else [args.tabla]
+    for nombre in nombres:
+        await backfill_tabla(
+            nombre, checkpoint, args.checkpoint,
+            lote=args.lote,
+            concurrencia=args.concurrencia,
+            limitador=limitador,
+            limite=args.limite,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tabla", choices=["diario", "resumenes", "chat", "todas"], default="todas")
+    parser.add_argument("--lote", type=int, default=100, help="Filas por página.")
+    parser.add_argument("--concurrencia", type=int, default=8, help="Llamadas a OpenAI (y escrituras) simultáneas.")
+    parser.add_argument("--por-minuto", type=float, default=300, help="Máximo de llamadas a OpenAI por minuto (0 = sin límite).")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de filas por tabla en esta ejecución.")
+    parser.add_argument("--checkpoint", default=".backfill_analisis.json", help="Archivo donde se guarda el progreso.")
+    parser.add_argument("--desde-cero", action="store_true", help="Ignora el checkpoint (reintenta también las fallidas).")
+    asyncio.run(ejecutar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
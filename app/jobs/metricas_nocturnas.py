@@ -0,0 +1,205 @@
+"""
+Job nocturno de métricas: para cada usuario precalcula en metricas_emocionales
+
+- la fila 'total': métricas del dashboard + resumen y recomendación de IA
+  (solo se vuelven a pedir a OpenAI si la huella de las métricas cambió),
+- la fila de la última semana ISO completa ('2025-W45'): métricas de la
+  semana + su resumen (/diario/resumen-semanal).
+
+    python -m app.jobs.metricas_nocturnas --procesos 4 --db 16 --llm 8 --por-minuto 300
+    python -m app.jobs.metricas_nocturnas --shard 0/3     # un tercio de los usuarios (p. ej. en otra máquina)
+    python -m app.jobs.metricas_nocturnas --usuario UUID --semana 2025-W45 --forzar
+
+Los usuarios se reparten por hash de su id entre shards: '--shard i/n'
+elige uno y '--procesos p' lo divide a su vez en p procesos, cada uno con
+su propio event loop. Las consultas a la BD y las llamadas a OpenAI
+simultáneas se limitan con semáforos; '--db', '--llm' y '--por-minuto'
+son totales y se reparten entre los procesos.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from multiprocessing import get_context
+from typing import Any, Dict, Optional
+
+import app.services.metricas_service as metricas_service
+from app.core.database import get_supabase
+from app.analysis.dashboard_analyzer import analyze_dashboard_metrics, huella_metricas
+from app.jobs.backfill_analisis import LimitadorTasa
+
+PAGINA_USUARIOS = 500
+
+
+def en_shard(usuario_id: str, indice: int, total: int) -> bool:
+    """Reparto estable: el mismo usuario cae siempre en el mismo shard."""
+    return int(hashlib.md5(usuario_id.encode()).hexdigest(), 16) % total == indice
+
+
+class Trabajo:
+    """Procesa los usuarios de un shard en un event loop, con concurrencia acotada."""
+
+    def __init__(self, lunes: date, db: int, llm: int, por_minuto: float, forzar: bool):
+        self.lunes = lunes
+        self.forzar = forzar
+        self.sem_db = asyncio.Semaphore(max(1, db))
+        self.sem_llm = asyncio.Semaphore(max(1, llm))
+        self.limitador = LimitadorTasa(por_minuto)
+        self.contadores = {"usuarios": 0, "llamadas_llm": 0, "resumenes_reutilizados": 0,
+                           "semanas": 0, "sin_datos": 0, "fallidos": 0}
+
+    async def _resumir(self, metricas: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        async with self.sem_llm:
+            await self.limitador.esperar()
+            self.contadores["llamadas_llm"] += 1
+            resumen = await analyze_dashboard_metrics(metricas)
+        return None if resumen.get("fuente_modelo") == "fallback" else resumen
+
+    async def fila_total(self, usuario_id: str, ahora: str) -> Optional[Dict[str, Any]]:
+        async with self.sem_db:
+            metricas = await metricas_service.calcular_metricas_dashboard(usuario_id)
+            anterior = await metricas_service.obtener_metricas_emocionales(usuario_id, metricas_service.PERIODO_TOTAL)
+        if "error" in metricas:
+            raise RuntimeError(metricas["error"])
+        if not metricas["total_entradas_diario"] and not metricas["conteo_emociones"]:
+            return None
+
+        fila = {
+            "usuario_id": usuario_id,
+            "periodo": metricas_service.PERIODO_TOTAL,
+            "metricas": metricas,
+            "promedio_sentimiento": metricas["promedio_sentimiento_general"],
+            "actualizado_en": ahora,
+        }
+        huella = huella_metricas(metricas)
+        if anterior and anterior.get("huella") == huella and anterior.get("resumen_periodo") and not self.forzar:
+            self.contadores["resumenes_reutilizados"] += 1
+            return fila
+
+        resumen = await self._resumir(metricas)
+        if resumen:
+            fila.update({
+                "resumen_periodo": resumen["resumen_ia"],
+                "recomendacion": resumen["recomendacion_ia"],
+                "fuente_modelo": resumen.get("fuente_modelo"),
+                "huella": huella,
+            })
+        return fila
+
+    async def fila_semana(self, usuario_id: str, ahora: str) -> Optional[Dict[str, Any]]:
+        periodo = metricas_service.semana_iso(self.lunes)
+        async with self.sem_db:
+            anterior = await metricas_service.obtener_metricas_emocionales(usuario_id, periodo)
+            if anterior and anterior.get("resumen_periodo") and not self.forzar:
+                return None
+            metricas = await metricas_service.metricas_semana(usuario_id, self.lunes)
+        if not metricas:
+            return None
+
+        total = sum(metricas["categorias"].values())
+        fila = {
+            "usuario_id": usuario_id,
+            "periodo": periodo,
+            "metricas": metricas,
+            "emociones_predominantes": {c: round(n / total, 2) for c, n in metricas["categorias"].items()} if total else {},
+            "promedio_sentimiento": metricas["promedio_sentimiento_general"],
+            "actualizado_en": ahora,
+        }
+        resumen = await self._resumir(metricas)
+        if resumen:
+            fila.update({
+                "resumen_periodo": resumen["resumen_ia"],
+                "recomendacion": resumen["recomendacion_ia"],
+                "fuente_modelo": resumen.get("fuente_modelo"),
+            })
+        self.contadores["semanas"] += 1
+        return fila
+
+    async def procesar_usuario(self, usuario_id: str) -> None:
+        ahora = datetime.now().isoformat()
+        try:
+            filas = [f for f in await asyncio.gather(
+                self.fila_total(usuario_id, ahora),
+                self.fila_semana(usuario_id, ahora),
+            ) if f]
+            if not filas:
+                self.contadores["sin_datos"] += 1
+                return
+            async with self.sem_db:
+                # Cada fila por separado: el upsert por lotes exige las mismas columnas.
+                for fila in filas:
+                    await metricas_service.guardar_metricas_emocionales([fila])
+        except Exception as e:
+            self.contadores["fallidos"] += 1
+            print(f"[MetricasNocturnas] Error con {usuario_id}: {e}")
+        finally:
+            self.contadores["usuarios"] += 1
+
+    async def ejecutar(self, indice: int, total: int, usuario: Optional[str]) -> Dict[str, int]:
+        if usuario:
+            await self.procesar_usuario(usuario)
+            return self.contadores
+
+        supabase = await get_supabase()
+        ultimo_id = None
+        while True:
+            consulta = supabase.table("usuarios").select("id").order("id").limit(PAGINA_USUARIOS)
+            if ultimo_id is not None:
+                consulta = consulta.gt("id", ultimo_id)
+            filas = (await consulta.execute()).data or []
+            if not filas:
+                break
+            ultimo_id = filas[-1]["id"]
+            mios = [f["id"] for f in filas if en_shard(f["id"], indice, total)]
+            await asyncio.gather(*(self.procesar_usuario(u) for u in mios))
+            print(f"[MetricasNocturnas] shard {indice}/{total}: {self.contadores}")
+        return self.contadores
+
+
+def ejecutar_shard(indice: int, total: int, lunes: date, db: int, llm: int, por_minuto: float,
+                   forzar: bool, usuario: Optional[str] = None) -> Dict[str, int]:
+    """Punto de entrada de cada proceso: su propio event loop y cliente de Supabase."""
+    trabajo = Trabajo(lunes, db, llm, por_minuto, forzar)
+    return asyncio.run(trabajo.ejecutar(indice, total, usuario))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--shard", default="0/1", help="i/n: procesar solo el shard i de n.")
+    parser.add_argument("--db", type=int, default=16, help="Consultas a la BD simultáneas (total).")
+    parser.add_argument("--llm", type=int, default=8, help="Llamadas a OpenAI simultáneas (total).")
+    parser.add_argument("--por-minuto", type=float, default=300, help="Máximo de llamadas a OpenAI por minuto (total, 0 = sin límite).")
+    parser.add_argument("--semana", help="Semana ISO a resumir (p. ej. 2025-W45). Por defecto, la última completa.")
+    parser.add_argument("--usuario", help="Procesar solo este usuario.")
+    parser.add_argument("--forzar", action="store_true", help="Regenera los resúmenes aunque ya existan.")
+    args = parser.parse_args()
+
+    lunes = metricas_service.lunes_de_semana(args.semana) if args.semana else metricas_service.ultima_semana_completa(date.today())
+    indice, total = (int(x) for x in args.shard.split("/"))
+    procesos = 1 if args.usuario else max(1, args.procesos)
+    inicio = time.monotonic()
+
+    # El shard i/n se divide en 'procesos' sub-shards: i + k·n de n·procesos.
+    repartos = [(indice + k * total, total * procesos) for k in range(procesos)]
+    limites = (max(1, args.db // procesos), max(1, args.llm // procesos), args.por_minuto / procesos)
+
+    if procesos == 1:
+        resultados = [ejecutar_shard(*repartos[0], lunes, *limites, args.forzar, args.usuario)]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=get_context("spawn")) as pool:
+            futuros = [pool.submit(ejecutar_shard, i, n, lunes, *limites, args.forzar) for i, n in repartos]
+            resultados = [f.result() for f in futuros]
+
+    totales: Dict[str, int] = {}
+    for contadores in resultados:
+        for clave, valor in contadores.items():
+            totales[clave] = totales.get(clave, 0) + valor
+    print(f"[MetricasNocturnas] Semana {lunes.isoformat()} terminada en {time.monotonic() - inicio:.0f} s → {totales}")
+
+
+if __name__ == "__main__":
+    main()
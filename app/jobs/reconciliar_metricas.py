@@ -0,0 +1,108 @@
+"""
+Reconciliación de las métricas acumuladas (tabla metricas_acumuladas):
+las recalcula desde cero a partir de entradas_diario y mensajes_chat e
+informa de los usuarios cuyos agregados se habían desviado.
+
+    python -m app.jobs.reconciliar_metricas                  # usuario a usuario
+    python -m app.jobs.reconciliar_metricas --usuario UUID
+    python -m app.jobs.reconciliar_metricas --todos          # una sola sentencia
+
+Los triggers de la BD mantienen los agregados en cada escritura; este job
+solo corrige desviaciones (triggers desactivados durante una carga, datos
+editados a mano...). Usuario a usuario cada reconstrucción es corta y
+bloquea poco tiempo las escrituras; '--todos' es más rápido pero las
+bloquea durante todo el recálculo.
+"""
+
+import argparse
+import asyncio
+from typing import Any, Dict, Optional
+
+from app.core.database import get_supabase
+from app.services.metricas_service import reconstruir_metricas
+
+CAMPOS = "total_entradas_diario, conteo_emociones, suma_sentimiento, n_sentimiento"
+
+
+async def leer_agregados(usuario_id: str) -> Optional[Dict[str, Any]]:
+    supabase = await get_supabase()
+    res = await supabase.table("metricas_acumuladas").select(CAMPOS).eq("usuario_id", usuario_id).execute()
+    return res.data[0] if res.data else None
+
+
+def desviados(antes: Optional[Dict[str, Any]], despues: Optional[Dict[str, Any]]) -> bool:
+    vacio = {"total_entradas_diario": 0, "conteo_emociones": {}, "suma_sentimiento": 0, "n_sentimiento": 0}
+    antes, despues = antes or vacio, despues or vacio
+    return (
+        antes["total_entradas_diario"] != despues["total_entradas_diario"]
+        or (antes["conteo_emociones"] or {}) != (despues["conteo_emociones"] or {})
+        or antes["n_sentimiento"] != despues["n_sentimiento"]
+        or abs(antes["suma_sentimiento"] - despues["suma_sentimiento"]) > 1e-6
+    )
+
+
+async def reconciliar_usuario(usuario_id: str) -> bool:
+    """Reconstruye los agregados de un usuario. Devuelve True si estaban desviados."""
+    antes = await leer_agregados(usuario_id)
+    await reconstruir_metricas(usuario_id)
+    despues = await leer_agregados(usuario_id)
+    if desviados(antes, despues):
+        print(f"[Reconciliar] {usuario_id}: {antes} → {despues}")
+        return True
+    return False
+
+
+async def reconciliar_todos(lote: int, concurrencia: int) -> Dict[str, int]:
+    """Recorre los usuarios por id (keyset) y los reconcilia con concurrencia acotada."""
+    supabase = await get_supabase()
+    semaforo = asyncio.Semaphore(concurrencia)
+    contadores = {"usuarios": 0, "desviados": 0, "fallidos": 0}
+    ultimo_id = None
+
+    async def reconciliar(usuario_id: str) -> None:
+        async with semaforo:
+            try:
+                if await reconciliar_usuario(usuario_id):
+                    contadores["desviados"] += 1
+            except Exception as e:
+                contadores["fallidos"] += 1
+                print(f"[Reconciliar] Error con {usuario_id}: {e}")
+
+    while True:
+        consulta = supabase.table("usuarios").select("id").order("id").limit(lote)
+        if ultimo_id is not None:
+            consulta = consulta.gt("id", ultimo_id)
+        filas = (await consulta.execute()).data or []
+        if not filas:
+            break
+        await asyncio.gather(*(reconciliar(f["id"]) for f in filas))
+        contadores["usuarios"] += len(filas)
+        ultimo_id = filas[-1]["id"]
+        print(f"[Reconciliar] hasta {ultimo_id} → {contadores}")
+
+    return contadores
+
+
+async def ejecutar(args) -> None:
+    if args.usuario:
+        desviado = await reconciliar_usuario(args.usuario)
+        print(f"[Reconciliar] {args.usuario}: {'corregido' if desviado else 'sin desviaciones'}.")
+    elif args.todos:
+        filas = await reconstruir_metricas()
+        print(f"[Reconciliar] Reconstruidas {filas} filas.")
+    else:
+        contadores = await reconciliar_todos(args.lote, args.concurrencia)
+        print(f"[Reconciliar] Terminado → {contadores}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuario", help="Reconciliar solo este usuario.")
+    parser.add_argument("--todos", action="store_true", help="Reconstruir todos los usuarios en una sola sentencia.")
+    parser.add_argument("--lote", type=int, default=200, help="Usuarios por página.")
+    parser.add_argument("--concurrencia", type=int, default=4, help="Reconstrucciones simultáneas.")
+    asyncio.run(ejecutar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
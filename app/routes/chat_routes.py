@@ -1,10 +1,25 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import Dict, Any, List
+from fastapi import APIRouter, HTTPException, Body, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+import json
+import anyio
 import app.services.chat_service as chat_service
 import app.services.user_service as user_service
+import app.services.memoria_service as memoria_service
 from app.schemas.chat_schema import MensajeInput, MensajeResponse
 from app.agents.conversational_agent import ConversationalAgent
+from app.analysis.sentiment_lexicon import puntuar_texto
 from app.core.auth_deps import AuthUser
+from app.core.timing import Cronometro, TiemposPipeline
+from app.core.singleflight import SingleFlight
+from app.core.config import (
+    CHAT_HISTORIAL_PAGINA,
+    CHAT_HISTORIAL_PAGINA_MAX,
+    CHAT_CONTEXTO_MAX_MENSAJES,
+    CHAT_CONTEXTO_MAX_TOKENS,
+)
 
 router = APIRouter()
 
@@ -19,6 +34,65 @@ except ValueError as e:
     agente_ia = None
 
 
+# ===========================================================
+#   PREPARACIÓN DEL TURNO (ETAPAS EN PARALELO)
+# ===========================================================
+
+tiempos_chat = TiemposPipeline("chat_invoke")
+
+
+async def _preparar_turno(usuario_id: str, texto: str, cronometro: Cronometro, fecha_envio: str, guardar_usuario: bool = True):
+    """
+    Ejecuta en paralelo las etapas que no dependen entre sí:
+    datos del usuario, historial reciente, recuperación RAG, resumen de la
+    memoria y, si 'guardar_usuario', el guardado del mensaje del usuario
+    (con la emoción del léxico local, ver 'analisis_local').
+
+    El historial se lee con 'antes_de' = instante del mensaje nuevo, así que
+    aunque el guardado termine antes, ese mensaje no se envía dos veces.
+    """
+    etapas = [
+        cronometro.medir("usuario", user_service.obtener_usuario_por_id(usuario_id)),
+        cronometro.medir("historial", chat_service.obtener_contexto_reciente(
+            usuario_id,
+            max_mensajes=CHAT_CONTEXTO_MAX_MENSAJES,
+            max_tokens=CHAT_CONTEXTO_MAX_TOKENS,
+            antes_de=fecha_envio,
+        )),
+        cronometro.medir("rag", agente_ia.buscar_contexto(texto)),
+        # Deja el resumen en caché para cuando el agente prepare la memoria.
+        cronometro.medir("resumen", memoria_service.obtener_resumen(usuario_id)),
+    ]
+    if guardar_usuario:
+        etapas.append(cronometro.medir("guardar_usuario", chat_service.guardar_mensaje(
+            usuario_id, "user", texto, fecha=fecha_envio, **analisis_local(texto)
+        )))
+
+    resultados = await asyncio.gather(*etapas, return_exceptions=True)
+    datos_usuario, historial, contexto_kb, _ = resultados[:4]
+    guardado = resultados[4] if guardar_usuario else None
+
+    if isinstance(datos_usuario, Exception):
+        raise datos_usuario
+    if not datos_usuario:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado.")
+    for resultado in (historial, contexto_kb, guardado):
+        if isinstance(resultado, Exception):
+            raise resultado
+
+    return datos_usuario, historial, contexto_kb
+
+
+def analisis_local(texto: str) -> Dict[str, Any]:
+    """Emoción del mensaje con el léxico local (~50 µs), como argumentos de 'guardar_mensaje'."""
+    analisis = puntuar_texto(texto)
+    return {
+        "emocion": analisis["emocion_predominante"],
+        "categoria": analisis["categoria_emocional"],
+        "puntaje": analisis["promedio_sentimiento"],
+    }
+
+
 # ===========================================================
 #   ENDPOINT DE INVOCACIÓN DEL CHAT
 # ===========================================================
@@ -29,83 +103,217 @@ except ValueError as e:
     summary="Invocar al chatbot (Auri)",
     tags=["Chat"]
 )
-def invocar_chat(
+async def invocar_chat(
+    response: Response,
     usuario_id: str = AuthUser,
     mensaje: MensajeInput = Body(...)
 ):
     """
     Recibe un mensaje del usuario y devuelve una respuesta de la IA.
-    FLUJO CORREGIDO:
-    1. Guardar mensaje del usuario
-    2. Obtener historial COMPLETO (con el mensaje recién guardado)
-    3. Invocar al agente con historial real
-    4. Guardar respuesta
+    FLUJO:
+    1. En paralelo: datos del usuario, historial reciente (sin el mensaje
+       nuevo) y contexto RAG
+    2. Invocar al agente con el historial acotado y el contexto: una sola
+       llamada devuelve la respuesta y la emoción del mensaje del usuario
+    3. Guardar el mensaje del usuario (con su emoción y la fecha de llegada)
+       y la respuesta
+    Los tiempos de cada etapa van en la cabecera 'Server-Timing'.
     """
 
     if not agente_ia:
         raise HTTPException(status_code=500, detail="Agente de IA no inicializado.")
 
+    cronometro = Cronometro(tiempos_chat)
+    fecha_envio = datetime.now().isoformat()
     try:
         # =======================
-        #   1. Obtener datos del usuario
-        # =======================
-        datos_usuario = user_service.obtener_usuario_por_id(usuario_id)
-        if not datos_usuario:
-            raise HTTPException(status_code=404, detail="Usuario no encontrado.")
-
-        # =======================
-        #   2. Guardar PRIMERO el mensaje del usuario
+        #   1. Etapas independientes en paralelo
         # =======================
-        chat_service.guardar_mensaje(usuario_id, "user", mensaje.texto)
+        datos_usuario, historial, contexto_kb = await _preparar_turno(
+            usuario_id, mensaje.texto, cronometro, fecha_envio, guardar_usuario=False
+        )
 
         # =======================
-        #   3. Obtener historial completo (incluye el mensaje recién guardado)
+        #   2. Invocar al agente con historial acotado
         # =======================
-        historial = chat_service.obtener_historial(usuario_id)
-        print("📌 HISTORIAL NORMALIZADO ENVIADO AL AGENTE →", historial)
+        try:
+            resultado = await cronometro.medir("agente", agente_ia.ainvoke(
+                texto_usuario=mensaje.texto,
+                datos_usuario=datos_usuario,
+                historial_chat_db=historial,
+                contexto_kb=contexto_kb,
+            ))
+        except Exception:
+            # Sin respuesta del modelo el mensaje del usuario no se pierde:
+            # se guarda con la emoción del léxico local.
+            await chat_service.guardar_mensaje(
+                usuario_id, "user", mensaje.texto, fecha=fecha_envio, **analisis_local(mensaje.texto)
+            )
+            raise
 
         # =======================
-        #   4. Invocar al agente con historial actualizado
+        #   3. Guardar el mensaje del usuario y la respuesta de la IA
         # =======================
-        respuesta_ia = agente_ia.invoke(
-            texto_usuario=mensaje.texto,
-            datos_usuario=datos_usuario,
-            historial_chat_db=historial
-        )
+        if resultado.emocion_detectada is None:
+            # El modelo respondió sin la emoción (salida estructurada no válida).
+            emocion_usuario = analisis_local(mensaje.texto)
+        else:
+            emocion_usuario = {
+                "emocion": resultado.emocion_detectada,
+                "categoria": resultado.categoria_emocional,
+                "puntaje": resultado.puntuacion_sentimiento,
+            }
+        await cronometro.medir("guardar", asyncio.gather(
+            chat_service.guardar_mensaje(
+                usuario_id, "user", mensaje.texto, fecha=fecha_envio, **emocion_usuario
+            ),
+            chat_service.guardar_mensaje(usuario_id, "assistant", resultado.respuesta),
+        ))
+        respuesta_ia = resultado.respuesta
 
-        # =======================
-        #   5. Guardar la respuesta de la IA
-        # =======================
-        chat_service.guardar_mensaje(usuario_id, "assistant", respuesta_ia)
+        cronometro.cerrar()
+        response.headers["Server-Timing"] = cronometro.server_timing()
+        print(f"[Chat] Tiempos /chat/invoke → {cronometro.resumen()}")
 
         return {"respuesta": respuesta_ia}
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error en /chat/invoke:", e)
         raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
 
 
+# ===========================================================
+#   ENDPOINT DE INVOCACIÓN EN STREAMING (SSE)
+# ===========================================================
+
+tiempos_chat_stream = TiemposPipeline("chat_invoke_stream")
+
+
+def _evento_sse(datos: Dict[str, Any], evento: Optional[str] = None) -> str:
+    linea_evento = f"event: {evento}\n" if evento else ""
+    return f"{linea_evento}data: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/chat/invoke/stream",
+    summary="Invocar al chatbot (Auri) con respuesta en streaming (SSE)",
+    tags=["Chat"]
+)
+async def invocar_chat_stream(
+    usuario_id: str = AuthUser,
+    mensaje: MensajeInput = Body(...)
+):
+    """
+    Igual que /chat/invoke, pero devuelve la respuesta como Server-Sent Events:
+    - eventos sin nombre con {"delta": "..."} por cada fragmento,
+    - un evento 'fin' con {"respuesta": "..."} al terminar,
+    - un evento 'error' si el modelo falla a mitad de la respuesta.
+    La respuesta acumulada se guarda al terminar el stream, también si el
+    cliente se desconecta antes (se guarda lo generado hasta ese momento).
+    La respuesta llega como texto libre, así que la emoción del mensaje del
+    usuario la calcula el léxico local en vez del modelo.
+    """
+
+    if not agente_ia:
+        raise HTTPException(status_code=500, detail="Agente de IA no inicializado.")
+
+    cronometro = Cronometro(tiempos_chat_stream)
+    try:
+        datos_usuario, historial, contexto_kb = await _preparar_turno(
+            usuario_id, mensaje.texto, cronometro, datetime.now().isoformat()
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error en /chat/invoke/stream:", e)
+        raise HTTPException(status_code=500, detail=f"Error interno: {str(e)}")
+
+    async def eventos():
+        partes = []
+        try:
+            async for fragmento in agente_ia.astream(
+                texto_usuario=mensaje.texto,
+                datos_usuario=datos_usuario,
+                historial_chat_db=historial,
+                contexto_kb=contexto_kb,
+            ):
+                if not partes:
+                    cronometro.medir_hasta_ahora("primer_token")
+                partes.append(fragmento)
+                yield _evento_sse({"delta": fragmento})
+
+            yield _evento_sse({"respuesta": "".join(partes)}, evento="fin")
+
+        except Exception as e:
+            print(f"❌ Error durante el streaming de /chat/invoke/stream:", e)
+            yield _evento_sse({"detail": f"Error interno: {str(e)}"}, evento="error")
+
+        finally:
+            respuesta_ia = "".join(partes)
+            if respuesta_ia.strip():
+                # Protegido de la cancelación: si el cliente se desconecta,
+                # el guardado termina igualmente.
+                with anyio.CancelScope(shield=True):
+                    try:
+                        await chat_service.guardar_mensaje(usuario_id, "assistant", respuesta_ia)
+                    except Exception as e:
+                        print(f"❌ No se pudo guardar la respuesta en streaming:", e)
+            cronometro.cerrar()
+            print(f"[Chat] Tiempos /chat/invoke/stream → {cronometro.resumen()}")
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            # Solo las etapas previas al LLM; el resto queda en el log.
+            "Server-Timing": cronometro.server_timing(),
+        },
+    )
+
+
 # ===========================================================
 #   ENDPOINT DE HISTORIAL
 # ===========================================================
 
+# Misma página del mismo usuario pedida a la vez → una sola consulta.
+vuelos_historial = SingleFlight("chat_history")
+
+
 @router.get(
     "/chat/history",
     response_model=List[MensajeResponse],
     summary="Obtener historial de chat",
     tags=["Chat"]
 )
-def obtener_historial_chat_endpoint(
-    usuario_id: str = AuthUser
+async def obtener_historial_chat_endpoint(
+    response: Response,
+    usuario_id: str = AuthUser,
+    limite: int = Query(CHAT_HISTORIAL_PAGINA, ge=1, le=CHAT_HISTORIAL_PAGINA_MAX),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en la cabecera X-Next-Cursor"),
 ):
     """
-    Devuelve historial normalizado listo para frontend.
+    Devuelve una página del historial, del mensaje más reciente al más antiguo.
+    Si hay más mensajes, la cabecera 'X-Next-Cursor' trae el cursor para
+    pedir la página siguiente. Las peticiones simultáneas de la misma página
+    comparten la consulta.
     """
 
     try:
-        historial = chat_service.obtener_historial(usuario_id)
+        historial, siguiente_cursor = await vuelos_historial.ejecutar(
+            (usuario_id, limite, cursor),
+            lambda: chat_service.obtener_historial_paginado(usuario_id, limite=limite, cursor=cursor),
+        )
+        if siguiente_cursor:
+            response.headers["X-Next-Cursor"] = siguiente_cursor
         return historial
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print("❌ Error al obtener historial:", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Body
 from app.schemas.consejo_schema import ConsejoInput, ConsejoResponse
-from app.agents.rag_service import rag_service_instance
+from app.agents.rag_service import get_rag_service
 from app.core.auth_deps import AuthUser
 from typing import Dict, Any
 
@@ -12,7 +12,7 @@ router = APIRouter()
     summary="Buscar en la Base de Conocimiento (RAG)",
     tags=["Consejos (RAG)"]
 )
-def buscar_consejo(
+async def buscar_consejo(
     usuario_id: str = AuthUser, # Protegemos el endpoint
     consulta: ConsejoInput = Body(...)
 ):
@@ -20,12 +20,15 @@ def buscar_consejo(
     Recibe una consulta del usuario y devuelve una respuesta directa
     de la base de conocimiento (RAG).
     """
-    if not rag_service_instance or not rag_service_instance.rag_chain:
+    rag_service = get_rag_service()
+    if rag_service.estado in (rag_service.PENDIENTE, rag_service.INICIALIZANDO):
+        raise HTTPException(status_code=503, detail="Servicio RAG inicializándose. Intenta de nuevo en unos segundos.")
+    if not rag_service.rag_chain:
         raise HTTPException(status_code=500, detail="Servicio RAG no inicializado.")
 
     try:
         # Usamos el método query_rag que creamos
-        respuesta_rag = rag_service_instance.query_rag(consulta.query)
+        respuesta_rag = await rag_service.query_rag(consulta.query)
         
         return {"respuesta": respuesta_rag}
 
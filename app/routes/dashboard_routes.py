@@ -1,19 +1,52 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict, Any, Optional
+from datetime import date, timedelta
+import asyncio
 import app.services.metricas_service as metricas_service
 from app.core.auth_deps import AuthUser
+from app.core.singleflight import SingleFlight
 # (NUEVO) Importar el nuevo analizador
-from app.analysis.dashboard_analyzer import analyze_dashboard_metrics
+from app.analysis.dashboard_analyzer import resumenes_dashboard
+from app.analysis.tendencias import calcular_tendencias, numero_periodos
 
 router = APIRouter()
 
+# Peticiones simultáneas del mismo usuario (p. ej. al restaurar pestañas)
+# comparten un solo cálculo.
+vuelos_dashboard = SingleFlight("dashboard")
+
+
+async def _calcular_dashboard(usuario_id: str) -> Dict[str, Any]:
+    # 1. Calcular métricas base (números)
+    metricas_base = await metricas_service.calcular_metricas_dashboard(usuario_id)
+    if "error" in metricas_base:
+        raise HTTPException(status_code=500, detail=metricas_base["error"])
+    
+    # Si no hay entradas, devolvemos un estado inicial
+    if metricas_base.get("total_entradas_diario") == 0:
+        return {
+            **metricas_base,
+            "resumen_ia": "¡Bienvenido a tu dashboard! Escribe tu primera entrada en el diario para ver tus métricas.",
+            "recomendacion_ia": "Intenta escribir cómo te sientes hoy."
+        }
+
+    # 2. Generar resumen de IA basado en las métricas
+    resumen_ia_dict = await resumenes_dashboard.obtener(
+        usuario_id, metricas_base,
+        cargar_precalculado=lambda: metricas_service.obtener_resumen_precalculado(usuario_id),
+    )
+    
+    # 3. Combinar los dos diccionarios y devolver
+    return {**metricas_base, **resumen_ia_dict}
+
+
 @router.get(
     "/dashboard",
     response_model=Dict[str, Any],
     summary="Obtener métricas del Dashboard (Protegido)",
     tags=["Dashboard"]
 )
-def get_dashboard_metrics(
+async def get_dashboard_metrics(
     usuario_id: str = AuthUser 
 ):
     """
@@ -22,31 +55,66 @@ def get_dashboard_metrics(
 
     FLUJO ACTUALIZADO:
     1. Calcula métricas numéricas (conteo, promedios).
-    2. Pasa esas métricas a una IA para generar un resumen y recomendación.
+    2. Pasa esas métricas a una IA para generar un resumen y recomendación
+       (guardado por huella de las métricas: si no han cambiado, sin IA;
+       el job nocturno deja uno precalculado en metricas_emocionales).
     3. Devuelve todo junto.
+    Las peticiones simultáneas del mismo usuario comparten el cálculo.
     """
     try:
-        # 1. Calcular métricas base (números)
-        metricas_base = metricas_service.calcular_metricas_dashboard(usuario_id)
-        if "error" in metricas_base:
-            raise HTTPException(status_code=500, detail=metricas_base["error"])
-        
-        # Si no hay entradas, devolvemos un estado inicial
-        if metricas_base.get("total_entradas_diario") == 0:
-            return {
-                **metricas_base,
-                "resumen_ia": "¡Bienvenido a tu dashboard! Escribe tu primera entrada en el diario para ver tus métricas.",
-                "recomendacion_ia": "Intenta escribir cómo te sientes hoy."
-            }
-
-        # 2. Generar resumen de IA basado en las métricas
-        resumen_ia_dict = analyze_dashboard_metrics(metricas_base)
-        
-        # 3. Combinar los dos diccionarios y devolver
-        metricas_completas = {**metricas_base, **resumen_ia_dict}
-        
-        return metricas_completas
+        return await vuelos_dashboard.ejecutar(usuario_id, lambda: _calcular_dashboard(usuario_id))
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en /dashboard: {e}")
-        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+
+# Rango por defecto de /dashboard/tendencias según la granularidad.
+RANGO_POR_DEFECTO = {"dia": 30, "semana": 7 * 12, "mes": 365}
+MAX_PERIODOS = 1000
+
+
+@router.get(
+    "/dashboard/tendencias",
+    response_model=Dict[str, Any],
+    summary="Tendencia emocional por día, semana o mes (Protegido)",
+    tags=["Dashboard"]
+)
+async def get_dashboard_tendencias(
+    usuario_id: str = AuthUser,
+    granularidad: str = Query("semana", pattern="^(dia|semana|mes)$"),
+    desde: Optional[date] = Query(None, description="Por defecto, 30 días / 12 semanas / 1 año antes de 'hasta'"),
+    hasta: Optional[date] = Query(None, description="Por defecto, hoy"),
+    ventana: int = Query(4, ge=1, le=90, description="Periodos de la media móvil"),
+    fuente: str = Query("todas", pattern="^(todas|diario|chat)$"),
+):
+    """
+    Devuelve, para cada periodo del rango (días, semanas ISO tipo
+    '2025-W45' o meses), el promedio de sentimiento, su media móvil y la
+    distribución de emociones y categorías del diario y del chat.
+    """
+    hasta = hasta or date.today()
+    desde = desde or hasta - timedelta(days=RANGO_POR_DEFECTO[granularidad])
+    if desde > hasta:
+        raise HTTPException(status_code=400, detail="'desde' debe ser anterior a 'hasta'.")
+    if numero_periodos(desde, hasta, granularidad) > MAX_PERIODOS:
+        raise HTTPException(status_code=400, detail=f"Rango demasiado grande (máximo {MAX_PERIODOS} periodos).")
+
+    try:
+        columnas = await metricas_service.obtener_columnas_tendencias(usuario_id, desde, hasta, fuente)
+        periodos = await asyncio.to_thread(calcular_tendencias, columnas, desde, hasta, granularidad, ventana)
+    except Exception as e:
+        print(f"Error en /dashboard/tendencias: {e}")
+        raise HTTPException(status_code=500, detail=f"Error interno: {e}")
+
+    return {
+        "granularidad": granularidad,
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        "ventana": ventana,
+        "fuente": fuente,
+        "total": len(columnas),
+        "periodos": periodos,
+    }
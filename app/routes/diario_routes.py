@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from typing import List, Dict, Any, Optional
+from datetime import date
 import uuid
 import app.services.diario_service as diario_service
+import app.services.metricas_service as metricas_service
 from app.schemas.diario_schema import EntradaDiarioCreate, EntradaDiarioResponse
 from app.core.auth_deps import AuthUser
 
@@ -14,16 +16,18 @@ router = APIRouter()
     tags=["Diario"]
 )
 
-def crear_entrada_diario_endpoint(
+async def crear_entrada_diario_endpoint(
     usuario_id: str = AuthUser,
     entrada: EntradaDiarioCreate = Body(...)
 ):
     """
     Crea una nueva entrada en el diario.
     El 'usuario_id' se obtiene automáticamente del Token de autenticación.
+    Responde en cuanto se guarda: el análisis de IA llega después
+    (estado_analisis 'pendiente' → 'completado'; consultar GET /diario/{id}).
     """
     try:
-        nueva_entrada = diario_service.crear_entrada_diario(
+        nueva_entrada = await diario_service.crear_entrada_diario(
             usuario_id=usuario_id, # Usamos el ID del token
             contenido=entrada.contenido,
             titulo=entrada.titulo
@@ -41,7 +45,7 @@ def crear_entrada_diario_endpoint(
     summary="Obtener historial de entradas de diario",
     tags=["Diario"]
 )
-def obtener_entradas_diario_endpoint(
+async def obtener_entradas_diario_endpoint(
     usuario_id: str = AuthUser
 ):
     """
@@ -49,7 +53,62 @@ def obtener_entradas_diario_endpoint(
     ordenadas por fecha descendente.
     """
     try:
-        entradas = diario_service.obtener_entradas_diario(usuario_id=usuario_id)
+        entradas = await diario_service.obtener_entradas_diario(usuario_id=usuario_id)
         return entradas
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/diario/resumen-semanal",
+    response_model=Dict[str, Any],
+    summary="Resumen emocional de una semana (precalculado)",
+    tags=["Diario"]
+)
+async def obtener_resumen_semanal_endpoint(
+    usuario_id: str = AuthUser,
+    semana: Optional[str] = Query(None, description="Semana ISO, p. ej. 2025-W45. Por defecto, la última completa."),
+):
+    """
+    Devuelve el resumen de la semana que generó el job nocturno
+    (app.jobs.metricas_nocturnas): no llama a la IA en la petición.
+    """
+    if semana is None:
+        semana = metricas_service.semana_iso(metricas_service.ultima_semana_completa(date.today()))
+    try:
+        # Forma canónica ('2025-W5' → '2025-W05'), la misma con la que el job guarda el periodo.
+        semana = metricas_service.semana_iso(metricas_service.lunes_de_semana(semana))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Semana no válida (formato AAAA-Www, p. ej. 2025-W45).")
+
+    try:
+        fila = await metricas_service.obtener_metricas_emocionales(usuario_id, semana)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not fila:
+        raise HTTPException(status_code=404, detail="Todavía no hay resumen de esa semana.")
+    return fila
+
+
+@router.get(
+    "/diario/{entrada_id}",
+    response_model=EntradaDiarioResponse,
+    summary="Obtener una entrada de diario (y el estado de su análisis)",
+    tags=["Diario"]
+)
+async def obtener_entrada_diario_endpoint(
+    entrada_id: int,
+    usuario_id: str = AuthUser
+):
+    """
+    Devuelve una entrada del usuario autenticado. El frontend puede
+    consultarla periódicamente hasta que 'estado_analisis' sea
+    'completado' (o 'error').
+    """
+    try:
+        entrada = await diario_service.obtener_entrada_diario(usuario_id=usuario_id, entrada_id=entrada_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not entrada:
+        raise HTTPException(status_code=404, detail="Entrada no encontrada.")
+    return entrada
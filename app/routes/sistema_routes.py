@@ -0,0 +1,80 @@
+from fastapi import APIRouter, HTTPException, Response, status
+from typing import Dict, Any
+from app.core.estadisticas import obtener_estadisticas
+from app.agents.rag_service import get_rag_service
+from app.core.auth_deps import AdminToken
+
+router = APIRouter()
+
+@router.get(
+    "/sistema/estadisticas",
+    response_model=Dict[str, Any],
+    summary="Estadísticas internas del proceso (cachés, contadores; requiere X-Admin-Token)",
+    tags=["Sistema"],
+    dependencies=[AdminToken]
+)
+async def obtener_estadisticas_endpoint():
+    """
+    Devuelve los contadores de las cachés en memoria de este worker
+    (aciertos, fallos, tamaño...) para poder dimensionarlas.
+    """
+    return obtener_estadisticas()
+
+
+@router.get(
+    "/sistema/health",
+    response_model=Dict[str, Any],
+    summary="Estado del proceso y de sus componentes",
+    tags=["Sistema"]
+)
+async def health_endpoint():
+    """
+    Liveness: responde siempre 200 mientras el proceso esté vivo e informa
+    del estado de los componentes que se inicializan en segundo plano.
+    """
+    return {
+        "estado": "ok",
+        "componentes": {"rag": get_rag_service().estado_salud()},
+    }
+
+
+@router.get(
+    "/sistema/ready",
+    response_model=Dict[str, Any],
+    summary="Readiness: 200 cuando la base de conocimiento está indexada",
+    tags=["Sistema"]
+)
+async def ready_endpoint(response: Response):
+    """
+    Readiness: 503 mientras el índice RAG se está construyendo, 200 cuando
+    está listo (o si falló: el chat sigue funcionando sin contexto).
+    """
+    rag = get_rag_service()
+    listo = rag.estado in (rag.LISTO, rag.ERROR)
+    if not listo:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"listo": listo, "rag": rag.estado_salud()}
+
+
+@router.post(
+    "/sistema/kb/reindex",
+    response_model=Dict[str, Any],
+    summary="Aplica los cambios de app/kb sin reiniciar (requiere X-Admin-Token)",
+    tags=["Sistema"],
+    dependencies=[AdminToken]
+)
+async def reindexar_kb_endpoint():
+    """
+    Reindexa la base de conocimiento de este worker: solo se embeben las
+    entradas nuevas o modificadas y el índice se sustituye de golpe, sin
+    cortar las consultas en curso. Los demás workers recogen el índice
+    guardado en disco en su próximo reindexado (o con RAG_KB_VIGILAR_SEGUNDOS).
+    """
+    rag = get_rag_service()
+    if rag.estado in (rag.PENDIENTE, rag.INICIALIZANDO):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La base de conocimiento todavía se está indexando.")
+    try:
+        return await rag.areindexar()
+    except Exception as e:
+        print(f"[Sistema] Error reindexando la KB: {e}")
+        raise HTTPException(status_code=500, detail=f"No se pudo reindexar (se mantiene el índice anterior): {e}")
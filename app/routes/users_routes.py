@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Body
-from app.core.database import supabase
+from app.core.database import crear_cliente_auth
 from app.schemas.usuario_schema import UsuarioCreate, UsuarioLogin, TokenResponse
 import app.services.user_service as user_service
 
@@ -12,7 +12,7 @@ router = APIRouter()
     summary="Registrar un nuevo usuario",
     tags=["Autenticación"]
 )
-def register_user(
+async def register_user(
     usuario_in: UsuarioCreate = Body(...)
 ):
     """
@@ -22,17 +22,19 @@ def register_user(
     pública usando el user_service.
     """
     try:
-        auth_response = supabase.auth.sign_up({
-            "email": usuario_in.email,
-            "password": usuario_in.password,
-        })
+        # Cliente de Auth propio: el compartido debe seguir como service_role.
+        async with crear_cliente_auth() as auth:
+            auth_response = await auth.sign_up({
+                "email": usuario_in.email,
+                "password": usuario_in.password,
+            })
         
         if not auth_response.user or not auth_response.session:
             raise HTTPException(status_code=400, detail="No se pudo registrar al usuario. El email podría estar en uso.")
 
         print(f"Nuevo usuario registrado en Auth: {auth_response.user.id}")
 
-        user_service.crear_usuario(
+        await user_service.crear_usuario(
             id_auth=auth_response.user.id,
             email=usuario_in.email,
             nombre=usuario_in.nombre
@@ -57,17 +59,18 @@ def register_user(
     summary="Iniciar sesión (Obtener Token)",
     tags=["Autenticación"]
 )
-def login_for_access_token(
+async def login_for_access_token(
     form_data: UsuarioLogin = Body(...)
 ):
     """
     Inicia sesión con email y contraseña y devuelve un Access Token.
     """
     try:
-        auth_response = supabase.auth.sign_in_with_password({
-            "email": form_data.email,
-            "password": form_data.password
-        })
+        async with crear_cliente_auth() as auth:
+            auth_response = await auth.sign_in_with_password({
+                "email": form_data.email,
+                "password": form_data.password
+            })
 
         if not auth_response.session or not auth_response.session.access_token:
             raise HTTPException(status_code=401, detail="Email o contraseña incorrectos.")
@@ -36,6 +36,8 @@ class EntradaDiarioResponse(BaseModel):
     categoria_emocional: Optional[str]
     promedio_sentimiento: Optional[float]
     fuente_modelo: Optional[str]
+    # 'pendiente' | 'procesando' | 'completado' | 'error'
+    estado_analisis: Optional[str] = None
     creado_en: datetime
 
     class Config:
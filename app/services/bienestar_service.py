@@ -1,7 +1,7 @@
-from app.core.database import supabase
+from app.core.database import get_supabase
 from datetime import datetime
 
-def agregar_actividad(usuario_id: str, tipo: str, descripcion: str):
+async def agregar_actividad(usuario_id: str, tipo: str, descripcion: str):
     """
     Registra una actividad recomendada por la IA.
     """
@@ -12,11 +12,13 @@ def agregar_actividad(usuario_id: str, tipo: str, descripcion: str):
         "fecha_asignacion": datetime.now().date().isoformat(),
         "completado": False
     }
-    supabase.table("actividades_bienestar").insert(data).execute()
+    supabase = await get_supabase()
+    await supabase.table("actividades_bienestar").insert(data).execute()
 
 
-def marcar_actividad_completada(actividad_id: int):
+async def marcar_actividad_completada(actividad_id: int):
     """
     Marca una actividad como completada.
     """
-    supabase.table("actividades_bienestar").update({"completado": True}).eq("id", actividad_id).execute()
\ No newline at end of file
+    supabase = await get_supabase()
+    await supabase.table("actividades_bienestar").update({"completado": True}).eq("id", actividad_id).execute()
@@ -1,20 +1,25 @@
-from app.core.database import supabase
+from app.core.database import get_supabase
+from app.core.tokens import contar_tokens
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import base64
+import json
 
 
-def guardar_mensaje(
+async def guardar_mensaje(
     usuario_id: str,
     rol: str,
     texto: str,
     emocion: Optional[str] = None,
     categoria: Optional[str] = None,
     puntaje: Optional[float] = None,
+    fecha: Optional[str] = None,
 ):
     """Guarda un mensaje (usuario o IA) en la tabla ``mensajes_chat``.
 
     Versión corregida: elimina el campo ``respuesta`` (inexistente en la tabla)
     y añade un ``resumen`` simple para cumplir con la restricción ``NOT NULL``.
+    ``fecha`` permite fijar el instante del mensaje (por defecto, ahora).
     """
 
     resumen_simple = (texto[:75] + "...") if len(texto) > 75 else texto
@@ -26,16 +31,110 @@ def guardar_mensaje(
         "emocion_detectada": emocion,
         "categoria_emocional": categoria,
         "puntuacion_sentimiento": puntaje,
-        "fecha": datetime.now().isoformat(),
+        "fecha": fecha or datetime.now().isoformat(),
         "resumen": resumen_simple,
     }
-    supabase.table("mensajes_chat").insert(data).execute()
+    supabase = await get_supabase()
+    await supabase.table("mensajes_chat").insert(data).execute()
 
 
-def obtener_historial(usuario_id: str) -> List[Dict[str, Any]]:
+# ---------------------------------------------------------
+# PAGINACIÓN POR CURSOR (KEYSET) SOBRE (fecha, id)
+# ---------------------------------------------------------
+def _codificar_cursor(mensaje: Dict[str, Any]) -> str:
+    crudo = json.dumps({"fecha": mensaje["fecha"], "id": mensaje["id"]})
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Devuelve (fecha, id) validados. El cursor lo envía el cliente y acaba en
+    un filtro de PostgREST: la fecha se vuelve a serializar desde un datetime
+    y el id se convierte a int, así que no puede colar otros filtros.
+    """
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        fecha = datetime.fromisoformat(str(datos["fecha"]).replace("Z", "+00:00"))
+        id_mensaje = datos["id"]
+        if isinstance(id_mensaje, bool) or not isinstance(id_mensaje, (int, str)):
+            raise ValueError
+        return fecha.isoformat(), int(id_mensaje)
+    except Exception:
+        raise ValueError("Cursor de paginación inválido.")
+
+
+async def obtener_historial_paginado(
+    usuario_id: str,
+    limite: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    Devuelve todos los mensajes (user + Auri) ordenados por fecha descendente.
+    Devuelve una página de mensajes, del más reciente al más antiguo, y el
+    cursor de la página siguiente (None si no hay más).
+
+    Usa paginación por clave (fecha, id) en lugar de OFFSET: cada página
+    cuesta lo mismo sin importar cuán largo sea el historial.
     """
-    res = supabase.table("mensajes_chat").select("*").eq("usuario_id", usuario_id).order("fecha", desc=True).execute()
-    return res.data or []
+    supabase = await get_supabase()
+    query = supabase.table("mensajes_chat") \
+        .select("*") \
+        .eq("usuario_id", usuario_id)
+
+    if cursor:
+        fecha, id_mensaje = _decodificar_cursor(cursor)
+        query = query.or_(f'fecha.lt."{fecha}",and(fecha.eq."{fecha}",id.lt.{id_mensaje})')
+
+    # Pedimos uno de más para saber si existe una página siguiente.
+    res = await query \
+        .order("fecha", desc=True) \
+        .order("id", desc=True) \
+        .limit(limite + 1) \
+        .execute()
+
+    mensajes = res.data or []
+    siguiente_cursor = None
+    if len(mensajes) > limite:
+        mensajes = mensajes[:limite]
+        siguiente_cursor = _codificar_cursor(mensajes[-1])
+
+    return mensajes, siguiente_cursor
+
+
+# ---------------------------------------------------------
+# VENTANA RECIENTE PARA EL AGENTE
+# ---------------------------------------------------------
+async def obtener_contexto_reciente(
+    usuario_id: str,
+    max_mensajes: int,
+    max_tokens: int,
+    antes_de: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Devuelve los últimos 'max_mensajes' mensajes del usuario (solo
+    ``rol, texto, fecha``) en orden cronológico, descartando los más antiguos
+    hasta que el total de tokens quede por debajo de 'max_tokens'.
+    Con 'antes_de' se ignoran los mensajes de ese instante en adelante.
+    """
+    supabase = await get_supabase()
+    query = supabase.table("mensajes_chat") \
+        .select("rol, texto, fecha") \
+        .eq("usuario_id", usuario_id)
+    if antes_de:
+        query = query.lt("fecha", antes_de)
+
+    res = await query \
+        .order("fecha", desc=True) \
+        .order("id", desc=True) \
+        .limit(max_mensajes) \
+        .execute()
+
+    seleccion = []
+    tokens = 0
+    for mensaje in res.data or []:
+        tokens += contar_tokens(mensaje.get("texto") or "")
+        if tokens > max_tokens and seleccion:
+            break
+        seleccion.append(mensaje)
 
+    seleccion.reverse()
+    return seleccion
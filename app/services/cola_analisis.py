@@ -0,0 +1,258 @@
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from app.core import estadisticas
+from app.core.database import get_supabase
+from app.core.config import (
+    DIARIO_ANALISIS_WORKERS,
+    DIARIO_ANALISIS_INTENTOS,
+    DIARIO_ANALISIS_COLA_MAX,
+    DIARIO_ANALISIS_LEASE_SEGUNDOS,
+    DIARIO_ANALISIS_BARRIDO_SEGUNDOS,
+)
+from app.analysis.diary_analyzer import analyze_diary_content
+
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR = "error"
+
+
+def _ahora() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ColaAnalisis:
+    """
+    Cola en memoria para analizar entradas de diario fuera de la petición.
+
+    - 'workers' tareas consumen la cola: nunca hay más llamadas simultáneas
+      a OpenAI que workers.
+    - Cada entrada se "reclama" en la BD (pendiente → procesando, con la
+      hora en 'analisis_reclamado_en') antes de analizarla, así dos procesos
+      no la analizan a la vez.
+    - Los fallos se reintentan con espera exponencial; el último intento
+      acepta el análisis local sin resumen y, si aun así falla, la entrada
+      queda en 'error'.
+    - Al parar, lo que estaba en curso vuelve a 'pendiente'; al arrancar y
+      después cada 'barrido_segundos' se re-encolan las entradas pendientes
+      (también las que no cupieron en la cola) y las 'procesando' con la
+      reclamación vencida ('lease_segundos'), que dejó un proceso que murió
+      sin pasar por 'detener'.
+    - Las escrituras finales solo se aplican si la entrada sigue reclamada
+      por este worker (misma hora de reclamación): si otro proceso la
+      recuperó tras vencer el plazo, no se pisa su trabajo.
+    """
+
+    def __init__(
+        self,
+        workers: int = DIARIO_ANALISIS_WORKERS,
+        max_intentos: int = DIARIO_ANALISIS_INTENTOS,
+        max_pendientes: int = DIARIO_ANALISIS_COLA_MAX,
+        espera_base: float = 2.0,
+        lease_segundos: float = DIARIO_ANALISIS_LEASE_SEGUNDOS,
+        barrido_segundos: float = DIARIO_ANALISIS_BARRIDO_SEGUNDOS,
+    ):
+        self.workers = workers
+        self.lease_segundos = lease_segundos
+        self.barrido_segundos = barrido_segundos
+        self.max_intentos = max_intentos
+        self.max_pendientes = max_pendientes
+        self.espera_base = espera_base
+        self._cola: Optional[asyncio.Queue] = None
+        self._tareas: List[asyncio.Task] = []
+        self._en_curso: Set[int] = set()
+        # Ids en la cola (aún sin reclamar): el barrido no los duplica.
+        self._encoladas: Set[int] = set()
+        self._contadores = {"encoladas": 0, "completadas": 0, "reintentos": 0, "fallidas": 0, "descartadas": 0,
+                            "recuperadas_vencidas": 0}
+        estadisticas.registrar("cola_analisis_diario", self.estadisticas)
+
+    @property
+    def activa(self) -> bool:
+        return bool(self._tareas)
+
+    async def iniciar(self) -> None:
+        """Arranca los workers y el barrido periódico de entradas pendientes."""
+        if self.activa:
+            return
+        self._cola = asyncio.Queue(maxsize=self.max_pendientes)
+        self._tareas = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tareas.append(asyncio.create_task(self._barrer()))
+        print(f"[ColaAnalisis] Iniciada con {self.workers} workers.")
+
+    async def detener(self) -> None:
+        """Para los workers y devuelve a 'pendiente' las entradas que estaban en curso."""
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+        if self._en_curso:
+            print(f"[ColaAnalisis] Devolviendo {len(self._en_curso)} entradas en curso a 'pendiente'.")
+            try:
+                supabase = await get_supabase()
+                await supabase.table("entradas_diario") \
+                    .update({"estado_analisis": PENDIENTE, "analisis_reclamado_en": None}) \
+                    .in_("id", list(self._en_curso)) \
+                    .eq("estado_analisis", PROCESANDO) \
+                    .execute()
+            except Exception as e:
+                print(f"[ColaAnalisis] Error al liberar entradas en curso: {e}")
+            self._en_curso.clear()
+
+    def encolar(self, entrada_id: int, contenido: str) -> bool:
+        """
+        Añade una entrada a la cola sin esperar. Si la cola está llena (o no
+        se ha iniciado), la entrada sigue 'pendiente' en la BD y la recupera
+        el siguiente barrido.
+        """
+        if self._cola is None:
+            self._contadores["descartadas"] += 1
+            return False
+        if entrada_id in self._encoladas:
+            return True
+        try:
+            self._cola.put_nowait((entrada_id, contenido))
+            self._encoladas.add(entrada_id)
+            self._contadores["encoladas"] += 1
+            return True
+        except asyncio.QueueFull:
+            print(f"[ColaAnalisis] Cola llena: la entrada {entrada_id} queda pendiente.")
+            self._contadores["descartadas"] += 1
+            return False
+
+    async def liberar_vencidas(self, supabase) -> int:
+        """
+        Devuelve a 'pendiente' las entradas 'procesando' reclamadas hace más de
+        'lease_segundos' (o sin hora de reclamación): su worker ya no existe.
+        """
+        limite = (datetime.now(timezone.utc) - timedelta(seconds=self.lease_segundos)).isoformat()
+        res = await supabase.table("entradas_diario") \
+            .update({"estado_analisis": PENDIENTE, "analisis_reclamado_en": None}) \
+            .eq("estado_analisis", PROCESANDO) \
+            .or_(f'analisis_reclamado_en.is.null,analisis_reclamado_en.lt."{limite}"') \
+            .execute()
+        liberadas = len(res.data or [])
+        if liberadas:
+            self._contadores["recuperadas_vencidas"] += liberadas
+            print(f"[ColaAnalisis] {liberadas} entradas 'procesando' con la reclamación vencida vuelven a 'pendiente'.")
+        return liberadas
+
+    async def _barrer(self) -> None:
+        """Recupera pendientes al arrancar y luego cada 'barrido_segundos'."""
+        while True:
+            await self.recuperar_pendientes()
+            if self.barrido_segundos <= 0:
+                return
+            await asyncio.sleep(self.barrido_segundos)
+
+    async def recuperar_pendientes(self) -> None:
+        """Re-encola las entradas que quedaron 'pendiente' (reinicio, cola llena, worker caído...)."""
+        huecos = self.max_pendientes - (self._cola.qsize() if self._cola else 0)
+        if huecos <= 0:
+            return
+        try:
+            supabase = await get_supabase()
+            try:
+                await self.liberar_vencidas(supabase)
+            except Exception as e:
+                print(f"[ColaAnalisis] No se pudieron liberar las entradas con la reclamación vencida: {e}")
+            res = await supabase.table("entradas_diario") \
+                .select("id, contenido") \
+                .eq("estado_analisis", PENDIENTE) \
+                .order("id") \
+                .limit(huecos + len(self._encoladas)) \
+                .execute()
+            pendientes = res.data or []
+        except Exception as e:
+            print(f"[ColaAnalisis] No se pudieron recuperar las entradas pendientes: {e}")
+            return
+
+        pendientes = [f for f in pendientes if f["id"] not in self._encoladas]
+        if pendientes:
+            print(f"[ColaAnalisis] Recuperando {len(pendientes)} entradas pendientes.")
+        for fila in pendientes:
+            self.encolar(fila["id"], fila["contenido"])
+
+    async def _worker(self) -> None:
+        while True:
+            entrada_id, contenido = await self._cola.get()
+            self._encoladas.discard(entrada_id)
+            try:
+                await self._procesar(entrada_id, contenido)
+            except Exception as e:
+                print(f"[ColaAnalisis] Error inesperado con la entrada {entrada_id}: {e}")
+            finally:
+                self._cola.task_done()
+
+    async def _procesar(self, entrada_id: int, contenido: str) -> None:
+        supabase = await get_supabase()
+        reclamacion = _ahora()
+        reclamada = await supabase.table("entradas_diario") \
+            .update({"estado_analisis": PROCESANDO, "analisis_reclamado_en": reclamacion}) \
+            .eq("id", entrada_id) \
+            .eq("estado_analisis", PENDIENTE) \
+            .execute()
+        if not reclamada.data:
+            # Otro proceso la tiene (o ya no está pendiente).
+            return
+
+        self._en_curso.add(entrada_id)
+        await self._analizar(supabase, entrada_id, contenido, reclamacion)
+        # Si se cancela (parada) o falla la BD, la entrada sigue en _en_curso
+        # y 'detener' la devuelve a 'pendiente' para el próximo arranque.
+        self._en_curso.discard(entrada_id)
+
+    def _mia(self, consulta, reclamacion: str):
+        """Restringe un UPDATE a la entrada que sigue reclamada por este worker."""
+        return consulta \
+            .eq("estado_analisis", PROCESANDO) \
+            .eq("analisis_reclamado_en", reclamacion)
+
+    async def _analizar(self, supabase, entrada_id: int, contenido: str, reclamacion: str) -> None:
+        for intento in range(1, self.max_intentos + 1):
+            # En el último intento, si OpenAI sigue sin responder, vale el análisis local.
+            analisis = await analyze_diary_content(contenido, respaldo_local=intento == self.max_intentos)
+            if analisis:
+                guardada = await self._mia(supabase.table("entradas_diario")
+                    .update({**analisis, "estado_analisis": COMPLETADO})
+                    .eq("id", entrada_id), reclamacion).execute()
+                if not guardada.data:
+                    print(f"[ColaAnalisis] Entrada {entrada_id} reclamada por otro proceso: se descarta el análisis.")
+                    return
+                self._contadores["completadas"] += 1
+                print(f"[ColaAnalisis] Entrada {entrada_id} analizada (intento {intento}).")
+                return
+            if intento < self.max_intentos:
+                self._contadores["reintentos"] += 1
+                await asyncio.sleep(self.espera_base * 2 ** (intento - 1) * random.uniform(0.8, 1.2))
+                # Renueva la reclamación: sigue viva aunque los reintentos se alarguen.
+                renovacion = _ahora()
+                renovada = await self._mia(supabase.table("entradas_diario")
+                    .update({"analisis_reclamado_en": renovacion})
+                    .eq("id", entrada_id), reclamacion).execute()
+                if not renovada.data:
+                    print(f"[ColaAnalisis] Entrada {entrada_id} reclamada por otro proceso: se abandona.")
+                    return
+                reclamacion = renovacion
+
+        self._contadores["fallidas"] += 1
+        print(f"[ColaAnalisis] Entrada {entrada_id} sin análisis tras {self.max_intentos} intentos.")
+        await self._mia(supabase.table("entradas_diario")
+            .update({"estado_analisis": ERROR})
+            .eq("id", entrada_id), reclamacion).execute()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "en_curso": len(self._en_curso),
+            **self._contadores,
+        }
+
+
+# Una cola por proceso; la arranca y la para el lifespan de la app.
+cola_analisis = ColaAnalisis()
@@ -1,19 +1,21 @@
-from app.core.database import supabase
+from app.core.database import get_supabase
 from datetime import datetime
 from typing import Optional, Dict, Any, List
-from app.analysis.diary_analyzer import analyze_diary_content
+from app.services.cola_analisis import cola_analisis
 
 
 
 # 📓 ENTRADAS DE DIARIO (VERSIÓN MEJORADA)
-def crear_entrada_diario(
+async def crear_entrada_diario(
     usuario_id: str,
     contenido: str,
     titulo: Optional[str] = None
 ) -> Optional[Dict[str, Any]]:
     """
-    Guarda una entrada de diario y luego la enriquece con análisis de IA.
-    Este es el flujo de "Insertar -> Analizar -> Actualizar".
+    Guarda una entrada de diario y encola su análisis de IA.
+    La entrada se devuelve en cuanto se inserta, con estado_analisis =
+    'pendiente'; la cola de análisis la enriquece después (ver
+    'obtener_entrada_diario' para consultar el estado).
     """
     try:
         # 1. INSERTAR (Guardar la entrada inicial del usuario)
@@ -26,10 +28,12 @@ def crear_entrada_diario(
             "contenido": contenido,
             "fecha": fecha_actual
             # Los campos de IA (resumen_ia, emocion, etc.) se dejan en NULL
+            # y estado_analisis toma su valor por defecto ('pendiente').
         }
         
         # Usamos .execute() para obtener los datos insertados, incluido el ID
-        insert_res = supabase.table("entradas_diario").insert(insert_data).execute()
+        supabase = await get_supabase()
+        insert_res = await supabase.table("entradas_diario").insert(insert_data).execute()
         
         if not insert_res.data:
             print("[DiarioService] Error: No se pudo insertar la entrada inicial en Supabase.")
@@ -45,52 +49,37 @@ def crear_entrada_diario(
             
         print(f"[DiarioService] Entrada inicial guardada con ID: {id_entrada}")
 
-       
-        # 2. ANALIZAR (Llamar al módulo de IA)
-       
-        print(f"[DiarioService] Iniciando análisis de IA para la entrada {id_entrada}...")
-        analysis_results = analyze_diary_content(contenido)
-        
-        if not analysis_results:
-            print(f"[DiarioService] Error: El análisis de IA falló. La entrada {id_entrada} queda sin análisis.")
-            # Devolvemos la entrada sin enriquecer, es mejor que nada.
-            return nueva_entrada
-
-       
-        # 3. ACTUALIZAR (Enriquecer la entrada con los resultados de la IA)
-       
-        print(f"[DiarioService] Actualizando entrada {id_entrada} con análisis de IA...")
-        
-        # El diccionario 'analysis_results' ya tiene los nombres de campo
-        # correctos: resumen_ia, emocion_predominante, etc.
-        
-        update_res = supabase.table("entradas_diario") \
-            .update(analysis_results) \
-            .eq("id", id_entrada) \
-            .execute()
-
-        if not update_res.data:
-            print(f"[DiarioService] Error: No se pudo actualizar la entrada {id_entrada} con el análisis.")
-            # Devolvemos la entrada original si la actualización falla
-            return nueva_entrada
-            
-        print(f"[DiarioService] Entrada {id_entrada} enriquecida exitosamente.")
-        
-        # Devolvemos la entrada completada y enriquecida
-        return update_res.data[0]
+        # 2. ENCOLAR el análisis (analizar + actualizar ocurre fuera de la petición)
+        cola_analisis.encolar(id_entrada, contenido)
+        return nueva_entrada
 
     except Exception as e:
         print(f"Error catastrófico en crear_entrada_diario: {e}")
         return None
 
 
-def obtener_entradas_diario(usuario_id: str) -> List[Dict[str, Any]]:
+async def obtener_entrada_diario(usuario_id: str, entrada_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve una entrada del usuario (None si no existe o es de otro usuario).
+    Sirve para consultar 'estado_analisis' tras crearla.
+    """
+    supabase = await get_supabase()
+    res = await supabase.table("entradas_diario") \
+        .select("*") \
+        .eq("id", entrada_id) \
+        .eq("usuario_id", usuario_id) \
+        .execute()
+    return res.data[0] if res.data else None
+
+
+async def obtener_entradas_diario(usuario_id: str) -> List[Dict[str, Any]]:
     """
     Devuelve todas las entradas del diario de un usuario.
     (Esta función permanece igual que en el Paso 1)
     """
     try:
-        res = supabase.table("entradas_diario").select("*").eq("usuario_id", usuario_id).order("fecha", desc=True).execute()
+        supabase = await get_supabase()
+        res = await supabase.table("entradas_diario").select("*").eq("usuario_id", usuario_id).order("fecha", desc=True).execute()
         return res.data or []
     except Exception as e:
         print(f"Error al obtener entradas de diario: {e}")
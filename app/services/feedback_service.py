@@ -1,8 +1,8 @@
-from app.core.database import supabase
+from app.core.database import get_supabase
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
-def guardar_feedback(usuario_id: str, mensaje_id: int, puntuacion: int, comentario: Optional[str] = None):
+async def guardar_feedback(usuario_id: str, mensaje_id: int, puntuacion: int, comentario: Optional[str] = None):
     """
     Guarda una valoración del usuario sobre una respuesta de Auri.
     """
@@ -13,12 +13,14 @@ def guardar_feedback(usuario_id: str, mensaje_id: int, puntuacion: int, comentar
         "comentario": comentario,
         "creado_en": datetime.now().isoformat()
     }
-    supabase.table("feedback_usuario").insert(data).execute()
+    supabase = await get_supabase()
+    await supabase.table("feedback_usuario").insert(data).execute()
 
 
-def obtener_feedbacks(usuario_id: str) -> List[Dict[str, Any]]:
+async def obtener_feedbacks(usuario_id: str) -> List[Dict[str, Any]]:
     """
     Devuelve todos los feedbacks realizados por un usuario.
     """
-    res = supabase.table("feedback_usuario").select("*").eq("usuario_id", usuario_id).order("creado_en", desc=True).execute()
+    supabase = await get_supabase()
+    res = await supabase.table("feedback_usuario").select("*").eq("usuario_id", usuario_id).order("creado_en", desc=True).execute()
     return res.data or []
@@ -0,0 +1,47 @@
+from app.core.database import get_supabase
+from app.core.cache import TTLCache
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+# usuario_id → fila de 'resumenes_conversacion' (se lee en cada turno de chat).
+resumenes_cache = TTLCache("resumenes_conversacion", max_items=5000, ttl=600)
+
+_SIN_RESUMEN = {}
+
+
+async def obtener_resumen(usuario_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve el resumen acumulado de la conversación ({resumen, hasta_fecha})
+    o None si el usuario todavía no tiene uno.
+    """
+    registro = resumenes_cache.get(usuario_id)
+    if registro is not None:
+        return registro or None
+
+    try:
+        supabase = await get_supabase()
+        res = await supabase.table("resumenes_conversacion") \
+            .select("resumen, hasta_fecha") \
+            .eq("usuario_id", usuario_id) \
+            .execute()
+        registro = res.data[0] if res.data else None
+        resumenes_cache.set(usuario_id, registro or _SIN_RESUMEN)
+        return registro
+    except Exception as e:
+        print(f"[MemoriaService] Error al obtener resumen: {e}")
+        return None
+
+
+async def guardar_resumen(usuario_id: str, resumen: str, hasta_fecha: str) -> None:
+    """
+    Guarda (o reemplaza) el resumen acumulado de la conversación.
+    """
+    data = {
+        "usuario_id": usuario_id,
+        "resumen": resumen,
+        "hasta_fecha": hasta_fecha,
+        "actualizado_en": datetime.now().isoformat(),
+    }
+    supabase = await get_supabase()
+    await supabase.table("resumenes_conversacion").upsert(data, on_conflict="usuario_id").execute()
+    resumenes_cache.set(usuario_id, {"resumen": resumen, "hasta_fecha": hasta_fecha})
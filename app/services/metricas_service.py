@@ -1,7 +1,22 @@
-from app.core.database import supabase
-from datetime import datetime
+import asyncio
+from app.core.database import get_supabase
+from app.analysis.tendencias import Columnas, calcular_tendencias
+from datetime import date, datetime, timedelta
 from typing import Optional, Dict, Any, List
 
+# Filas por petición al leer las series de tendencias (límite de PostgREST).
+PAGINA_TENDENCIAS = 1000
+
+# tabla → (columna de emoción, categoría, puntaje, filtros extra)
+FUENTES_TENDENCIAS = {
+    "diario": ("entradas_diario", "emocion_predominante", "categoria_emocional", "promedio_sentimiento", []),
+    "chat": ("mensajes_chat", "emocion_detectada", "categoria_emocional", "puntuacion_sentimiento",
+             [("rol", "eq", "user"), ("emocion_detectada", "not.is", "null")]),
+}
+
+# Periodo de la fila de metricas_emocionales con las métricas del dashboard.
+PERIODO_TOTAL = "total"
+
 # (NUEVO) Función helper para interpretar el puntaje
 def _interpretar_sentimiento(score: float) -> str:
     if score > 0.7:
@@ -16,78 +31,205 @@ def _interpretar_sentimiento(score: float) -> str:
         return "Muy Negativo"
     return "Neutral" # Fallback por si acaso
 
-def calcular_metricas_dashboard(usuario_id: str) -> Dict[str, Any]:
+def _resumir(total_entradas: int, conteo_emociones: Dict[str, int], suma_sentimiento: float, n_sentimiento: int) -> Dict[str, Any]:
+    """Métricas del dashboard a partir de los agregados (conteos y suma de sentimiento)."""
+    promedio_sentimiento_general = round((suma_sentimiento / n_sentimiento) if n_sentimiento > 0 else 0.0, 2)
+
+    emocion_principal = None
+    if conteo_emociones:
+        emocion_principal = max(conteo_emociones, key=conteo_emociones.get)
+
+    return {
+        "total_entradas_diario": total_entradas,
+        "emocion_mas_frecuente": emocion_principal,
+        "conteo_emociones": conteo_emociones,
+        "promedio_sentimiento_general": promedio_sentimiento_general,
+        "interpretacion_sentimiento": _interpretar_sentimiento(promedio_sentimiento_general),
+    }
+
+
+async def calcular_metricas_dashboard(usuario_id: str) -> Dict[str, Any]:
     """
-    Calcula y devuelve las métricas agregadas para el dashboard del usuario.
+    Devuelve las métricas agregadas para el dashboard del usuario.
+
+    Lee su fila de 'metricas_acumuladas', que los triggers de la BD mantienen
+    al día en cada escritura (ver supabase/migrations/), así que el coste no
+    crece con el historial. Si la tabla no está disponible, agrega en la BD.
     """
     try:
-        print(f"[DashboardService] Calculando métricas para {usuario_id}")
-        
-        # 1. Obtener entradas del diario
-        entradas_res = supabase.table("entradas_diario") \
-            .select("emocion_predominante, categoria_emocional, promedio_sentimiento") \
+        supabase = await get_supabase()
+        res = await supabase.table("metricas_acumuladas") \
+            .select("total_entradas_diario, conteo_emociones, suma_sentimiento, n_sentimiento") \
             .eq("usuario_id", usuario_id) \
             .execute()
-        
-        entradas = entradas_res.data or []
+    except Exception as e:
+        print(f"[DashboardService] Métricas acumuladas no disponibles ({e}); se agregan en la BD.")
+        return await agregar_metricas_en_bd(usuario_id)
+
+    if not res.data:
+        # Sin fila: el usuario aún no ha escrito nada.
+        return _resumir(0, {}, 0.0, 0)
+    fila = res.data[0]
+    return _resumir(
+        fila["total_entradas_diario"],
+        fila["conteo_emociones"] or {},
+        fila["suma_sentimiento"],
+        fila["n_sentimiento"],
+    )
 
-        # 2. Obtener mensajes de chat
-        mensajes_res = supabase.table("mensajes_chat") \
-            .select("emocion_detectada, categoria_emocional, puntuacion_sentimiento") \
-            .eq("usuario_id", usuario_id) \
-            .eq("rol", "user") \
-            .filter("emocion_detectada", "not.is", "null") \
-            .execute()
-            
-        mensajes = mensajes_res.data or []
 
-        total_entradas = len(entradas)
-        
+async def agregar_metricas_en_bd(usuario_id: str) -> Dict[str, Any]:
+    """
+    Calcula las métricas agregando en Postgres (RPC 'agregar_metricas_emocionales'):
+    la BD devuelve una fila por emoción con conteos y sumas, no las entradas
+    y mensajes del usuario.
+    """
+    try:
+        supabase = await get_supabase()
+        res = await supabase.rpc("agregar_metricas_emocionales", {"p_usuario": usuario_id}).execute()
+
         conteo_emociones = {}
-        total_sentimiento = 0.0
-        conteo_total = 0
-
-        # 3. Procesar entradas del diario
-        for entrada in entradas:
-            emocion = entrada.get('emocion_predominante')
-            sentimiento = entrada.get('promedio_sentimiento')
-            if emocion:
-                emocion = emocion.lower()
-                conteo_emociones[emocion] = conteo_emociones.get(emocion, 0) + 1
-            if sentimiento is not None:
-                total_sentimiento += sentimiento
-                conteo_total += 1
-
-        # 4. Procesar mensajes de chat analizados
-        for mensaje in mensajes:
-            emocion = mensaje.get('emocion_detectada')
-            sentimiento = mensaje.get('puntuacion_sentimiento')
-            if emocion:
-                emocion = emocion.lower()
-                conteo_emociones[emocion] = conteo_emociones.get(emocion, 0) + 1
-            if sentimiento is not None:
-                total_sentimiento += sentimiento
-                conteo_total += 1
-
-        # 5. Calcular resultados
-        promedio_sentimiento_general = round((total_sentimiento / conteo_total) if conteo_total > 0 else 0.0, 2)
-
-        emocion_principal = None
-        if conteo_emociones:
-            emocion_principal = max(conteo_emociones, key=conteo_emociones.get)
-
-        # (NUEVO) Interpretar el sentimiento
-        interpretacion = _interpretar_sentimiento(promedio_sentimiento_general)
-
-        # 6. Devolver el resultado
-        return {
-            "total_entradas_diario": total_entradas,
-            "emocion_mas_frecuente": emocion_principal,
-            "conteo_emociones": conteo_emociones,
-            "promedio_sentimiento_general": promedio_sentimiento_general,
-            "interpretacion_sentimiento": interpretacion # <-- (NUEVO)
-        }
+        total_entradas, suma_sentimiento, n_sentimiento = 0, 0.0, 0
+        for fila in res.data or []:
+            if fila["emocion"]:
+                conteo_emociones[fila["emocion"]] = fila["n"]
+            total_entradas += fila["entradas_diario"]
+            suma_sentimiento += fila["suma_sentimiento"]
+            n_sentimiento += fila["n_sentimiento"]
+
+        return _resumir(total_entradas, conteo_emociones, suma_sentimiento, n_sentimiento)
 
     except Exception as e:
         print(f"Error al calcular métricas del dashboard: {e}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+
+async def reconstruir_metricas(usuario_id: Optional[str] = None) -> int:
+    """
+    Recalcula desde cero los agregados de un usuario (o de todos) en la BD.
+    Devuelve el número de filas reconstruidas.
+    """
+    supabase = await get_supabase()
+    res = await supabase.rpc("reconstruir_metricas_acumuladas", {"p_usuario": usuario_id}).execute()
+    return res.data or 0
+
+
+async def obtener_columnas_tendencias(usuario_id: str, desde: date, hasta: date, fuente: str = "todas") -> Columnas:
+    """
+    Lee fecha, emoción, categoría y puntaje de las entradas de diario y los
+    mensajes de chat analizados del usuario entre 'desde' y 'hasta', por
+    páginas (keyset por id), y los devuelve como arrays para agregarlos
+    con NumPy.
+    """
+    supabase = await get_supabase()
+    fechas: List[str] = []
+    puntajes: List[Optional[float]] = []
+    emociones: List[Optional[str]] = []
+    categorias: List[Optional[str]] = []
+
+    nombres = list(FUENTES_TENDENCIAS) if fuente == "todas" else [fuente]
+    for nombre in nombres:
+        tabla, col_emocion, col_categoria, col_puntaje, filtros = FUENTES_TENDENCIAS[nombre]
+        ultimo_id = 0
+        while True:
+            consulta = supabase.table(tabla) \
+                .select(f"id, fecha, {col_emocion}, {col_categoria}, {col_puntaje}") \
+                .eq("usuario_id", usuario_id) \
+                .gte("fecha", desde.isoformat()) \
+                .lt("fecha", (hasta + timedelta(days=1)).isoformat()) \
+                .gt("id", ultimo_id)
+            for columna, operador, valor in filtros:
+                consulta = consulta.filter(columna, operador, valor)
+            filas = (await consulta.order("id").limit(PAGINA_TENDENCIAS).execute()).data or []
+            for fila in filas:
+                fechas.append(fila["fecha"])
+                puntajes.append(fila[col_puntaje])
+                emociones.append(fila[col_emocion])
+                categorias.append(fila[col_categoria])
+            if len(filas) < PAGINA_TENDENCIAS:
+                break
+            ultimo_id = filas[-1]["id"]
+
+    # Con historiales largos la conversión tarda: fuera del event loop.
+    return await asyncio.to_thread(Columnas.desde_filas, fechas, puntajes, emociones, categorias)
+
+
+# ---------------------------------------------------------
+# MÉTRICAS PRECALCULADAS (tabla metricas_emocionales)
+# ---------------------------------------------------------
+def semana_iso(dia: date) -> str:
+    anio, semana, _ = dia.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def ultima_semana_completa(hoy: date) -> date:
+    """Lunes de la última semana ISO ya terminada."""
+    return hoy - timedelta(days=hoy.weekday() + 7)
+
+
+def lunes_de_semana(periodo: str) -> date:
+    """'2025-W45' → lunes de esa semana ISO. ValueError si el formato no es válido."""
+    anio, semana = periodo.split("-W")
+    return date.fromisocalendar(int(anio), int(semana), 1)
+
+
+async def metricas_semana(usuario_id: str, lunes: date) -> Optional[Dict[str, Any]]:
+    """
+    Métricas de una semana ISO (diario + chat), con la misma forma que las
+    del dashboard más 'periodo' y 'categorias'. None si no hay filas.
+    """
+    domingo = lunes + timedelta(days=6)
+    columnas = await obtener_columnas_tendencias(usuario_id, lunes, domingo)
+    if not len(columnas):
+        return None
+    semana = calcular_tendencias(columnas, lunes, domingo, "semana", ventana=1)[0]
+    promedio = semana["promedio_sentimiento"] or 0.0
+    conteo = semana["emociones"]
+    return {
+        "periodo": semana["periodo"],
+        "total_registros": semana["n"],
+        "emocion_mas_frecuente": max(conteo, key=conteo.get) if conteo else None,
+        "conteo_emociones": conteo,
+        "categorias": semana["categorias"],
+        "promedio_sentimiento_general": round(promedio, 2),
+        "interpretacion_sentimiento": _interpretar_sentimiento(promedio),
+    }
+
+
+async def obtener_metricas_emocionales(usuario_id: str, periodo: str) -> Optional[Dict[str, Any]]:
+    supabase = await get_supabase()
+    res = await supabase.table("metricas_emocionales") \
+        .select("*") \
+        .eq("usuario_id", usuario_id) \
+        .eq("periodo", periodo) \
+        .execute()
+    return res.data[0] if res.data else None
+
+
+async def guardar_metricas_emocionales(filas: List[Dict[str, Any]]) -> None:
+    if not filas:
+        return
+    supabase = await get_supabase()
+    await supabase.table("metricas_emocionales").upsert(filas, on_conflict="usuario_id,periodo").execute()
+
+
+async def obtener_resumen_precalculado(usuario_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Resumen de IA del dashboard que dejó el job nocturno, como
+    {huella, resumen}, o None si no hay (o no se puede leer).
+    """
+    try:
+        fila = await obtener_metricas_emocionales(usuario_id, PERIODO_TOTAL)
+    except Exception as e:
+        print(f"[DashboardService] No se pudo leer el resumen precalculado: {e}")
+        return None
+    if not fila or not fila.get("resumen_periodo") or not fila.get("huella"):
+        return None
+    return {
+        "huella": fila["huella"],
+        "resumen": {
+            "resumen_ia": fila["resumen_periodo"],
+            "recomendacion_ia": fila.get("recomendacion"),
+            "fuente_modelo": fila.get("fuente_modelo") or "gpt-4o-mini",
+        },
+    }
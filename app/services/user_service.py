@@ -1,7 +1,12 @@
-from app.core.database import supabase
+from app.core.database import get_supabase
+from app.core.cache import TTLCache
+from app.core.config import CACHE_USUARIOS_MAX, CACHE_USUARIOS_TTL
 from typing import Optional, Dict, Any
 
-def crear_usuario(id_auth: str, email: str, nombre: Optional[str] = None) -> Dict[str, Any]:
+# usuario_id → fila de 'usuarios'. Se invalida al crear/actualizar el usuario.
+usuarios_cache = TTLCache("usuarios", max_items=CACHE_USUARIOS_MAX, ttl=CACHE_USUARIOS_TTL)
+
+async def crear_usuario(id_auth: str, email: str, nombre: Optional[str] = None) -> Dict[str, Any]:
     """
     Crea un nuevo usuario en nuestra tabla 'usuarios'.
     Este ID debe venir de Supabase Auth.
@@ -11,35 +16,46 @@ def crear_usuario(id_auth: str, email: str, nombre: Optional[str] = None) -> Dic
         "nombre": nombre,
         "email": email
     }
+    usuarios_cache.invalidar(id_auth)
     try:
-        res = supabase.table("usuarios").insert(data).execute()
+        supabase = await get_supabase()
+        res = await supabase.table("usuarios").insert(data).execute()
         return res.data[0] if res.data else None
     except Exception as e:
         # Manejar el caso de que el usuario ya exista (ej. Primary Key violation)
         print(f"Error al insertar en tabla 'usuarios': {e}")
         # Si ya existe, simplemente lo obtenemos
-        return obtener_usuario_por_email(email)
+        return await obtener_usuario_por_email(email)
 
 
-def obtener_usuario_por_email(email: str) -> Optional[Dict[str, Any]]:
+async def obtener_usuario_por_email(email: str) -> Optional[Dict[str, Any]]:
     """
     Busca un usuario existente por correo electrónico.
     (Esta función está perfecta como la tenías)
     """
     try:
-        res = supabase.table("usuarios").select("*").eq("email", email).execute()
+        supabase = await get_supabase()
+        res = await supabase.table("usuarios").select("*").eq("email", email).execute()
         return res.data[0] if res.data else None
     except Exception as e:
         print(f"Error al obtener usuario por email: {e}")
         return None
     
-def obtener_usuario_por_id(usuario_id: str) -> Optional[Dict[str, Any]]:
+async def obtener_usuario_por_id(usuario_id: str) -> Optional[Dict[str, Any]]:
     """
-    Busca un usuario existente por su UUID.
+    Busca un usuario existente por su UUID (con caché en memoria).
     """
+    usuario = usuarios_cache.get(usuario_id)
+    if usuario is not None:
+        return usuario
+
     try:
-        res = supabase.table("usuarios").select("*").eq("id", usuario_id).execute()
-        return res.data[0] if res.data else None
+        supabase = await get_supabase()
+        res = await supabase.table("usuarios").select("*").eq("id", usuario_id).execute()
+        usuario = res.data[0] if res.data else None
+        if usuario:
+            usuarios_cache.set(usuario_id, usuario)
+        return usuario
     except Exception as e:
         print(f"Error al obtener usuario por ID: {e}")
         return None
\ No newline at end of file
@@ -0,0 +1,281 @@
+"""
+Benchmark: máxima concurrencia sostenida de POST /api/chat/invoke.
+
+Levanta un backend falso local (OpenAI + Supabase REST/Auth) con latencias
+configurables y arranca la API real con uvicorn apuntando a él. Después lanza
+clientes concurrentes en bucle cerrado a distintos niveles de concurrencia y
+mide rendimiento y latencias.
+
+Para comparar "antes" y "después", pasa dos copias del repositorio, por
+ejemplo con un worktree del commit anterior a la migración async:
+
+    git worktree add /tmp/auri-antes <commit-anterior>
+    python benchmarks/bench_chat_concurrencia.py --antes /tmp/auri-antes --despues .
+
+Un nivel se considera "sostenido" si no hay errores y el p95 no supera
+--factor-p95 veces la latencia medida con un único cliente (es decir, las
+peticiones no están haciendo cola en el servidor).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+import jwt
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+USUARIO_ID = str(uuid.UUID(int=1))
+JWT_SECRET = "bench-secret"
+DIMENSION_EMBEDDINGS = 1536
+
+
+# ---------------------------------------------------------
+# BACKEND FALSO (OpenAI + Supabase)
+# ---------------------------------------------------------
+def crear_backend_falso(latencia_llm: float, latencia_db: float, mensajes_historial: int) -> Starlette:
+    ahora = "2025-11-08T12:00:00+00:00"
+    historial = [
+        {
+            "id": i,
+            "usuario_id": USUARIO_ID,
+            "rol": "user" if i % 2 == 0 else "assistant",
+            "texto": f"Mensaje de prueba número {i}, contando cómo me fue hoy.",
+            "emocion_detectada": None,
+            "categoria_emocional": None,
+            "puntuacion_sentimiento": None,
+            "fecha": ahora,
+            "resumen": "Mensaje de prueba",
+        }
+        for i in range(mensajes_historial)
+    ]
+
+    def vector(texto: str):
+        rnd = random.Random(hashlib.sha256(str(texto).encode()).digest())
+        return [rnd.uniform(-1, 1) for _ in range(DIMENSION_EMBEDDINGS)]
+
+    respuesta = "Gracias por contármelo 💜 ¿Cómo te sientes ahora?"
+    # /chat/invoke pide la respuesta y la emoción como JSON (RespuestaAuri).
+    respuesta_estructurada = json.dumps({
+        "respuesta": respuesta,
+        "emocion_detectada": "Calma",
+        "categoria_emocional": "positiva",
+        "puntuacion_sentimiento": 0.4,
+    }, ensure_ascii=False)
+
+    async def chat_completions(request: Request):
+        await asyncio.sleep(latencia_llm)
+        cuerpo = await request.json()
+        estructurada = (cuerpo.get("response_format") or {}).get("type") == "json_schema"
+        return JSONResponse({
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": cuerpo.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": respuesta_estructurada if estructurada else respuesta},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120},
+        })
+
+    async def embeddings(request: Request):
+        cuerpo = await request.json()
+        entradas = cuerpo["input"] if isinstance(cuerpo["input"], list) else [cuerpo["input"]]
+        return JSONResponse({
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": vector(e)} for i, e in enumerate(entradas)],
+            "model": cuerpo.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        })
+
+    async def auth_user(request: Request):
+        await asyncio.sleep(latencia_db)
+        return JSONResponse({
+            "id": USUARIO_ID,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": "bench@example.com",
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": ahora,
+        })
+
+    async def rest(request: Request):
+        await asyncio.sleep(latencia_db)
+        tabla = request.path_params["tabla"]
+        if request.method == "GET":
+            if tabla == "usuarios":
+                return JSONResponse([{"id": USUARIO_ID, "nombre": "Bench", "email": "bench@example.com"}])
+            if tabla == "mensajes_chat":
+                return JSONResponse(historial)
+            return JSONResponse([])
+        cuerpo = await request.body()
+        datos = json.loads(cuerpo) if cuerpo else {}
+        filas = datos if isinstance(datos, list) else [datos]
+        return JSONResponse([{"id": 1, **f} for f in filas], status_code=201)
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/embeddings", embeddings, methods=["POST"]),
+        Route("/auth/v1/user", auth_user, methods=["GET"]),
+        Route("/rest/v1/{tabla}", rest, methods=["GET", "POST", "PATCH"]),
+    ])
+
+
+def puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_backend_falso(app: Starlette, puerto: int) -> uvicorn.Server:
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=puerto, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    return servidor
+
+
+# ---------------------------------------------------------
+# API BAJO PRUEBA
+# ---------------------------------------------------------
+def arrancar_api(directorio: str, puerto: int, puerto_falso: int) -> subprocess.Popen:
+    base = f"http://127.0.0.1:{puerto_falso}"
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{base}/v1",
+        "OPENAI_API_BASE": f"{base}/v1",
+        "SUPABASE_URL": base,
+        "SUPABASE_KEY": jwt.encode({"role": "service_role"}, "bench", algorithm="HS256"),
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "AUTH_VERIFICACION": "local",
+    }
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(puerto), "--log-level", "warning"],
+        cwd=directorio,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    limite = time.monotonic() + 120
+    while time.monotonic() < limite:
+        try:
+            # Versiones con /api/sistema/ready: esperar a que la KB esté indexada.
+            # Versiones anteriores indexan al importar, así que basta con que responda.
+            codigo = httpx.get(f"http://127.0.0.1:{puerto}/api/sistema/ready", timeout=1).status_code
+            if codigo in (200, 404):
+                return proceso
+        except httpx.HTTPError:
+            pass
+        if proceso.poll() is not None:
+            raise RuntimeError(f"La API en {directorio} terminó al arrancar.")
+        time.sleep(0.25)
+    proceso.terminate()
+    raise RuntimeError(f"La API en {directorio} no respondió a tiempo.")
+
+
+# ---------------------------------------------------------
+# GENERADOR DE CARGA
+# ---------------------------------------------------------
+async def medir_nivel(url: str, token: str, concurrencia: int, duracion: float) -> dict:
+    latencias, errores = [], 0
+    limite = time.monotonic() + duracion
+    cabeceras = {"Authorization": f"Bearer {token}"}
+
+    async def cliente(http: httpx.AsyncClient):
+        nonlocal errores
+        while time.monotonic() < limite:
+            inicio = time.perf_counter()
+            try:
+                r = await http.post(url, json={"texto": "Hoy me sentí algo ansioso por los exámenes."}, headers=cabeceras)
+                if r.status_code != 200:
+                    errores += 1
+                    continue
+            except httpx.HTTPError:
+                errores += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    limites = httpx.Limits(max_connections=concurrencia + 10, max_keepalive_connections=concurrencia + 10)
+    async with httpx.AsyncClient(timeout=300, limits=limites) as http:
+        inicio = time.monotonic()
+        await asyncio.gather(*(cliente(http) for _ in range(concurrencia)))
+        transcurrido = time.monotonic() - inicio
+
+    latencias.sort()
+    p = lambda q: latencias[min(len(latencias) - 1, int(q * len(latencias)))] if latencias else float("nan")
+    return {
+        "concurrencia": concurrencia,
+        "completadas": len(latencias),
+        "errores": errores,
+        "rps": len(latencias) / transcurrido,
+        "p50": p(0.50),
+        "p95": p(0.95),
+        "media": statistics.fmean(latencias) if latencias else float("nan"),
+    }
+
+
+async def evaluar(nombre: str, directorio: str, puerto_falso: int, niveles, duracion: float, factor_p95: float) -> None:
+    puerto = puerto_libre()
+    proceso = arrancar_api(directorio, puerto, puerto_falso)
+    token = jwt.encode(
+        {"sub": USUARIO_ID, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + 3600},
+        JWT_SECRET,
+        algorithm="HS256",
+    )
+    url = f"http://127.0.0.1:{puerto}/api/chat/invoke"
+    try:
+        referencia = await medir_nivel(url, token, 1, duracion)
+        print(f"\n== {nombre} ({directorio}) — latencia con 1 cliente: {referencia['p50'] * 1000:.0f} ms")
+        print(f"{'conc.':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8}")
+        max_sostenida = 1
+        for n in niveles:
+            r = await medir_nivel(url, token, n, duracion)
+            print(f"{n:>6} {r['rps']:>8.1f} {r['p50'] * 1000:>8.0f} {r['p95'] * 1000:>8.0f} {r['errores']:>8}")
+            if r["errores"] == 0 and r["p95"] <= factor_p95 * referencia["p50"]:
+                max_sostenida = n
+        print(f"-> concurrencia máxima sostenida: {max_sostenida}")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--antes", help="Copia del repositorio con la versión anterior (opcional).")
+    parser.add_argument("--despues", default=".", help="Copia del repositorio a medir (por defecto, la actual).")
+    parser.add_argument("--niveles", default="8,16,32,48,64,128,256", help="Niveles de concurrencia separados por comas.")
+    parser.add_argument("--duracion", type=float, default=10.0, help="Segundos por nivel.")
+    parser.add_argument("--latencia-llm", type=float, default=0.8, help="Latencia simulada de cada completion (s).")
+    parser.add_argument("--latencia-db", type=float, default=0.03, help="Latencia simulada de cada llamada a Supabase (s).")
+    parser.add_argument("--historial", type=int, default=20, help="Mensajes que devuelve el historial falso.")
+    parser.add_argument("--factor-p95", type=float, default=1.5)
+    args = parser.parse_args()
+
+    niveles = [int(n) for n in args.niveles.split(",")]
+    puerto_falso = puerto_libre()
+    arrancar_backend_falso(crear_backend_falso(args.latencia_llm, args.latencia_db, args.historial), puerto_falso)
+
+    objetivos = ([("antes", args.antes)] if args.antes else []) + [("después", args.despues)]
+    for nombre, directorio in objetivos:
+        asyncio.run(evaluar(nombre, os.path.abspath(directorio), puerto_falso, niveles, args.duracion, args.factor_p95))
+
+
+if __name__ == "__main__":
+    main()
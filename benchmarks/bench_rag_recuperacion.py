@@ -0,0 +1,126 @@
+"""
+Benchmark offline de recuperación RAG: vector vs BM25 vs híbrido.
+
+Indexa app/kb con el backend de embeddings indicado (por defecto "hashing",
+que no necesita red) en un directorio temporal y, para un conjunto de
+consultas etiquetadas con la entrada de la KB que deberían encontrar, mide:
+
+- acierto@k: la entrada esperada aparece entre los k fragmentos devueltos,
+- MRR: media de 1/posición de la entrada esperada,
+- latencia mediana por consulta.
+
+Después repite la evaluación con un umbral de relevancia ('--umbral') y
+añade consultas sin respuesta en la KB: cuenta en cuántas no llega ningún
+fragmento al prompt (el suelo de relevancia del modo híbrido).
+
+    python benchmarks/bench_rag_recuperacion.py
+    python benchmarks/bench_rag_recuperacion.py --umbral 0.3
+    python benchmarks/bench_rag_recuperacion.py --backend openai   # requiere OPENAI_API_KEY
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+CONSULTAS = [
+    ("¿Cuál es el número de la Línea 113?", "Línea de ayuda 113"),
+    ("¿A qué teléfono del MINSA puedo llamar?", "Línea de ayuda 113"),
+    ("técnica de respiración para calmar la ansiedad", "Respiración 4-7-8"),
+    ("me estreso mucho estudiando en la universidad", "Pomodoro"),
+    ("quiero dibujar en un parque de Miraflores", "Urban Sketching"),
+    ("hacer fotos con el celular en Arequipa o Cusco", "Fotografía urbana"),
+    ("cómo preparar picarones o mazamorra morada", "Postres peruanos"),
+    ("dónde hay un Centro de Salud Mental Comunitaria", "CSMC"),
+    ("paso demasiado tiempo en redes sociales", "Desconexión digital"),
+    ("mi mente va muy rápido, quiero volver al presente", "Grounding"),
+    ("escribir una historia de solo 100 palabras", "Cuentos Cortos"),
+    ("bandas de rock e indie peruanas", "música peruana"),
+    ("creo que necesito un terapeuta", "ayuda profesional"),
+    ("¿está mal sentirme triste o enojado?", "Validación de emociones"),
+]
+
+# Consultas que la KB no responde (algunas comparten palabras con ella).
+CONSULTAS_FUERA_KB = [
+    "¿quién ganó el partido de fútbol ayer?",
+    "¿cuánto mide la torre Eiffel?",
+    "cómo cambio el aceite de mi carro",
+    "precio del dólar en el banco hoy",
+    "la mejor receta de lomo saltado",
+    "¿cómo salgo de Perú?",
+    "número de la línea de mi celular prepago",
+    "horario del parque de las leyendas",
+]
+
+
+async def evaluar(servicio, modo: str, k: int, repeticiones: int, umbral=None) -> dict:
+    aciertos, rr, latencias = 0, 0.0, []
+    for consulta, esperado in CONSULTAS:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            fragmentos = await servicio.recuperar_fragmentos(consulta, k=k, umbral=umbral, modo=modo)
+            latencias.append(time.perf_counter() - inicio)
+        posiciones = [i for i, f in enumerate(fragmentos) if esperado.lower() in f.lower()]
+        if posiciones:
+            aciertos += 1
+            rr += 1.0 / (posiciones[0] + 1)
+    return {
+        "modo": modo,
+        "acierto": aciertos / len(CONSULTAS),
+        "mrr": rr / len(CONSULTAS),
+        "latencia_ms": statistics.median(latencias) * 1000,
+    }
+
+
+async def evaluar_fuera_kb(servicio, modo: str, k: int, umbral: float) -> dict:
+    """Fracción de consultas fuera de la KB sin ningún fragmento y fragmentos colados en total."""
+    vacias, colados = 0, 0
+    for consulta in CONSULTAS_FUERA_KB:
+        fragmentos = await servicio.recuperar_fragmentos(consulta, k=k, umbral=umbral, modo=modo)
+        vacias += not fragmentos
+        colados += len(fragmentos)
+    return {"vacias": vacias / len(CONSULTAS_FUERA_KB), "colados": colados}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="hashing", choices=["hashing", "local", "openai"])
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--umbral", type=float, default=0.25,
+                        help="Umbral de relevancia de la segunda tabla (con 'hashing' los cosenos son bajos).")
+    args = parser.parse_args()
+
+    # La configuración se lee al importar: hay que fijarla antes.
+    os.environ["RAG_EMBEDDINGS_BACKEND"] = args.backend
+    os.environ["RAG_INDEX_DIR"] = tempfile.mkdtemp(prefix="rag_bench_")
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+    from app.agents.rag_service import RAGService
+
+    servicio = RAGService()
+    inicio = time.perf_counter()
+    servicio.inicializar()
+    print(f"Índice ({args.backend}) construido en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"con {len(servicio.fragmentos)} fragmentos.\n")
+
+    print(f"{'modo':<10} {'acierto@' + str(args.k):>10} {'MRR':>7} {'p50 ms':>8}")
+    for modo in ("vector", "bm25", "hibrido"):
+        r = asyncio.run(evaluar(servicio, modo, args.k, args.repeticiones))
+        print(f"{r['modo']:<10} {r['acierto']:>10.2f} {r['mrr']:>7.2f} {r['latencia_ms']:>8.3f}")
+
+    # 'bm25' no usa el umbral (no hay similitud coseno): solo vector e híbrido.
+    print(f"\nCon umbral {args.umbral} ({len(CONSULTAS_FUERA_KB)} consultas fuera de la KB):")
+    print(f"{'modo':<10} {'acierto@' + str(args.k):>10} {'MRR':>7} {'sin fragm.':>11} {'colados':>8}")
+    for modo in ("vector", "hibrido"):
+        r = asyncio.run(evaluar(servicio, modo, args.k, 1, umbral=args.umbral))
+        f = asyncio.run(evaluar_fuera_kb(servicio, modo, args.k, args.umbral))
+        print(f"{modo:<10} {r['acierto']:>10.2f} {r['mrr']:>7.2f} {f['vacias']:>11.2f} {f['colados']:>8}")
+
+
+if __name__ == "__main__":
+    main()
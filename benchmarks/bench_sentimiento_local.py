@@ -0,0 +1,164 @@
+"""
+Benchmark del puntuador de sentimiento local (léxico en español) y
+acuerdo con las etiquetas del LLM.
+
+Mide la latencia por texto (uno a uno y por lotes) y compara, texto a texto,
+la categoría, el puntaje y la emoción del léxico con las de referencia:
+
+- acuerdo en categoría (positiva/neutra/negativa) y kappa de Cohen,
+- matriz de confusión,
+- correlación de Pearson y error absoluto medio del puntaje,
+- acuerdo exacto en la emoción predominante.
+
+Las etiquetas de referencia pueden venir de:
+
+    python benchmarks/bench_sentimiento_local.py                       # muestra incluida (etiquetada a mano)
+    python benchmarks/bench_sentimiento_local.py --etiquetas export.jsonl
+    python benchmarks/bench_sentimiento_local.py --supabase 500        # entradas analizadas por gpt-4o-mini
+
+El JSONL lleva un objeto por línea con "texto" (o "contenido"),
+"categoria_emocional", "promedio_sentimiento" y "emocion_predominante",
+por ejemplo exportado de entradas_diario con fuente_modelo = 'gpt-4o-mini'.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# (texto, categoría, puntaje, emoción) de referencia.
+MUESTRA = [
+    ("Hoy me sentí muy feliz, pasé la tarde con mi familia y nos reímos mucho.", "positiva", 0.8, "Alegría"),
+    ("Estoy agradecida por mis amigos, me apoyaron cuando más lo necesitaba.", "positiva", 0.8, "Gratitud"),
+    ("Por fin terminé el proyecto. Me siento orgulloso y aliviado.", "positiva", 0.7, "Alegría"),
+    ("Fue un día tranquilo, leí un libro y descansé.", "positiva", 0.5, "Calma"),
+    ("Salí a correr en la mañana y me sentí con mucha energía y motivado.", "positiva", 0.7, "Esperanza"),
+    ("Mi pareja me sorprendió con una cena, estoy enamorada.", "positiva", 0.8, "Amor"),
+    ("Aprobé el examen de cálculo, estoy contentísimo.", "positiva", 0.8, "Alegría"),
+    ("Hoy cociné picarones con mi abuela, fue muy bonito.", "positiva", 0.7, "Alegría"),
+    ("Me siento en paz después de meditar un rato.", "positiva", 0.6, "Calma"),
+    ("Tengo esperanza de que las cosas van a mejorar.", "positiva", 0.5, "Esperanza"),
+    ("Hoy fui a clases y luego regresé a casa.", "neutra", 0.0, "Neutral"),
+    ("Tuve reuniones toda la mañana y en la tarde hice compras.", "neutra", 0.0, "Neutral"),
+    ("No pasó nada especial, un día normal.", "neutra", 0.0, "Neutral"),
+    ("Estuve ordenando mi cuarto y revisando correos.", "neutra", 0.0, "Neutral"),
+    ("Mañana tengo que ir al banco temprano.", "neutra", 0.0, "Neutral"),
+    ("Me siento muy triste, extraño a mi papá.", "negativa", -0.8, "Tristeza"),
+    ("Estoy agobiado con los exámenes, no puedo dormir por la ansiedad.", "negativa", -0.8, "Ansiedad"),
+    ("Mi jefe me gritó delante de todos, estoy furioso.", "negativa", -0.8, "Enojo"),
+    ("Otra vez me salió mal la entrevista, me siento frustrado.", "negativa", -0.7, "Frustración"),
+    ("Estoy agotada, trabajé doce horas sin descanso.", "negativa", -0.6, "Cansancio"),
+    ("Nadie me escribió por mi cumpleaños, me siento aislado.", "negativa", -0.7, "Soledad"),
+    ("Tengo miedo de perder mi trabajo.", "negativa", -0.7, "Miedo"),
+    ("No estoy bien, todo me sale mal últimamente.", "negativa", -0.7, "Tristeza"),
+    ("Me preocupa mucho la salud de mi mamá.", "negativa", -0.6, "Ansiedad"),
+    ("Estoy harto de que nadie me escuche.", "negativa", -0.7, "Enojo"),
+    ("Me sentí un poco cansado, pero al final el día fue bueno.", "positiva", 0.4, "Alegría"),
+    ("El trabajo estuvo estresante, aunque logré terminar a tiempo.", "neutra", 0.1, "Ansiedad"),
+    ("No tengo miedo, estoy preparado para la presentación.", "positiva", 0.5, "Calma"),
+    ("No me siento feliz con mi carrera.", "negativa", -0.5, "Tristeza"),
+    ("Estoy nervioso por el viaje, pero también muy ilusionado.", "positiva", 0.4, "Alegría"),
+]
+
+
+def cargar_jsonl(ruta: str):
+    filas = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                d = json.loads(linea)
+                filas.append((d.get("texto") or d.get("contenido") or "", d.get("categoria_emocional"),
+                              d.get("promedio_sentimiento"), d.get("emocion_predominante")))
+    return filas
+
+
+async def cargar_supabase(n: int):
+    from app.core.database import get_supabase
+
+    supabase = await get_supabase()
+    res = await supabase.table("entradas_diario") \
+        .select("contenido, categoria_emocional, promedio_sentimiento, emocion_predominante") \
+        .eq("fuente_modelo", "gpt-4o-mini") \
+        .order("id", desc=True) \
+        .limit(n) \
+        .execute()
+    return [(r["contenido"], r["categoria_emocional"], r["promedio_sentimiento"], r["emocion_predominante"])
+            for r in res.data or []]
+
+
+def kappa(referencia, prediccion, clases) -> float:
+    n = len(referencia)
+    observado = sum(a == b for a, b in zip(referencia, prediccion)) / n
+    esperado = sum((referencia.count(c) / n) * (prediccion.count(c) / n) for c in clases)
+    return (observado - esperado) / (1 - esperado) if esperado < 1 else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--etiquetas", help="JSONL con etiquetas del LLM.")
+    parser.add_argument("--supabase", type=int, help="Leer N entradas analizadas por gpt-4o-mini de Supabase.")
+    parser.add_argument("--n", type=int, default=20000, help="Textos para medir la latencia.")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from app.analysis.sentiment_lexicon import puntuar_lote, puntuar_texto
+
+    if args.etiquetas:
+        datos, origen = cargar_jsonl(args.etiquetas), args.etiquetas
+    elif args.supabase:
+        datos, origen = asyncio.run(cargar_supabase(args.supabase)), "Supabase (gpt-4o-mini)"
+    else:
+        datos, origen = MUESTRA, "muestra incluida"
+    datos = [d for d in datos if d[0] and d[1]]
+
+    # --- Latencia ---
+    textos = [d[0] for d in datos]
+    corpus = (textos * (args.n // len(textos) + 1))[:args.n]
+    puntuar_lote(corpus[:100])  # calentamiento
+
+    inicio = time.perf_counter()
+    for texto in corpus[:2000]:
+        puntuar_texto(texto)
+    uno_a_uno = (time.perf_counter() - inicio) / min(2000, len(corpus)) * 1e6
+
+    inicio = time.perf_counter()
+    puntuar_lote(corpus)
+    por_lote = (time.perf_counter() - inicio) / len(corpus) * 1e6
+
+    print(f"Latencia: {uno_a_uno:.1f} µs/texto uno a uno, {por_lote:.1f} µs/texto por lotes "
+          f"({1e6 / por_lote:,.0f} textos/s)\n")
+
+    # --- Acuerdo ---
+    resultados = puntuar_lote(textos)
+    ref_cat = [d[1] for d in datos]
+    pred_cat = [r["categoria_emocional"] for r in resultados]
+    clases = ["positiva", "neutra", "negativa"]
+
+    acuerdo = sum(a == b for a, b in zip(ref_cat, pred_cat)) / len(datos)
+    print(f"Acuerdo con {origen} ({len(datos)} textos)")
+    print(f"  categoría: {acuerdo:.2f}  (kappa de Cohen {kappa(ref_cat, pred_cat, clases):.2f})")
+
+    pares = [(float(d[2]), r["promedio_sentimiento"]) for d, r in zip(datos, resultados) if d[2] is not None]
+    if len(pares) > 1:
+        ref, pred = zip(*pares)
+        r = statistics.correlation(ref, pred)
+        mae = statistics.fmean(abs(a - b) for a, b in pares)
+        print(f"  puntaje:   Pearson r = {r:.2f}, error absoluto medio = {mae:.2f}")
+
+    emociones = [(d[3], r["emocion_predominante"]) for d, r in zip(datos, resultados) if d[3]]
+    if emociones:
+        iguales = sum(a.lower() == b.lower() for a, b in emociones) / len(emociones)
+        print(f"  emoción:   acuerdo exacto {iguales:.2f}")
+
+    print("\nMatriz de confusión (filas: referencia, columnas: léxico)")
+    print(f"{'':>10}" + "".join(f"{c:>10}" for c in clases))
+    for a in clases:
+        print(f"{a:>10}" + "".join(f"{sum(1 for x, y in zip(ref_cat, pred_cat) if x == a and y == b):>10}" for b in clases))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark de /dashboard/tendencias: agregación por día, semana y mes de un
+usuario sintético con muchas filas (por defecto 100 000 en 3 años).
+
+Compara la versión vectorizada (app.analysis.tendencias, NumPy) con una
+agregación de referencia con diccionarios fila a fila, comprueba que dan el
+mismo resultado y mide también la conversión de filas a columnas.
+
+    python benchmarks/bench_tendencias.py
+    python benchmarks/bench_tendencias.py --filas 1000000 --ventana 8
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+EMOCIONES = ["Alegría", "Gratitud", "Calma", "Tristeza", "Ansiedad", "Enojo", "Cansancio", None]
+CATEGORIA = {"Alegría": "positiva", "Gratitud": "positiva", "Calma": "positiva", "Tristeza": "negativa",
+             "Ansiedad": "negativa", "Enojo": "negativa", "Cansancio": "negativa", None: None}
+
+
+def generar_filas(n: int, desde: date, dias: int, semilla: int = 7):
+    """Filas como las devuelve Supabase: diario con fecha 'YYYY-MM-DD', chat con timestamp."""
+    azar = random.Random(semilla)
+    fechas, puntajes, emociones, categorias = [], [], [], []
+    for _ in range(n):
+        dia = desde + timedelta(days=azar.randrange(dias))
+        fechas.append(dia.isoformat() if azar.random() < 0.3 else f"{dia.isoformat()}T{azar.randrange(24):02d}:15:00+00:00")
+        emocion = azar.choice(EMOCIONES)
+        emociones.append(emocion)
+        categorias.append(CATEGORIA[emocion])
+        puntajes.append(None if emocion is None else round(azar.uniform(-1, 1), 2))
+    return fechas, puntajes, emociones, categorias
+
+
+def referencia(fechas, puntajes, emociones, desde: date, hasta: date, granularidad: str, ventana: int):
+    """Agregación fila a fila con diccionarios (lo que se haría sin NumPy)."""
+    def clave(d: date):
+        if granularidad == "dia":
+            return d
+        if granularidad == "semana":
+            return d - timedelta(days=d.weekday())
+        return d.replace(day=1)
+
+    grupos = {}
+    for f, p, e in zip(fechas, puntajes, emociones):
+        d = date.fromisoformat(f[:10])
+        if not desde <= d <= hasta:
+            continue
+        g = grupos.setdefault(clave(d), {"n": 0, "suma": 0.0, "cuenta": 0, "emociones": {}})
+        g["n"] += 1
+        if p is not None:
+            g["suma"] += p
+            g["cuenta"] += 1
+        if e:
+            g["emociones"][e.lower()] = g["emociones"].get(e.lower(), 0) + 1
+
+    periodos, actual = [], clave(desde)
+    while actual <= hasta:
+        periodos.append(actual)
+        if granularidad == "dia":
+            actual += timedelta(days=1)
+        elif granularidad == "semana":
+            actual += timedelta(days=7)
+        else:
+            actual = (actual + timedelta(days=32)).replace(day=1)
+
+    resultado = []
+    for i, inicio in enumerate(periodos):
+        g = grupos.get(inicio, {"n": 0, "suma": 0.0, "cuenta": 0, "emociones": {}})
+        previos = [grupos.get(x) for x in periodos[max(0, i - ventana + 1):i + 1]]
+        suma = sum(x["suma"] for x in previos if x)
+        cuenta = sum(x["cuenta"] for x in previos if x)
+        resultado.append({
+            "inicio": inicio.isoformat(),
+            "n": g["n"],
+            "promedio_sentimiento": round(g["suma"] / g["cuenta"], 3) if g["cuenta"] else None,
+            "media_movil": round(suma / cuenta, 3) if cuenta else None,
+            "emociones": g["emociones"],
+        })
+    return resultado
+
+
+def coinciden(vectorizado, esperado) -> bool:
+    """Mismos periodos, conteos y emociones; promedios iguales salvo redondeo (±0.001)."""
+    if len(vectorizado) != len(esperado):
+        return False
+    for v, e in zip(vectorizado, esperado):
+        if (v["inicio"], v["n"], v["emociones"]) != (e["inicio"], e["n"], e["emociones"]):
+            return False
+        for clave in ("promedio_sentimiento", "media_movil"):
+            if (v[clave] is None) != (e[clave] is None) or (v[clave] is not None and abs(v[clave] - e[clave]) > 1.001e-3):
+                return False
+    return True
+
+
+def medir(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=100_000)
+    parser.add_argument("--dias", type=int, default=3 * 365, help="Días que abarcan las filas.")
+    parser.add_argument("--ventana", type=int, default=4)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from app.analysis.tendencias import Columnas, calcular_tendencias
+
+    desde = date(2023, 1, 1)
+    hasta = desde + timedelta(days=args.dias - 1)
+    fechas, puntajes, emociones, categorias = generar_filas(args.filas, desde, args.dias)
+
+    conversion = medir(lambda: Columnas.desde_filas(fechas, puntajes, emociones, categorias), args.repeticiones)
+    columnas = Columnas.desde_filas(fechas, puntajes, emociones, categorias)
+    print(f"{args.filas:,} filas, {args.dias} días. Conversión filas → columnas: {conversion:.1f} ms\n")
+
+    print(f"{'granularidad':<13}{'periodos':>9}{'numpy (ms)':>12}{'dicts (ms)':>12}{'x':>7}  coincide")
+    for granularidad in ("dia", "semana", "mes"):
+        vectorizado = calcular_tendencias(columnas, desde, hasta, granularidad, args.ventana)
+        esperado = referencia(fechas, puntajes, emociones, desde, hasta, granularidad, args.ventana)
+        coincide = coinciden(vectorizado, esperado)
+
+        t_numpy = medir(lambda: calcular_tendencias(columnas, desde, hasta, granularidad, args.ventana), args.repeticiones)
+        t_dicts = medir(lambda: referencia(fechas, puntajes, emociones, desde, hasta, granularidad, args.ventana),
+                        max(1, args.repeticiones // 2))
+        print(f"{granularidad:<13}{len(vectorizado):>9}{t_numpy:>12.1f}{t_dicts:>12.1f}{t_dicts / t_numpy:>7.1f}  {coincide}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import chat_routes, diario_routes, users_routes, dashboard_routes
-from app.routes import chat_routes, diario_routes, users_routes, dashboard_routes, consejos_routes
+from app.routes import chat_routes, diario_routes, users_routes, dashboard_routes, consejos_routes, sistema_routes
+from app.agents.rag_service import get_rag_service
+from app.services.cola_analisis import cola_analisis
+from app.core.config import RAG_PRECALENTAR, RAG_KB_VIGILAR_SEGUNDOS
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # La KB se indexa en segundo plano: el worker queda disponible de inmediato.
+    if RAG_PRECALENTAR:
+        get_rag_service().calentar_en_segundo_plano()
+    # Opcional: reindexar cuando cambian los JSON de app/kb.
+    vigilancia = None
+    if RAG_KB_VIGILAR_SEGUNDOS > 0:
+        vigilancia = asyncio.create_task(get_rag_service().vigilar_kb(RAG_KB_VIGILAR_SEGUNDOS))
+    # Cola de análisis del diario (re-encola lo que quedó pendiente).
+    await cola_analisis.iniciar()
+    yield
+    await cola_analisis.detener()
+    if vigilancia:
+        vigilancia.cancel()
+
 
 app = FastAPI(
     title="MiDiarioAI API",
     description="API para la aplicación de bienestar emocional MiDiarioAI.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -21,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
 app.include_router(users_routes.router, prefix="/api")
@@ -33,8 +57,10 @@ app.include_router(dashboard_routes.router, prefix="/api")
 
 app.include_router(consejos_routes.router, prefix="/api")
 
+app.include_router(sistema_routes.router, prefix="/api")
+
 @app.get("/")
-def read_root():
+async def read_root():
     """
     Endpoint raíz para verificar que la API está funcionando.
     """
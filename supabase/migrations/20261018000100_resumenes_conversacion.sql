@@ -0,0 +1,22 @@
+-- Resumen acumulado de la conversación de cada usuario con Auri.
+-- 'hasta_fecha' marca el último mensaje de mensajes_chat ya incorporado,
+-- de modo que cada actualización solo pliega los mensajes posteriores.
+create table if not exists public.resumenes_conversacion (
+    usuario_id    uuid primary key references public.usuarios (id) on delete cascade,
+    resumen       text not null,
+    hasta_fecha   timestamptz not null,
+    actualizado_en timestamptz not null default now()
+);
+
+-- Son resúmenes privados de las conversaciones: con la clave anónima o el
+-- JWT de un usuario solo se puede leer el propio. Escribe solo el backend
+-- (service_role, que no está sujeto a la RLS).
+alter table public.resumenes_conversacion enable row level security;
+
+revoke all on table public.resumenes_conversacion from anon, authenticated;
+grant select on table public.resumenes_conversacion to authenticated;
+
+drop policy if exists resumenes_conversacion_propios on public.resumenes_conversacion;
+create policy resumenes_conversacion_propios on public.resumenes_conversacion
+    for select to authenticated
+    using (usuario_id = auth.uid());
@@ -0,0 +1,22 @@
+-- Estado del análisis de IA de cada entrada de diario. La entrada se guarda
+-- 'pendiente' y la cola de análisis del backend la pasa a 'procesando' y
+-- después a 'completado' (o 'error' si se agotan los reintentos).
+alter table public.entradas_diario
+    add column if not exists estado_analisis text not null default 'pendiente'
+        check (estado_analisis in ('pendiente', 'procesando', 'completado', 'error'));
+
+-- Cuándo un worker pasó la entrada a 'procesando'. Si el proceso muere sin
+-- liberarla (OOM, kill -9), al arrancar se devuelven a 'pendiente' las que
+-- llevan más de DIARIO_ANALISIS_LEASE_SEGUNDOS reclamadas.
+alter table public.entradas_diario
+    add column if not exists analisis_reclamado_en timestamptz;
+
+-- Las entradas existentes ya pasaron por el análisis síncrono: las que se
+-- quedaron sin resultado se marcan como 'error' (no se re-encolan al arrancar).
+update public.entradas_diario
+    set estado_analisis = case when emocion_predominante is not null then 'completado' else 'error' end;
+
+-- Recuperación de trabajos pendientes al arrancar.
+create index if not exists entradas_diario_analisis_pendiente_idx
+    on public.entradas_diario (id)
+    where estado_analisis in ('pendiente', 'procesando');
@@ -0,0 +1,170 @@
+-- Agregados emocionales acumulados por usuario: el dashboard lee una fila
+-- en vez de recorrer todas sus entradas de diario y mensajes de chat.
+--
+-- Los mantienen al día los triggers de entradas_diario y mensajes_chat
+-- (cualquier escritura: API, cola de análisis, backfill...) sumando la fila
+-- nueva y restando la anterior. 'reconstruir_metricas_acumuladas' los
+-- recalcula desde cero (job app.jobs.reconciliar_metricas).
+create table if not exists public.metricas_acumuladas (
+    usuario_id            uuid primary key references public.usuarios (id) on delete cascade,
+    total_entradas_diario integer not null default 0,
+    -- emoción en minúsculas → nº de entradas/mensajes con esa emoción
+    conteo_emociones      jsonb not null default '{}'::jsonb,
+    suma_sentimiento      double precision not null default 0,
+    n_sentimiento         integer not null default 0,
+    actualizado_en        timestamptz not null default now()
+);
+
+
+-- Suma (p_signo = 1) o resta (p_signo = -1) la aportación de una fila.
+create or replace function public._sumar_metrica(
+    p_usuario uuid, p_emocion text, p_puntaje double precision, p_signo integer, p_es_diario boolean
+) returns void
+language plpgsql security definer set search_path = public as $$
+declare
+    v_clave text := lower(nullif(p_emocion, ''));
+begin
+    if p_usuario is null then
+        return;
+    end if;
+    -- Al restar no se crea la fila (p. ej. borrado en cascada de un usuario).
+    if p_signo > 0 then
+        insert into metricas_acumuladas (usuario_id) values (p_usuario)
+            on conflict (usuario_id) do nothing;
+    end if;
+
+    update metricas_acumuladas m set
+        total_entradas_diario = m.total_entradas_diario + case when p_es_diario then p_signo else 0 end,
+        conteo_emociones = case
+            when v_clave is null then m.conteo_emociones
+            when coalesce((m.conteo_emociones ->> v_clave)::int, 0) + p_signo <= 0 then m.conteo_emociones - v_clave
+            else jsonb_set(m.conteo_emociones, array[v_clave],
+                           to_jsonb(coalesce((m.conteo_emociones ->> v_clave)::int, 0) + p_signo))
+        end,
+        suma_sentimiento = m.suma_sentimiento + coalesce(p_signo * p_puntaje, 0),
+        n_sentimiento = m.n_sentimiento + case when p_puntaje is null then 0 else p_signo end,
+        actualizado_en = now()
+    where m.usuario_id = p_usuario;
+end $$;
+
+
+-- Entradas de diario: cuentan todas; emoción y sentimiento si ya están analizadas.
+create or replace function public._metricas_entradas_diario() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op = 'UPDATE'
+       and (old.usuario_id, old.emocion_predominante, old.promedio_sentimiento)
+           is not distinct from (new.usuario_id, new.emocion_predominante, new.promedio_sentimiento) then
+        return null;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform _sumar_metrica(old.usuario_id, old.emocion_predominante, old.promedio_sentimiento, -1, true);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform _sumar_metrica(new.usuario_id, new.emocion_predominante, new.promedio_sentimiento, 1, true);
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists metricas_entradas_diario on public.entradas_diario;
+create trigger metricas_entradas_diario
+    after insert or delete or update of usuario_id, emocion_predominante, promedio_sentimiento
+    on public.entradas_diario
+    for each row execute function public._metricas_entradas_diario();
+
+
+-- Mensajes de chat: solo los del usuario que tienen emoción detectada.
+create or replace function public._metricas_mensajes_chat() returns trigger
+language plpgsql security definer set search_path = public as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') and old.rol = 'user' and old.emocion_detectada is not null then
+        perform _sumar_metrica(old.usuario_id, old.emocion_detectada, old.puntuacion_sentimiento, -1, false);
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') and new.rol = 'user' and new.emocion_detectada is not null then
+        perform _sumar_metrica(new.usuario_id, new.emocion_detectada, new.puntuacion_sentimiento, 1, false);
+    end if;
+    return null;
+end $$;
+
+drop trigger if exists metricas_mensajes_chat on public.mensajes_chat;
+create trigger metricas_mensajes_chat
+    after insert or delete or update of usuario_id, rol, emocion_detectada, puntuacion_sentimiento
+    on public.mensajes_chat
+    for each row execute function public._metricas_mensajes_chat();
+
+
+-- Recalcula desde cero los agregados de un usuario (o de todos si p_usuario
+-- es null). Bloquea las escrituras en metricas_acumuladas mientras tanto, así
+-- que ninguna aportación de un trigger concurrente se pierde ni se duplica.
+-- Devuelve el número de filas reconstruidas.
+create or replace function public.reconstruir_metricas_acumuladas(p_usuario uuid default null)
+returns integer
+language plpgsql security definer set search_path = public as $$
+declare
+    v_filas integer;
+begin
+    lock table metricas_acumuladas in share row exclusive mode;
+
+    delete from metricas_acumuladas where p_usuario is null or usuario_id = p_usuario;
+
+    with filas as (
+        select usuario_id, 1 as entrada, lower(nullif(emocion_predominante, '')) as emocion,
+               promedio_sentimiento as puntaje
+        from entradas_diario
+        where p_usuario is null or usuario_id = p_usuario
+        union all
+        select usuario_id, 0, lower(nullif(emocion_detectada, '')), puntuacion_sentimiento
+        from mensajes_chat
+        where rol = 'user' and emocion_detectada is not null
+          and (p_usuario is null or usuario_id = p_usuario)
+    ),
+    emociones as (
+        select usuario_id, jsonb_object_agg(emocion, n) as conteo
+        from (
+            select usuario_id, emocion, count(*) as n
+            from filas where emocion is not null
+            group by usuario_id, emocion
+        ) por_emocion
+        group by usuario_id
+    ),
+    totales as (
+        select usuario_id,
+               sum(entrada)::int as entradas,
+               coalesce(sum(puntaje), 0) as suma,
+               count(puntaje)::int as n
+        from filas
+        group by usuario_id
+    )
+    insert into metricas_acumuladas
+        (usuario_id, total_entradas_diario, conteo_emociones, suma_sentimiento, n_sentimiento, actualizado_en)
+    select t.usuario_id, t.entradas, coalesce(e.conteo, '{}'::jsonb), t.suma, t.n, now()
+    from totales t
+    left join emociones e using (usuario_id);
+
+    get diagnostics v_filas = row_count;
+    return v_filas;
+end $$;
+
+-- La tabla solo la escriben los triggers (security definer, como dueño de
+-- la tabla) y el backend (service_role); ambos saltan la RLS. Los clientes
+-- con la clave anónima o el JWT de un usuario solo pueden leer su propia fila.
+alter table public.metricas_acumuladas enable row level security;
+
+revoke all on table public.metricas_acumuladas from anon, authenticated;
+grant select on table public.metricas_acumuladas to authenticated;
+
+drop policy if exists metricas_acumuladas_propias on public.metricas_acumuladas;
+create policy metricas_acumuladas_propias on public.metricas_acumuladas
+    for select to authenticated
+    using (usuario_id = auth.uid());
+
+-- Son security definer: solo el backend (service_role) puede llamarlas por
+-- RPC; un cliente con la clave anónima no puede alterar los agregados.
+revoke execute on function public._sumar_metrica(uuid, text, double precision, integer, boolean)
+    from public, anon, authenticated;
+revoke execute on function public.reconstruir_metricas_acumuladas(uuid)
+    from public, anon, authenticated;
+grant execute on function public.reconstruir_metricas_acumuladas(uuid) to service_role;
+
+-- Estado inicial a partir de los datos existentes.
+select public.reconstruir_metricas_acumuladas();
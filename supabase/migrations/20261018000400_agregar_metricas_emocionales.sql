@@ -0,0 +1,44 @@
+-- Agregación de las métricas del dashboard en la BD: en vez de enviar por
+-- la API todas las entradas y mensajes del usuario, devuelve una fila por
+-- emoción (en minúsculas; null = filas sin emoción) con su número de filas,
+-- la suma y el número de puntajes de sentimiento y cuántas son entradas de
+-- diario. El tamaño de la respuesta no crece con el historial.
+--
+-- Se llama con supabase.rpc('agregar_metricas_emocionales', {p_usuario}).
+-- Es security invoker: se aplica la RLS de quien la llama (el backend usa
+-- service_role; un usuario con su JWT solo agregaría sus propias filas).
+create or replace function public.agregar_metricas_emocionales(p_usuario uuid)
+returns table (
+    emocion          text,
+    n                bigint,
+    suma_sentimiento double precision,
+    n_sentimiento    bigint,
+    entradas_diario  bigint
+)
+language sql stable set search_path = public as $$
+    with filas as (
+        select lower(nullif(emocion_predominante, '')) as emocion,
+               promedio_sentimiento as puntaje,
+               1 as entrada
+        from entradas_diario
+        where usuario_id = p_usuario
+        union all
+        select lower(nullif(emocion_detectada, '')), puntuacion_sentimiento, 0
+        from mensajes_chat
+        where usuario_id = p_usuario and rol = 'user' and emocion_detectada is not null
+    )
+    select emocion,
+           count(*),
+           coalesce(sum(puntaje), 0),
+           count(puntaje),
+           sum(entrada)
+    from filas
+    group by emocion
+$$;
+
+-- Índices para que la agregación solo lea las filas del usuario.
+create index if not exists entradas_diario_usuario_idx
+    on public.entradas_diario (usuario_id);
+create index if not exists mensajes_chat_usuario_emocion_idx
+    on public.mensajes_chat (usuario_id)
+    where rol = 'user' and emocion_detectada is not null;
@@ -0,0 +1,36 @@
+-- Métricas precalculadas por el job nocturno (app.jobs.metricas_nocturnas):
+-- una fila por usuario y periodo.
+--   periodo 'total'    → métricas del dashboard + resumen/recomendación de IA
+--   periodo '2025-W45' → resumen de esa semana ISO (/diario/resumen-semanal)
+-- La tabla puede existir ya con otras columnas: solo se añaden las que faltan.
+create table if not exists public.metricas_emocionales (
+    usuario_id uuid not null references public.usuarios (id) on delete cascade,
+    periodo    text not null
+);
+
+alter table public.metricas_emocionales
+    add column if not exists emociones_predominantes jsonb,     -- fracción por categoría
+    add column if not exists promedio_sentimiento    double precision,
+    add column if not exists resumen_periodo         text,
+    add column if not exists recomendacion           text,
+    add column if not exists metricas                jsonb,     -- métricas completas del periodo
+    add column if not exists huella                  text,      -- huella_metricas() del resumen
+    add column if not exists fuente_modelo           text,
+    add column if not exists actualizado_en          timestamptz not null default now();
+
+-- Clave del upsert del job (on_conflict=usuario_id,periodo).
+create unique index if not exists metricas_emocionales_usuario_periodo_key
+    on public.metricas_emocionales (usuario_id, periodo);
+
+-- Contiene resúmenes de IA sobre el estado emocional de cada usuario. Solo la
+-- escribe el job nocturno (service_role, que salta la RLS); con la clave
+-- anónima o el JWT de un usuario solo se pueden leer las filas propias.
+alter table public.metricas_emocionales enable row level security;
+
+revoke all on table public.metricas_emocionales from anon, authenticated;
+grant select on table public.metricas_emocionales to authenticated;
+
+drop policy if exists metricas_emocionales_propias on public.metricas_emocionales;
+create policy metricas_emocionales_propias on public.metricas_emocionales
+    for select to authenticated
+    using (usuario_id = auth.uid());
@@ -0,0 +1,103 @@
+"""
+El prompt que se envía al modelo no crece con el historial: con 10, 100 o
+500 turnos se mantiene dentro de MEMORIA_PRESUPUESTO_TOKENS porque los
+turnos antiguos se pliegan en el resumen.
+
+El modelo que resume y 'memoria_service' (Supabase) se sustituyen por
+dobles en memoria; los tokens se cuentan con app/core/tokens.py.
+"""
+
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+import app.services.memoria_service as memoria_service
+from app.agents.conversational_agent import ConversationalAgent
+from app.core.config import CHAT_CONTEXTO_MAX_MENSAJES, MEMORIA_PRESUPUESTO_TOKENS
+from app.core.tokens import contar_tokens, contar_tokens_mensajes
+
+PALABRAS = ("hoy me sentí cansada en el trabajo pero luego salí a caminar con mi hermana "
+            "y hablamos de la universidad los exámenes mi mamá el estrés y la música").split()
+
+
+class ResumidorFalso:
+    """Hace de 'llm_resumen': devuelve un resumen acotado, como con max_tokens."""
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.llamadas = []
+
+    async def ainvoke(self, mensajes):
+        self.llamadas.append(contar_tokens_mensajes([m.content for m in mensajes]))
+        resumen = f"El usuario ha contado {len(self.llamadas)} bloques de su semana. " + " ".join(PALABRAS)
+        while contar_tokens(resumen) > self.max_tokens:
+            resumen = resumen[: len(resumen) * 3 // 4]
+        return SimpleNamespace(content=resumen)
+
+
+@pytest.fixture
+def agente(monkeypatch):
+    resumenes = {}
+
+    async def obtener_resumen(usuario_id):
+        return resumenes.get(usuario_id)
+
+    async def guardar_resumen(usuario_id, resumen, hasta_fecha):
+        resumenes[usuario_id] = {"resumen": resumen, "hasta_fecha": hasta_fecha}
+
+    monkeypatch.setattr(memoria_service, "obtener_resumen", obtener_resumen)
+    monkeypatch.setattr(memoria_service, "guardar_resumen", guardar_resumen)
+
+    agente = ConversationalAgent()
+    agente.memoria.llm_resumen = ResumidorFalso(agente.memoria.max_tokens_resumen)
+    return agente
+
+
+def _mensaje(azar: random.Random, rol: str, fecha: datetime) -> dict:
+    texto = " ".join(azar.choice(PALABRAS) for _ in range(azar.randint(15, 90)))
+    return {"rol": rol, "texto": texto, "fecha": fecha.isoformat()}
+
+
+async def _conversar(agente: ConversationalAgent, turnos: int, usuario_id: str = "u1"):
+    """Simula 'turnos' mensajes del usuario (con su respuesta) y mide cada prompt."""
+    azar = random.Random(turnos)
+    inicio = datetime(2025, 1, 1, 9, 0)
+    historial, tamanos = [], []
+    for i in range(turnos):
+        texto = " ".join(azar.choice(PALABRAS) for _ in range(azar.randint(5, 40)))
+        # Como chat_service.obtener_contexto_reciente: solo los últimos mensajes.
+        reciente = historial[-CHAT_CONTEXTO_MAX_MENSAJES:]
+        mensajes = await agente._construir_mensajes(
+            texto, {"id": usuario_id, "nombre": "Ana"}, reciente, contexto_kb="Respira hondo."
+        )
+        tamanos.append(contar_tokens_mensajes([m.content for m in mensajes]))
+        # El plegado corre en segundo plano; lo dejamos terminar antes del turno siguiente.
+        await asyncio.gather(*agente.memoria._plegando.values())
+
+        historial.append(_mensaje(azar, "user", inicio + timedelta(minutes=2 * i)))
+        historial.append(_mensaje(azar, "assistant", inicio + timedelta(minutes=2 * i + 1)))
+    return tamanos
+
+
+@pytest.mark.parametrize("turnos", [10, 100, 500])
+def test_prompt_dentro_del_presupuesto(agente, turnos):
+    tamanos = asyncio.run(_conversar(agente, turnos))
+
+    assert max(tamanos) <= MEMORIA_PRESUPUESTO_TOKENS
+    # Nunca se manda al resumidor el historial completo, solo resumen + lote.
+    assert all(t <= MEMORIA_PRESUPUESTO_TOKENS for t in agente.memoria.llm_resumen.llamadas)
+    if turnos >= 100:
+        assert agente.memoria.llm_resumen.llamadas, "los turnos antiguos deberían plegarse"
+
+
+def test_prompt_no_crece_con_el_historial(agente):
+    corto = asyncio.run(_conversar(agente, 100, "u1"))
+    largo = asyncio.run(_conversar(agente, 500, "u2"))
+    # Una vez llena la ventana, el tamaño se estabiliza: 500 turnos cuestan lo mismo que 100.
+    assert max(largo[-50:]) <= max(corto[-50:]) * 1.25